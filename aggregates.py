@@ -0,0 +1,251 @@
+"""
+Materialized aggregates of the NBA draft table.
+
+The charts in visualizing_draft_nba.py all boil down to group-bys of
+WS_per_48 by draft year and/or pick (the average per draft, the number of
+players per draft, the average and quantiles per pick ...). Instead of
+scanning every player row for each of them, the rows are summarised once
+into cells keyed by (Draft_Yr, Pk), each holding
+
+    rows    the number of players
+    count   the number of players with a value
+    sum     the sum of the values
+    sumsq   the sum of the squared values
+    min/max
+    sketch  a quantile summary: the sorted values themselves while there
+            are at most SKETCH_SIZE of them, otherwise the middle quantiles
+            of SKETCH_SIZE equal shares of them
+
+Counts, sums and sums of squares add up, so rollup() gets the count, mean
+and standard deviation of any coarser grouping (by draft year, by pick,
+the top 60 picks ...) from the cells alone, and quantiles() merges the
+sketches. Both give the same numbers as the group-by on the raw rows as
+long as the sketches are exact, which they are for every cell of the draft
+data.
+
+The cells are kept in a Parquet store partitioned by Draft_Yr like the
+draft tables (see storage.py), so a new or refreshed draft year only
+rewrites that year's cells:
+
+    update_aggregate_store(draft_df[draft_df.Draft_Yr == 2018])
+
+After a scrape refresh_aggregates() follows the draft store's changelog
+(see changes.py) and only rebuilds the cells of the picks whose WS_per_48
+changed, or every cell the first time.
+
+Select cells with DataFrame.query on the key names, e.g.
+rollup(cells.query("Pk < 61"), "Pk") for the top 60 picks.
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from changes import ChangeFeed
+from storage import (NBA_AGGREGATE_STORE, NBA_DRAFT_STORE, read_table,
+                     table_exists, write_table)
+
+DEFAULT_KEYS = ("Draft_Yr", "Pk")
+DEFAULT_VALUE = "WS_per_48"
+
+# cells with more values than this only keep this many quantiles
+SKETCH_SIZE = 101
+
+AGGREGATE_SCHEMA = pa.schema([
+    ("Draft_Yr", pa.int16()), ("Pk", pa.int16()),
+    ("rows", pa.int64()), ("count", pa.int64()),
+    ("sum", pa.float64()), ("sumsq", pa.float64()),
+    ("min", pa.float64()), ("max", pa.float64()),
+    ("sketch", pa.list_(pa.float64()))])
+
+# the columns of a cell, after the keys
+CELL_COLS = ["rows", "count", "sum", "sumsq", "min", "max", "sketch"]
+SUM_COLS = ["rows", "count", "sum", "sumsq"]
+
+# the name the draft store's changelog follows this store by
+CONSUMER = "aggregates"
+
+
+def _sketch(values):
+    values = np.sort(values)
+    if len(values) <= SKETCH_SIZE:
+        return values
+    # the middle quantile of each of SKETCH_SIZE equal shares of the values
+    return np.quantile(values, (np.arange(SKETCH_SIZE) + 0.5) / SKETCH_SIZE)
+
+
+def build_aggregates(df, keys=DEFAULT_KEYS, value=DEFAULT_VALUE):
+    """
+    Return the aggregate cells of the rows in df, indexed by keys.
+    """
+    keys = list(keys)
+    grouped = df.groupby(keys)[value]
+    cells = grouped.agg(rows="size", count="count", sum="sum", min="min",
+                        max="max")
+    cells["sumsq"] = (df[value] ** 2).groupby([df[key] for key in keys]).sum()
+
+    # sort the values once and cut them into the cells' sketches
+    values = df.loc[df[value].notnull(), keys + [value]].sort_values(
+        keys + [value])
+    sizes = values.groupby(keys).size()
+    sketches = pd.Series(
+        [_sketch(chunk) for chunk in np.split(values[value].to_numpy(),
+                                              np.cumsum(sizes)[:-1])],
+        index=sizes.index, dtype=object)
+    cells["sketch"] = [sketch if isinstance(sketch, np.ndarray)
+                       else np.empty(0)
+                       for sketch in sketches.reindex(cells.index)]
+    return cells[CELL_COLS]
+
+
+def update_aggregates(cells, df, keys=DEFAULT_KEYS, value=DEFAULT_VALUE):
+    """
+    Return cells with the cells of every draft year in df replaced by ones
+    built from df's rows, for a new or refreshed draft year.
+    """
+    years = df.Draft_Yr.unique()
+    kept = cells[~cells.index.get_level_values("Draft_Yr").isin(years)]
+    return pd.concat([kept, build_aggregates(df, keys, value)]).sort_index()
+
+
+def rollup(cells, by=None):
+    """
+    Return rows, count, sum, sumsq, min, max, mean and std (with ddof=1
+    like pandas) of the cells grouped by the key or keys in by, or of all
+    the cells as a Series if by is None.
+    """
+    if by is None:
+        totals = cells[SUM_COLS].sum()
+        totals["min"] = cells["min"].min()
+        totals["max"] = cells["max"].max()
+        return _add_moments(totals)
+
+    grouped = cells.groupby(level=by)
+    totals = grouped[SUM_COLS].sum()
+    totals["min"] = grouped["min"].min()
+    totals["max"] = grouped["max"].max()
+    return _add_moments(totals)
+
+
+def _add_moments(totals):
+    count = totals["count"]
+    totals["mean"] = totals["sum"] / count
+    with np.errstate(divide="ignore", invalid="ignore"):
+        var = (totals["sumsq"] - totals["sum"] ** 2 / count) / (count - 1)
+    # rounding can leave a tiny negative variance for identical values
+    totals["std"] = np.sqrt(np.maximum(var, 0))
+    return totals
+
+
+def _merged_quantile(sketches, counts, q):
+    pairs = [(sketch, count) for sketch, count in zip(sketches, counts)
+             if len(sketch)]
+    if not pairs:
+        return np.full(np.shape(q), np.nan)
+    points = np.concatenate([sketch for sketch, _ in pairs])
+    weights = np.concatenate([np.full(len(sketch), count / len(sketch))
+                              for sketch, count in pairs])
+    if np.all(weights == 1):
+        # every sketch holds its values, so this is the exact quantile
+        return np.quantile(points, q)
+
+    # otherwise treat every point as the middle of its share of the values
+    order = np.argsort(points, kind="stable")
+    points, weights = points[order], weights[order]
+    positions = (np.cumsum(weights) - weights / 2) / weights.sum()
+    return np.interp(q, positions, points)
+
+
+def quantiles(cells, q, by=None):
+    """
+    Return the q quantile(s) of the values in the cells grouped by the key
+    or keys in by, like groupby(by).quantile(q) on the raw rows: a Series
+    for a single q and a DataFrame with a column per q otherwise. With by
+    None the quantiles of all the cells are returned.
+    """
+    if by is None:
+        return _merged_quantile(cells["sketch"], cells["count"], q)
+
+    result = {name: _merged_quantile(group["sketch"], group["count"], q)
+              for name, group in cells.groupby(level=by)}
+    if np.ndim(q) == 0:
+        return pd.Series(result, name=q).rename_axis(by)
+    return pd.DataFrame.from_dict(result, orient="index",
+                                  columns=list(q)).rename_axis(by)
+
+
+def write_aggregates(cells, path=NBA_AGGREGATE_STORE):
+    """
+    Write the cells to the store at path, replacing the cells of their draft
+    years and leaving the other years alone.
+    """
+    write_table(cells.reset_index(), path, AGGREGATE_SCHEMA)
+
+
+def update_aggregate_store(df, path=NBA_AGGREGATE_STORE):
+    """
+    Rebuild the stored cells of every draft year in df from df's rows.
+    """
+    write_aggregates(build_aggregates(df), path)
+
+
+def update_aggregate_cells(keys, path=NBA_AGGREGATE_STORE,
+                           draft_path=NBA_DRAFT_STORE):
+    """
+    Rebuild the stored cells of the (Draft_Yr, Pk) keys in the DataFrame
+    keys from the rows in the draft store, leaving the other cells alone.
+    """
+    years = keys.Draft_Yr.unique().tolist()
+    rows = read_table(draft_path, columns=list(DEFAULT_KEYS) + [DEFAULT_VALUE],
+                      years=years)
+    index = pd.MultiIndex.from_frame(keys[list(DEFAULT_KEYS)])
+    changed = pd.MultiIndex.from_frame(rows[list(DEFAULT_KEYS)]).isin(index)
+    cells = read_aggregates(path, years=years)
+    cells = pd.concat([cells[~cells.index.isin(index)],
+                       build_aggregates(rows[changed])]).sort_index()
+    write_aggregates(cells, path)
+
+
+def refresh_aggregates(path=NBA_AGGREGATE_STORE, draft_path=NBA_DRAFT_STORE):
+    """
+    Bring the cells up to date with the draft store: rebuild the ones whose
+    picks changed since the last refresh, or all of them if the store or
+    the draft store's changelog is new. Returns the number of cells rebuilt,
+    None for all of them.
+    """
+    feed = ChangeFeed(draft_path, CONSUMER)
+    if feed.full or not table_exists(path):
+        update_aggregate_store(read_table(
+            draft_path, columns=list(DEFAULT_KEYS) + [DEFAULT_VALUE]), path)
+        rebuilt = None
+    else:
+        keys = feed.keys(columns=[DEFAULT_VALUE]).rename(
+            columns={"pick": "Pk"})
+        if len(keys):
+            update_aggregate_cells(keys, path, draft_path)
+        rebuilt = len(keys)
+    feed.commit()
+    return rebuilt
+
+
+def read_aggregates(path=NBA_AGGREGATE_STORE, years=None):
+    """
+    Return the cells in the store at path, of the given draft years or all
+    of them.
+    """
+    cells = read_table(path, years=years)
+    return cells.set_index(list(DEFAULT_KEYS)).sort_index()
+
+
+def main():
+    # (re)build the whole store from the draft data
+    draft_df = read_table(NBA_DRAFT_STORE,
+                          columns=list(DEFAULT_KEYS) + [DEFAULT_VALUE],
+                          csv_path="draft_data_1966_to_2018.csv")
+    update_aggregate_store(draft_df)
+    if table_exists(NBA_DRAFT_STORE):
+        # the cells are up to date with every change logged so far
+        ChangeFeed(NBA_DRAFT_STORE, CONSUMER).commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+"""
+Benchmarks and local stand-ins for the sports-reference sites.
+
+Run them from the repository root, for example:
+
+    python -m benchmarks.bench_fetch
+"""
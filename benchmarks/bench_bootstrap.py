@@ -0,0 +1,85 @@
+"""
+Bootstrap confidence intervals for the median career length of every
+position: refitting lifelines for each resample (timed on a few replicates
+and scaled up) against the batched replicates of GroupedKaplanMeier, in
+this process and spread over a process pool.
+
+    python -m benchmarks.bench_bootstrap --replicates 10000 --processes 4
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from lifelines import KaplanMeierFitter
+
+from kaplan_meier import GroupedKaplanMeier
+
+# the positions plotted by survival_function_nfl.py
+POSITIONS = ["QB", "RB", "WR", "TE", "T", "G", "C", "DE", "DT", "NT", "LB",
+             "DB", "FB", "K", "P"]
+
+
+def load(csv):
+    df = pd.read_csv(csv, usecols=["Duration", "Retired", "Pos"])
+    df.loc[df.Pos == "HB", "Pos"] = "RB"
+    df.loc[df.Pos.isin(["SS", "FS", "S", "CB"]), "Pos"] = "DB"
+    df.loc[df.Pos.isin(["OLB", "ILB"]), "Pos"] = "LB"
+    return df.loc[df.Pos.isin(POSITIONS)]
+
+
+def lifelines_seconds_per_replicate(df, n_replicates, seed=0):
+    """
+    Return the seconds one lifelines refit of every position takes.
+    """
+    rng = np.random.default_rng(seed)
+    groups = [group for _, group in df.groupby("Pos")]
+    start = time.perf_counter()
+    for _ in range(n_replicates):
+        for group in groups:
+            sample = group.iloc[rng.integers(0, len(group), len(group))]
+            KaplanMeierFitter().fit(sample.Duration,
+                                    sample.Retired).median_survival_time_
+    return (time.perf_counter() - start) / n_replicates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--csv", default="nfl_survival_analysis_data.csv")
+    parser.add_argument("--replicates", type=int, default=10000)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--lifelines-replicates", type=int, default=20,
+                        help="replicates actually run through lifelines")
+    args = parser.parse_args()
+
+    df = load(args.csv)
+    km = GroupedKaplanMeier().fit(df.Duration, df.Retired, df.Pos)
+
+    lifelines_s = args.replicates * lifelines_seconds_per_replicate(
+        df, args.lifelines_replicates)
+
+    start = time.perf_counter()
+    serial = km.bootstrap_median_ci(args.replicates, seed=0)
+    serial_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pooled = km.bootstrap_median_ci(args.replicates, seed=0,
+                                    processes=args.processes)
+    pooled_s = time.perf_counter() - start
+
+    # the draws only depend on the seed
+    assert serial.equals(pooled)
+
+    print("{} positions x {} replicates".format(len(km.groups_),
+                                                args.replicates))
+    print("{:>28} {:>10}".format("mode", "seconds"))
+    print("{:>28} {:>10.0f}".format("lifelines refits (scaled)", lifelines_s))
+    print("{:>28} {:>10.2f}".format("batched", serial_s))
+    print("{:>28} {:>10.2f}".format(
+        "batched, {} processes".format(args.processes), pooled_s))
+    print()
+    print(serial)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Re-upserting a scrape into the NFL draft store with the row and page
+fingerprints of changes.py, against reading the stored years back and
+comparing every row (what upsert_table did before). Runs on a copy of the
+committed draft data, once with nothing changed and once with a few career
+columns changed, and checks the changelog has exactly those changes. The
+fingerprint times include writing the changed years back.
+
+    python -m benchmarks.bench_changes
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+import changes
+from cleaning import coerce_to_schema
+from storage import NFL_DRAFT_SCHEMA, read_csv, read_table
+from upsert import keyed_rows, merge_sorted, upsert_table
+
+NFL_DRAFT_CSV = "pfr_nfl_draft_data_CLEAN.csv"
+
+
+def compare_rows(df, path):
+    new = keyed_rows(df.reindex(columns=NFL_DRAFT_SCHEMA.names), "Pick")
+    existing = keyed_rows(read_table(
+        path, years=new.Draft_Yr.unique().tolist()), "Pick")
+    return merge_sorted(existing, new, "Pick")[1]
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--changed", type=int, default=25,
+                        help="rows to change CarAV and G of")
+    args = parser.parse_args()
+
+    draft_df = coerce_to_schema(read_csv(NFL_DRAFT_CSV), NFL_DRAFT_SCHEMA)
+    draft_df = keyed_rows(draft_df, "Pick")
+    changed_df = draft_df.copy()
+    rows = np.random.default_rng(0).choice(len(changed_df), args.changed,
+                                           replace=False)
+    changed_df.loc[rows, "CarAV"] += 1
+    changed_df.loc[rows, "G"] += 16
+
+    out_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(out_dir, "nfl_draft")
+        upsert_table(draft_df, path, NFL_DRAFT_SCHEMA, "Pick")
+        run = changes.last_run(path)
+
+        print("{} rows, {} of them changed in the second scrape".format(
+            len(draft_df), args.changed))
+        print("{:>24} {:>12} {:>14}".format("", "unchanged", "with changes"))
+        compared = [timed(compare_rows, df, path)
+                    for df in (draft_df, changed_df)]
+        print("{:>24} {:>10.1f}ms {:>12.1f}ms".format(
+            "read and compare rows", *(s * 1000 for _, s in compared)))
+        upserted = [timed(upsert_table, df, path, NFL_DRAFT_SCHEMA, "Pick")
+                    for df in (draft_df, changed_df)]
+        print("{:>24} {:>10.1f}ms {:>12.1f}ms".format(
+            "fingerprints", *(s * 1000 for _, s in upserted)))
+        assert [counts for counts, _ in upserted] == [
+            counts for counts, _ in compared]
+
+        log = changes.read_changelog(path, since=run)
+        assert sorted(log.column.unique()) == ["CarAV", "G"], log
+        assert len(log) == 2 * args.changed, log
+        print("changelog: {} entries".format(len(log)))
+    finally:
+        shutil.rmtree(out_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Crawl stand-in player pages from a local server with player_crawler.py,
+stopping part way through to check that the next run resumes from the
+frontier without fetching any page twice, then time a full crawl at a few
+concurrency levels.
+
+    python -m benchmarks.bench_crawler --players 1000 --latency 0.05
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from player_crawler import Frontier, crawl, load_seasons
+from throttle import Scheduler
+from benchmarks.fixture_pages import PageServer, nfl_player_pages
+
+
+def run(server, paths, db, concurrency, limit=None):
+    frontier = Frontier(db)
+    try:
+        frontier.add([os.path.basename(path)[:-4] for path in paths],
+                     [server.base_url + path for path in paths])
+        start = time.perf_counter()
+        crawl(frontier, concurrency=concurrency, limit=limit,
+              scheduler=Scheduler(max_concurrency=concurrency,
+                                  initial_concurrency=concurrency),
+              progress=None)
+        return time.perf_counter() - start, frontier.counts()
+    finally:
+        frontier.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32])
+    args = parser.parse_args()
+
+    pages = nfl_player_pages(args.players)
+    paths = sorted(pages)
+    with PageServer(pages, latency=args.latency) as server, \
+            tempfile.TemporaryDirectory() as tmp:
+        # kill the crawl half way, then resume it
+        db = os.path.join(tmp, "resume.db")
+        run(server, paths, db, concurrency=8, limit=len(paths) // 2)
+        _, counts = run(server, paths, db, concurrency=8)
+        assert counts == {"done": len(paths)}, counts
+        refetched = [path for path in paths if server.requests[path] > 1]
+        assert not refetched, refetched
+        seasons = load_seasons(db)
+        print("resumed crawl: {} players, {} season rows, no page fetched "
+              "twice".format(len(paths), len(seasons)))
+        print()
+
+        print("{} players, {:.0f} ms server latency".format(
+            len(paths), args.latency * 1000))
+        print("{:>12} {:>10} {:>14}".format("concurrency", "seconds",
+                                            "players/s"))
+        for level in args.levels:
+            db = os.path.join(tmp, "crawl_{}.db".format(level))
+            elapsed, _ = run(server, paths, db, concurrency=level)
+            print("{:>12} {:>10.2f} {:>14.0f}".format(
+                level, elapsed, len(paths) / elapsed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Drawing the CarAV by Pick points as a scatter (one marker per point, what
+sns.regplot and plt.scatter draw) against the density image of density.py,
+for copies of the committed draft data scaled up to millions of points. Times
+drawing the chart to PNG and SVG and reports the size of the SVG.
+
+    python -m benchmarks.bench_density --sizes 10000 100000 1000000
+"""
+import argparse
+import io
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from cleaning import convert_numeric
+from density import density_plot
+from nfl_draft import drafts_until_2010
+
+EXTENT = (-5, 500, -5, 200)
+
+
+def scatter(ax, x, y):
+    ax.scatter(x, y, alpha=0.5)
+
+
+def density(ax, x, y):
+    density_plot(x, y, ax=ax, extent=EXTENT, bins=(101, 41))
+
+
+def draw(plot, x, y, fmt):
+    """
+    Return the seconds it takes to draw and save the chart, and the bytes
+    saved.
+    """
+    start = time.perf_counter()
+    fig, ax = plt.subplots()
+    plot(ax, x, y)
+    out = io.BytesIO()
+    fig.savefig(out, format=fmt)
+    plt.close(fig)
+    return time.perf_counter() - start, out.tell()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--csv", default="pfr_nfl_draft_data_CLEAN.csv")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10000, 100000, 1000000])
+    parser.add_argument("--max-scatter", type=int, default=100000,
+                        help="don't draw scatters of more points than this")
+    args = parser.parse_args()
+
+    df = convert_numeric(pd.read_csv(args.csv, usecols=["Draft_Yr", "Pick",
+                                                        "CarAV"]))
+    df = drafts_until_2010(df.fillna(0))
+    base_x = df.Pick.to_numpy(float)
+    base_y = df.CarAV.to_numpy(float)
+    rng = np.random.default_rng(0)
+
+    print("{:>10} {:>8} {:>8} {:>8} {:>10}".format(
+        "points", "mode", "png s", "svg s", "svg KB"))
+    for size in args.sizes:
+        # resample the draft rows, jittered so the copies don't coincide
+        rows = rng.integers(0, len(base_x), size)
+        x = base_x[rows] + rng.uniform(-0.5, 0.5, size)
+        y = base_y[rows] + rng.uniform(-0.5, 0.5, size)
+        for name, plot in [("scatter", scatter), ("density", density)]:
+            if plot is scatter and size > args.max_scatter:
+                continue
+            png_s, _ = draw(plot, x, y, "png")
+            svg_s, svg_bytes = draw(plot, x, y, "svg")
+            print("{:>10} {:>8} {:>8.2f} {:>8.2f} {:>10.0f}".format(
+                size, name, png_s, svg_s, svg_bytes / 1024))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Wall-clock time to fetch every NFL draft page against a local stand-in for
+pro-football-reference, for the old serial urlopen loop and for fetch_pages
+at several concurrency levels.
+
+    python -m benchmarks.bench_fetch --latency 0.1
+"""
+import argparse
+import time
+from urllib.request import urlopen
+
+from fetch import fetch_pages
+from benchmarks.fixture_pages import NFL_PATH_TEMPLATE, PageServer, nfl_pages
+
+YEARS = range(1967, 2018)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.1,
+                        help="seconds the server waits before each response")
+    parser.add_argument("--levels", type=int, nargs="+",
+                        default=[1, 2, 4, 8, 16, 32],
+                        help="concurrency levels to time")
+    args = parser.parse_args()
+
+    pages = nfl_pages(YEARS)
+    with PageServer(pages, latency=args.latency) as server:
+        urls = [server.base_url + NFL_PATH_TEMPLATE.format(year=year)
+                for year in YEARS]
+        expected = [pages[NFL_PATH_TEMPLATE.format(year=year)]
+                    for year in YEARS]
+
+        print("{} pages, {:.0f} ms server latency".format(
+            len(urls), args.latency * 1000))
+        print("{:>22} {:>10}".format("mode", "seconds"))
+
+        start = time.perf_counter()
+        serial = [urlopen(url).read() for url in urls]
+        print("{:>22} {:>10.2f}".format("serial urlopen",
+                                         time.perf_counter() - start))
+        assert serial == expected
+
+        for level in args.levels:
+            start = time.perf_counter()
+            fetched = fetch_pages(urls, concurrency=level)
+            elapsed = time.perf_counter() - start
+            # the pages have to come back in year order
+            assert fetched == expected
+            print("{:>22} {:>10.2f}".format(
+                "fetch_pages x{}".format(level), elapsed))
+
+
+if __name__ == "__main__":
+    main()
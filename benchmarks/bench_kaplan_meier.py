@@ -0,0 +1,66 @@
+"""
+One lifelines KaplanMeierFitter per stratum against a single
+GroupedKaplanMeier fit over all of them, on the survival data sliced by
+position x round x draft decade (and coarser strata). Every group's event
+table, curve, confidence bounds and median are checked against lifelines.
+
+    python -m benchmarks.bench_kaplan_meier
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from lifelines import KaplanMeierFitter
+
+from kaplan_meier import GroupedKaplanMeier
+
+STRATA = [["Pos"], ["Pos", "Rnd"], ["Pos", "Rnd", "Decade"],
+          ["Tm", "Rnd", "Decade"]]
+
+
+def fit_lifelines(df, keys):
+    fits = {}
+    for key, group in df.groupby(keys):
+        fits[key] = KaplanMeierFitter().fit(group.Duration, group.Retired)
+    return fits
+
+
+def check(km, fits):
+    for key, kmf in fits.items():
+        sf = km.survival_function(key if len(key) > 1 else key[0])
+        assert np.allclose(sf.index, kmf.survival_function_.index)
+        assert np.allclose(sf.KM_estimate, kmf.survival_function_.iloc[:, 0])
+        assert np.allclose(sf[["lower", "upper"]],
+                           kmf.confidence_interval_.to_numpy())
+        assert km.median_.loc[key].item() == kmf.median_survival_time_
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--csv", default="nfl_survival_analysis_data.csv")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv, usecols=["Duration", "Retired", "Pos", "Rnd",
+                                        "Tm", "Draft_Yr"])
+    df["Decade"] = df.Draft_Yr // 10 * 10
+
+    print("{:>22} {:>8} {:>12} {:>10} {:>8}".format(
+        "strata", "groups", "lifelines s", "grouped s", "speedup"))
+    for keys in STRATA:
+        start = time.perf_counter()
+        fits = fit_lifelines(df, keys)
+        lifelines_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        km = GroupedKaplanMeier().fit(df.Duration, df.Retired, df[keys])
+        grouped_s = time.perf_counter() - start
+
+        check(km, fits)
+        print("{:>22} {:>8} {:>12.3f} {:>10.3f} {:>7.0f}x".format(
+            " x ".join(keys), len(fits), lifelines_s, grouped_s,
+            lifelines_s / grouped_s))
+
+
+if __name__ == "__main__":
+    main()
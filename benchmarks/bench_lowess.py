@@ -0,0 +1,93 @@
+"""
+The LOWESS fits behind the CarAV by Pick charts in nfl_draft.py: refitting
+every curve with statsmodels for each chart (what regplot/lmplot do) against
+the binned fit and the curve cache of lowess.py. Every binned curve is
+checked against the exact fit, its largest difference has to stay within
+--tolerance of the curve's range.
+
+    python -m benchmarks.bench_lowess
+"""
+import argparse
+import tempfile
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import lowess
+from cleaning import convert_numeric
+from nfl_draft import drafts_until_2010, main_positions
+
+# the curves each chart fits: the one over all players (regplot) and the
+# one of every position (the hue and the col lmplot)
+CHART_FITS = [False, True, True]
+
+
+def curves(df, by_position, fit):
+    if not by_position:
+        return [fit(df.Pick.to_numpy(float), df.CarAV.to_numpy(float))]
+    return [fit(group.Pick.to_numpy(float), group.CarAV.to_numpy(float))
+            for _, group in df.groupby("Pos")]
+
+
+def time_charts(df, fit):
+    start = time.perf_counter()
+    for by_position in CHART_FITS:
+        curves(df, by_position, fit)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--csv", default="pfr_nfl_draft_data_CLEAN.csv")
+    parser.add_argument("--tolerance", type=float, default=0.02)
+    args = parser.parse_args()
+
+    df = convert_numeric(pd.read_csv(args.csv, usecols=["Draft_Yr", "Pick",
+                                                        "Pos", "CarAV"]))
+    df = main_positions(drafts_until_2010(df.fillna(0)))
+
+    # statsmodels warns about the flat curve of the header rows
+    warnings.simplefilter("ignore", RuntimeWarning)
+
+    print("{:>6} {:>6} {:>10} {:>10} {:>10}".format(
+        "group", "n", "exact s", "binned s", "max diff"))
+    groups = [("all", df)] + list(df.groupby("Pos"))
+    for name, group in groups:
+        x = group.Pick.to_numpy(float)
+        y = group.CarAV.to_numpy(float)
+        start = time.perf_counter()
+        xs, exact = lowess.exact_lowess(x, y)
+        exact_s = time.perf_counter() - start
+        start = time.perf_counter()
+        centers, binned = lowess.binned_lowess(x, y)
+        binned_s = time.perf_counter() - start
+
+        diff = np.abs(np.interp(xs, centers, binned) - exact).max()
+        assert diff <= args.tolerance * max(np.ptp(exact), 1), name
+        print("{:>6} {:>6} {:>10.4f} {:>10.4f} {:>10.4f}".format(
+            name, len(group), exact_s, binned_s, diff))
+
+    refit_s = time_charts(df, lowess.exact_lowess)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        def cached(x, y):
+            return lowess.cached_lowess(x, y, cache_dir=cache_dir)
+
+        lowess._curves.clear()
+        cold_s = time_charts(df, cached)
+        # another process with an empty memory cache reads the files
+        lowess._curves.clear()
+        disk_s = time_charts(df, cached)
+        warm_s = time_charts(df, cached)
+
+    print()
+    print("fits for the three charts:")
+    print("  statsmodels for every chart   {:.3f} s".format(refit_s))
+    print("  binned + cache, first run     {:.3f} s".format(cold_s))
+    print("  from the cache files          {:.3f} s".format(disk_s))
+    print("  from memory                   {:.3f} s".format(warm_s))
+
+
+if __name__ == "__main__":
+    main()
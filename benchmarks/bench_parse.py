@@ -0,0 +1,81 @@
+"""
+Per-page parse time of the old BeautifulSoup/html5lib path against the lxml
+table extractor, on stand-in NFL and NBA draft pages. Both paths have to
+produce identical rows, and the extractor's Is_Active flags have to match
+the bolded players the old "#drafts strong a" selection found.
+
+    python -m benchmarks.bench_parse
+"""
+import argparse
+import time
+
+from bs4 import BeautifulSoup
+
+from table_extract import extract_draft_table, extract_player_data, extract_table
+from benchmarks.fixture_pages import nba_pages, nfl_pages
+
+NFL_YEARS = [1967, 1985, 1993, 1994, 2005, 2017]
+NBA_YEARS = [1966, 1990, 2014, 2017]
+
+
+def soup_nfl(html):
+    # the parse code from nfl_draft.py before the extractor, plus the active
+    # players data_prep.py selected from a second download of the page
+    soup = BeautifulSoup(html, "html5lib")
+    column_headers = [th.getText() for th in
+                      soup.find_all('tr', limit=2)[1].find_all('th')]
+    column_headers.extend(["Player_NFL_Link", "Player_NCAA_Link", "Is_Active"])
+    table_rows = soup.select("#drafts tr")[2:]
+    active_links = {player["href"] for player in
+                    soup.select("#drafts strong a")}
+    player_data = extract_player_data(table_rows)
+    for row in player_data:
+        row.append(row[-2] in active_links)
+    return column_headers, player_data
+
+
+def soup_nba(html):
+    # the parse code from draft.py before the extractor
+    soup = BeautifulSoup(html, "html5lib")
+    column_headers = [th.getText() for th in
+                      soup.find_all('tr', limit=2)[1].find_all('th')]
+    data_rows = soup.find_all('tr')[2:]
+    return column_headers, [[td.getText() for td in row.find_all(['td', 'th'])]
+                            for row in data_rows]
+
+
+def best_of(func, html, repeat):
+    """
+    Return the fastest of repeat runs of func(html) in milliseconds.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(html)
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cases = ([("NFL", year, page, soup_nfl, extract_draft_table)
+              for year, page in zip(NFL_YEARS, nfl_pages(NFL_YEARS).values())] +
+             [("NBA", year, page, soup_nba,
+               lambda html: extract_table(html, "stats"))
+              for year, page in zip(NBA_YEARS, nba_pages(NBA_YEARS).values())])
+
+    print("{:>6} {:>6} {:>8} {:>12} {:>12} {:>8}".format(
+        "league", "year", "KB", "soup ms", "lxml ms", "speedup"))
+    for league, year, page, old, new in cases:
+        assert old(page) == new(page), (league, year)
+        old_ms = best_of(old, page, args.repeat)
+        new_ms = best_of(new, page, args.repeat)
+        print("{:>6} {:>6} {:>8.0f} {:>12.2f} {:>12.2f} {:>7.1f}x".format(
+            league, year, len(page) / 1024, old_ms, new_ms, old_ms / new_ms))
+
+
+if __name__ == "__main__":
+    main()
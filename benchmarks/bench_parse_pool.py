@@ -0,0 +1,66 @@
+"""
+Fetching and parsing NFL draft pages with the parsing in 1 to N worker
+processes (parse_pool.py), against fetching everything and then parsing in
+the main process. The recorded fixture pages are served over and over from
+a local server with a fixed latency per request, and every run has to come
+back with the same records.
+
+    python -m benchmarks.bench_parse_pool --pages 120 --latency 0.05
+"""
+import argparse
+import itertools
+import os
+import time
+
+from benchmarks.fixture_pages import PageServer
+from benchmarks.suite import load_fixtures
+from extract_spec import NFL_DRAFT, extract_records
+from fetch import fetch_pages
+from parse_pool import fetch_and_parse
+
+
+def serial(urls):
+    return [extract_records(NFL_DRAFT, html) for html in fetch_pages(urls)]
+
+
+def pooled(processes):
+    return lambda urls: fetch_and_parse(urls, NFL_DRAFT, processes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=120)
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="seconds the server waits before every response")
+    parser.add_argument("--max-processes", type=int,
+                        default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    fixtures = list(load_fixtures()["nfl"].values())
+    # a different path for every page, so nothing is served from a cache
+    pages = {"/page/{}.htm".format(i): html for i, html in
+             zip(range(args.pages), itertools.cycle(fixtures))}
+
+    print("{} cores, {} pages, {:.0f} ms latency".format(
+        os.cpu_count(), args.pages, args.latency * 1000))
+    print("{:>22} {:>10} {:>8}".format("", "seconds", "speedup"))
+    with PageServer(pages, latency=args.latency) as server:
+        urls = [server.base_url + path for path in pages]
+        runs = [("fetch, then parse", serial)] + [
+            ("{} parse process{}".format(n, "" if n == 1 else "es"),
+             pooled(n)) for n in range(1, args.max_processes + 1)]
+        expected = None
+        baseline = None
+        for name, run in runs:
+            start = time.perf_counter()
+            records = run(urls)
+            seconds = time.perf_counter() - start
+            if expected is None:
+                expected, baseline = records, seconds
+            assert records == expected, name
+            print("{:>22} {:>10.2f} {:>7.2f}x".format(name, seconds,
+                                                      baseline / seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Player lookups the way ad-hoc scripts do them now (read the draft csv and
+the links csv with pandas and filter) against the indexed queries of
+player_db.py. Both have to find the same players. Builds players.db first
+if it doesn't exist.
+
+    python -m benchmarks.bench_player_db
+"""
+import argparse
+import os
+import time
+
+import pandas as pd
+
+import player_db
+from cleaning import coerce_to_schema
+from storage import NFL_DRAFT_SCHEMA
+
+
+def pandas_lookups(player_id, college, position, years, last_pick):
+    draft_df = coerce_to_schema(pd.read_csv(player_db.NFL_DRAFT_CSV),
+                                NFL_DRAFT_SCHEMA)
+    links = pd.read_csv(player_db.NFL_LINKS_CSV, index_col=0)
+    player = draft_df[draft_df.Player_ID == player_id].merge(
+        links[["Player_ID", "Player_NFL_Link"]], on="Player_ID")
+    by_college = draft_df[(draft_df.College == college) &
+                          (draft_df.Pos == position)]
+    picks = draft_df[draft_df.Draft_Yr.between(*years) &
+                     (draft_df.Pick >= 1) & (draft_df.Pick <= last_pick)]
+    return len(player), len(by_college), len(picks)
+
+
+def db_lookups(db, player_id, college, position, years, last_pick):
+    player = db.player(player_id)
+    by_college = db.players(college=college, position=position)
+    picks = db.picks(years[0], years[1], 1, last_pick)
+    return int(player is not None), len(by_college), len(picks)
+
+
+def best_of(func, repeat, *args):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        times.append(time.perf_counter() - start)
+    return result, min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", default=player_db.DEFAULT_DB)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        nfl_draft_df, nfl_players_df = player_db.load_nfl_draft()
+        player_db.build_database(args.db, nfl_draft_df, nfl_players_df,
+                                 player_db.load_nba_draft())
+
+    lookup = ("SmitBu00", "Michigan St.", "DE", (1990, 1999), 10)
+    expected, pandas_s = best_of(pandas_lookups, args.repeat, *lookup)
+    with player_db.PlayerDB(args.db) as db:
+        found, db_s = best_of(db_lookups, args.repeat, db, *lookup)
+    assert found == expected, (found, expected)
+
+    print("player, college + position and pick range lookups "
+          "({} / {} / {} rows):".format(*found))
+    print("  pandas, load the csv files and filter  {:8.2f} ms".format(
+        pandas_s * 1000))
+    print("  player_db.PlayerDB                     {:8.2f} ms".format(
+        db_s * 1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Load time and loaded frame size of the analysis scripts' reads: the whole csv
+against only the needed columns from the year-partitioned store. The csv
+files are stacked scale times to see how both grow with the data.
+
+    python -m benchmarks.bench_storage --scale 10
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from storage import (NBA_DRAFT_SCHEMA, NFL_SURVIVAL_SCHEMA, read_table,
+                     write_table)
+
+CASES = [
+    # (name, csv file, csv kwargs, schema, columns the script reads)
+    ("survival_function_nfl", "nfl_survival_analysis_data.csv", {},
+     NFL_SURVIVAL_SCHEMA, ["Duration", "Retired", "Pos"]),
+    ("visualizing_draft_nba", "draft_data_1966_to_2018.csv",
+     {}, NBA_DRAFT_SCHEMA,
+     ["Draft_Yr", "Pk", "Player", "WS_per_48"]),
+]
+
+
+def measure(func):
+    """
+    Return (seconds, MB of the returned frame) for one call of func.
+    """
+    start = time.perf_counter()
+    df = func()
+    elapsed = time.perf_counter() - start
+    return elapsed, df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", type=int, default=1,
+                        help="how many copies of each csv to stack")
+    args = parser.parse_args()
+
+    print("{:>24} {:>10} {:>10} {:>10} {:>10}".format(
+        "reader", "csv s", "csv MB", "store s", "store MB"))
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, csv_file, csv_kwargs, schema, columns in CASES:
+            df = pd.read_csv(csv_file, **csv_kwargs)
+            df = pd.concat([df] * args.scale, ignore_index=True)
+            csv_path = os.path.join(tmp, name + ".csv")
+            store_path = os.path.join(tmp, name)
+            write_table(df, store_path, schema, csv_path=csv_path, index=False)
+
+            csv_s, csv_mb = measure(lambda: pd.read_csv(csv_path))
+            store_s, store_mb = measure(
+                lambda: read_table(store_path, columns=columns))
+            print("{:>24} {:>10.3f} {:>10.1f} {:>10.3f} {:>10.1f}".format(
+                name, csv_s, csv_mb, store_s, store_mb))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Peak memory of a regular NFL scrape against --stream mode, from the parsed
+pages to the files written, for more and more draft pages (the recorded
+fixture pages over and over). The regular scrape grows with the number of
+pages, the streaming one should stay flat.
+
+    python -m benchmarks.bench_streaming
+"""
+import argparse
+import itertools
+import tempfile
+import time
+import tracemalloc
+from os.path import join
+
+import nfl_draft
+from benchmarks.suite import load_fixtures
+from storage import NFL_DRAFT_SCHEMA, write_table
+
+
+def pages_for(fixtures, count):
+    """
+    Return the years and a lazy iterable of count draft pages.
+    """
+    pairs = list(itertools.islice(itertools.cycle(fixtures.items()), count))
+    return [year for year, _ in pairs], (page for _, page in pairs)
+
+
+def batch_scrape(years, pages, out_dir):
+    draft_df, _ = nfl_draft.build_draft_df(years, list(pages))
+    draft_df, player_id_df = nfl_draft.clean_draft_df(draft_df)
+    # only the rows with a pick number, like the stores and stream_drafts
+    # (not keyed_rows, the repeated fixture pages share their keys)
+    keyed = (draft_df.Pick > 0).to_numpy()
+    draft_df = draft_df[keyed]
+    player_id_df = nfl_draft.with_keys(player_id_df[keyed], draft_df)
+    player_id_df[nfl_draft.PLAYER_ID_COLUMNS].to_csv(join(out_dir, "ids.csv"))
+    write_table(draft_df, join(out_dir, "store"), NFL_DRAFT_SCHEMA,
+                csv_path=join(out_dir, "draft.csv"), index=False)
+    return len(draft_df)
+
+
+def stream_scrape(years, pages, out_dir, chunk_size):
+    rows, _ = nfl_draft.stream_drafts(years, pages, chunk_size,
+                                      join(out_dir, "store"),
+                                      join(out_dir, "draft.csv"),
+                                      join(out_dir, "ids.csv"))
+    return rows
+
+
+def measure(scrape, fixtures, count, *args):
+    years, pages = pages_for(fixtures, count)
+    with tempfile.TemporaryDirectory() as out_dir:
+        tracemalloc.start()
+        start = time.perf_counter()
+        rows = scrape(years, pages, out_dir, *args)
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return rows, seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, nargs="+",
+                        default=[6, 30, 120])
+    parser.add_argument("--chunk-size", type=int,
+                        default=nfl_draft.DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    fixtures = load_fixtures()["nfl"]
+    print("{:>6} {:>8} {:>10} {:>10} {:>10} {:>10}".format(
+        "pages", "rows", "batch s", "batch MB", "stream s", "stream MB"))
+    for count in args.pages:
+        rows, batch_s, batch_peak = measure(batch_scrape, fixtures, count)
+        stream_rows, stream_s, stream_peak = measure(
+            stream_scrape, fixtures, count, args.chunk_size)
+        assert rows == stream_rows
+        print("{:>6} {:>8} {:>10.2f} {:>10.1f} {:>10.2f} {:>10.1f}".format(
+            count, rows, batch_s, batch_peak / 1e6, stream_s,
+            stream_peak / 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Time the old row-wise survival data prep from data_prep.py against
+survival_data.build_survival_dataset on a synthetic frame made by stacking
+copies of the clean NFL draft data. Both have to give the same result.
+
+    python -m benchmarks.bench_survival_data --rows 3000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from cleaning import convert_numeric
+from survival_data import INT_COLS, build_survival_dataset
+
+
+def calc_duration(player):
+    # the per-row function data_prep.py used to apply
+    if player["To"] == 0:
+        return 0
+    return player["To"] - player["Draft_Yr"] + 1
+
+
+def old_prep(draft_df, active_ids, as_of):
+    # the cleaning steps data_prep.py used to run, one full frame copy each
+    draft_df = convert_numeric(draft_df)
+    num_cols = draft_df.select_dtypes("number").columns
+    draft_df[num_cols] = draft_df[num_cols].fillna(0)
+    draft_df = draft_df.loc[draft_df.Draft_Yr < as_of]
+    active = draft_df.Player_ID.isin(active_ids)
+    draft_df["Retired"] = (~active).astype(int)
+    draft_df.loc[draft_df.Player == "Mike Kafka", "Retired"] = 1
+    draft_df["Duration"] = draft_df.apply(lambda player: calc_duration(player),
+                                          axis=1)
+    draft_df[INT_COLS] = draft_df[INT_COLS].astype(int)
+    return draft_df.reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1000000)
+    args = parser.parse_args()
+
+    draft_df = pd.read_csv("pfr_nfl_draft_data_CLEAN.csv")
+    survival_df = pd.read_csv("nfl_survival_analysis_data.csv",
+                              usecols=["Player_ID", "Retired"])
+    active_ids = set(survival_df.loc[survival_df.Retired == 0, "Player_ID"])
+
+    # start from typed data, the way data_prep.py gets it from the store
+    draft_df = convert_numeric(draft_df)
+    num_cols = draft_df.select_dtypes("number").columns
+    draft_df[num_cols] = draft_df[num_cols].fillna(0)
+
+    copies = -(-args.rows // len(draft_df))
+    big_df = pd.concat([draft_df] * copies, ignore_index=True).iloc[:args.rows]
+    print("{} rows".format(len(big_df)))
+
+    start = time.perf_counter()
+    new = build_survival_dataset(big_df, active_ids, as_of=2016)
+    new_s = time.perf_counter() - start
+    print("{:>24} {:>8.2f} s".format("build_survival_dataset", new_s))
+
+    start = time.perf_counter()
+    old = old_prep(big_df, active_ids, 2016)
+    old_s = time.perf_counter() - start
+    print("{:>24} {:>8.2f} s".format("row-wise apply", old_s))
+    print("{:>24} {:>8.1f}x".format("speedup", old_s / new_s))
+
+    pd.testing.assert_frame_equal(new, old, check_dtype=False)
+    assert np.array_equal(new.Duration.to_numpy(), old.Duration.to_numpy())
+
+    # careers observed up to an earlier season leave out the later drafts
+    # instead of giving them a negative Duration
+    observed = build_survival_dataset(big_df, active_ids, as_of=2016,
+                                      last_season=2010)
+    assert (observed.Draft_Yr <= 2010).all()
+    assert (observed.Duration >= 0).all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Run fetch_pages against a local stand-in server that throttles like the
+sports-reference sites: it answers 429 to anything over max_in_flight
+concurrent requests and 503 to a share of the rest, with a Retry-After.
+Every page has to come back, and the report shows how many attempts and
+retries that took and where the AIMD concurrency limit settled.
+
+    python -m benchmarks.bench_throttle --max-in-flight 4 --error-rate 0.05
+"""
+import argparse
+import time
+
+from fetch import fetch_pages
+from throttle import Scheduler
+from benchmarks.fixture_pages import NFL_PATH_TEMPLATE, PageServer, nfl_pages
+
+YEARS = range(1967, 2018)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--max-in-flight", type=int, default=4)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    pages = nfl_pages(YEARS)
+    with PageServer(pages, latency=args.latency,
+                    max_in_flight=args.max_in_flight,
+                    error_rate=args.error_rate,
+                    retry_after=args.retry_after) as server:
+        urls = [server.base_url + NFL_PATH_TEMPLATE.format(year=year)
+                for year in YEARS]
+        expected = [pages[NFL_PATH_TEMPLATE.format(year=year)]
+                    for year in YEARS]
+
+        scheduler = Scheduler(max_concurrency=args.max_concurrency,
+                              max_attempts=10, base_delay=0.1, seed=0)
+        start = time.perf_counter()
+        fetched = fetch_pages(urls, scheduler=scheduler)
+        elapsed = time.perf_counter() - start
+
+        # nothing may be lost, and everything comes back in year order
+        assert fetched == expected
+
+        print("pages             {}".format(len(urls)))
+        print("seconds           {:.2f}".format(elapsed))
+        print("attempts          {}".format(scheduler.attempts))
+        print("retries           {}".format(scheduler.retries))
+        print("429 responses     {}".format(server.requests.get(429, 0)))
+        print("503 responses     {}".format(server.requests.get(503, 0)))
+        print("final limit       {:.1f}".format(scheduler.limit(urls[0])))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+"""
+Stand-in draft pages and a local HTTP server that serves them.
+
+The pages are rebuilt from the csv files in the repository using the same
+table layout as pro-football-reference and basketball-reference: an
+over-header row, the column header row, player rows with the round (or rank)
+in a th cell, repeated header rows inside the body, bolded active players
+and " HOF" suffixes. That is everything the scrapers look at, so they can be
+pointed at the local server instead of the real sites.
+"""
+import hashlib
+import html
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from storage import read_csv
+
+NFL_DRAFT_CSV = "pfr_nfl_draft_data_CLEAN.csv"
+NFL_LINKS_CSV = "pfr_player_ids_and_links.csv"
+NFL_SURVIVAL_CSV = "nfl_survival_analysis_data.csv"
+NBA_DRAFT_CSV = "draft_data_1966_to_2018.csv"
+
+# the paths the real sites use for each draft, so the scrapers' url
+# templates only need a different host
+NFL_PATH_TEMPLATE = "/years/{year}/draft.htm"
+NBA_PATH_TEMPLATE = "/draft/NBA_{year}.html"
+NFL_PLAYER_PATH_TEMPLATE = "/players/{letter}/{player_id}.htm"
+
+# the career totals spread over the seasons of a stand-in player page, by
+# table, as (data-stat, draft csv column)
+NFL_PLAYER_TABLES = [
+    ("passing", [("pass_cmp", "Cmp"), ("pass_att", "Att"),
+                 ("pass_yds", "Yds"), ("pass_td", "TD"),
+                 ("pass_int", "Int")]),
+    ("rushing_and_receiving", [("rush_att", "Rush_Att"),
+                               ("rush_yds", "Rush_Yds"),
+                               ("rush_td", "Rush_TD"), ("rec", "Rec"),
+                               ("rec_yds", "Rec_Yds"), ("rec_td", "Rec_TD")]),
+    ("defense", [("tackles_solo", "Tkl"), ("def_int", "Def_Int"),
+                 ("sacks", "Sk")]),
+]
+
+NFL_STAT_COLS = ["Age", "To", "AP1", "PB", "St", "CarAV", "DrAV", "G", "Cmp",
+                 "Att", "Yds", "TD", "Int", "Rush_Att", "Rush_Yds", "Rush_TD",
+                 "Rec", "Rec_Yds", "Rec_TD", "Tkl", "Def_Int", "Sk"]
+
+NFL_HEADERS = ["Rnd", "Pick", "Tm", "", "Pos", "Age", "To", "AP1", "PB", "St",
+               "CarAV", "DrAV", "G", "Cmp", "Att", "Yds", "TD", "Int", "Att",
+               "Yds", "TD", "Rec", "Yds", "TD", "Tkl", "Int", "Sk",
+               "College/Univ", ""]
+
+NFL_OVER_HEADER = ('<tr class="over_header"><th colspan="13"></th>'
+                   '<th colspan="5">Passing</th><th colspan="3">Rushing</th>'
+                   '<th colspan="3">Receiving</th><th colspan="{}">Defense</th>'
+                   '<th colspan="2"></th></tr>')
+
+NBA_STAT_COLS = ["Yrs", "G", "MP", "PTS", "TRB", "AST", "FG_Perc", "3P_Perc",
+                 "FT_Perc", "MP_per_G", "PTS_per_G", "TRB_per_G", "AST_per_G",
+                 "WS", "WS_per_48", "BPM", "VORP"]
+
+NBA_HEADERS = ["Rk", "Pk", "Tm", "Player", "College", "Yrs", "G", "MP", "PTS",
+               "TRB", "AST", "FG%", "3P%", "FT%", "MP", "PTS", "TRB", "AST",
+               "WS", "WS/48", "BPM", "VORP"]
+
+NBA_OVER_HEADER = ('<tr class="over_header"><th colspan="5"></th>'
+                   '<th colspan="3">Totals</th><th colspan="3">Shooting</th>'
+                   '<th colspan="4">Per Game</th><th colspan="4">Advanced</th>'
+                   '</tr>')
+
+PAGE_TEMPLATE = ("<!DOCTYPE html><html><head><title>{title}</title></head>"
+                 "<body><div id=\"content\"><h1>{title}</h1>"
+                 "<table id=\"{table_id}\" class=\"stats_table\">"
+                 "<thead>{over_header}{header}</thead><tbody>{rows}</tbody>"
+                 "</table></div></body></html>")
+
+
+def _cell_text(value):
+    """
+    Format a csv value the way it shows up in a table cell.
+    """
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, float):
+        return "{:g}".format(value)
+    return html.escape(str(value))
+
+
+def _header_row(headers, css_class=""):
+    cls = ' class="{}"'.format(css_class) if css_class else ""
+    return "<tr{}>{}</tr>".format(
+        cls, "".join("<th>{}</th>".format(html.escape(h)) for h in headers))
+
+
+def _load_nfl():
+    draft_df = pd.read_csv(NFL_DRAFT_CSV, dtype=str)
+    links_df = pd.read_csv(NFL_LINKS_CSV, index_col=0, dtype=str)
+    # the two files were written from the same frame, row for row
+    draft_df["Player_NFL_Link"] = links_df.Player_NFL_Link.values
+    draft_df["Player_NCAA_Link"] = links_df.Player_NCAA_Link.values
+    survival_df = pd.read_csv(NFL_SURVIVAL_CSV, usecols=["Player_ID",
+                                                         "Retired"])
+    active_ids = set(survival_df.loc[survival_df.Retired == 0, "Player_ID"])
+    return draft_df, active_ids
+
+
+def nfl_draft_page(year, draft_df, active_ids):
+    """
+    Return the html for one pro-football-reference draft page.
+    """
+    year_df = draft_df.loc[draft_df.Draft_Yr == str(year)]
+    # drafts before 1994 have no tackles column
+    has_tkl = year >= 1994
+    headers = [h for h in NFL_HEADERS if has_tkl or h != "Tkl"]
+    stat_cols = [c for c in NFL_STAT_COLS if has_tkl or c != "Tkl"]
+
+    rows = []
+    for player in year_df.to_dict("records"):
+        if player["Player"] == "Player":
+            # the repeated header rows inside the table body
+            repeat = list(headers)
+            repeat[3] = "Player"
+            rows.append(_header_row(repeat, "thead"))
+            continue
+
+        name = _cell_text(player["Player"])
+        # use a high Pro Bowl count as a stand-in for the Hall of Fame marker
+        pro_bowls = pd.to_numeric(player["PB"], errors="coerce")
+        hof = " HOF" if pro_bowls >= 8 else ""
+        nfl_link = player["Player_NFL_Link"]
+        if isinstance(player["Player_ID"], str):
+            nfl_path = nfl_link.replace("http://www.pro-football-reference.com",
+                                        "")
+            name_cell = '<a href="{}">{}</a>{}'.format(nfl_path, name, hof)
+        else:
+            name_cell = name + hof
+        # active players are bolded; the survival data only goes up to 2015,
+        # so later drafts count anyone who played past their rookie year
+        last_season = pd.to_numeric(player["To"], errors="coerce")
+        if player["Player_ID"] in active_ids or (
+                year >= 2016 and last_season > year):
+            name_cell = "<strong>{}</strong>".format(name_cell)
+
+        ncaa_link = player["Player_NCAA_Link"]
+        ncaa_cell = ('<a href="{}">College Stats</a>'.format(ncaa_link)
+                     if isinstance(ncaa_link, str) else "")
+
+        cells = ['<th data-stat="draft_round">{}</th>'.format(
+                     _cell_text(player["Rnd"])),
+                 "<td>{}</td>".format(_cell_text(player["Pick"])),
+                 '<td><a href="/teams/{0}/{1}_draft.htm">{2}</a></td>'.format(
+                     str(player["Tm"]).lower(), year,
+                     _cell_text(player["Tm"])),
+                 "<td>{}</td>".format(name_cell),
+                 "<td>{}</td>".format(_cell_text(player["Pos"]))]
+        cells += ["<td>{}</td>".format(_cell_text(player[col]))
+                  for col in stat_cols]
+        cells += ['<td><a href="/schools/">{}</a></td>'.format(
+                      _cell_text(player["College"])),
+                  "<td>{}</td>".format(ncaa_cell)]
+        rows.append("<tr>{}</tr>".format("".join(cells)))
+
+    return PAGE_TEMPLATE.format(
+        title="{} NFL Draft".format(year), table_id="drafts",
+        over_header=NFL_OVER_HEADER.format(3 if has_tkl else 2),
+        header=_header_row(headers), rows="".join(rows))
+
+
+def nba_draft_page(year, draft_df):
+    """
+    Return the html for one basketball-reference draft page.
+    """
+    year_df = draft_df.loc[draft_df.Draft_Yr == year]
+    rows = []
+    rank = 0
+    for player in year_df.to_dict("records"):
+        if player["Player"] == "Player":
+            rows.append(_header_row(NBA_HEADERS, "thead"))
+            continue
+        rank += 1
+        hof = " HOF" if player["WS"] >= 150 else ""
+        name_cell = '<a href="/players/">{}</a>{}'.format(
+            _cell_text(player["Player"]), hof)
+        # the csv has no active flag, so bold the players who have played
+        # every season since they were drafted
+        if 0 < 2018 - year <= player["Yrs"] + 1:
+            name_cell = "<strong>{}</strong>".format(name_cell)
+        cells = ['<th data-stat="pick_overall">{}</th>'.format(rank),
+                 "<td>{}</td>".format(_cell_text(player["Pk"])),
+                 "<td>{}</td>".format(_cell_text(player["Tm"])),
+                 "<td>{}</td>".format(name_cell),
+                 "<td>{}</td>".format(_cell_text(player["College"]))]
+        cells += ["<td>{}</td>".format(_cell_text(player[col]))
+                  for col in NBA_STAT_COLS]
+        rows.append("<tr>{}</tr>".format("".join(cells)))
+
+    return PAGE_TEMPLATE.format(
+        title="{} NBA Draft".format(year), table_id="stats",
+        over_header=NBA_OVER_HEADER, header=_header_row(NBA_HEADERS),
+        rows="".join(rows))
+
+
+def nfl_pages(years):
+    """
+    Return {path: page bytes} for the given NFL draft years.
+    """
+    draft_df, active_ids = _load_nfl()
+    return {NFL_PATH_TEMPLATE.format(year=year):
+            nfl_draft_page(year, draft_df, active_ids).encode("utf-8")
+            for year in years}
+
+
+def nba_pages(years):
+    """
+    Return {path: page bytes} for the given NBA draft years.
+    """
+    draft_df = read_csv(NBA_DRAFT_CSV)
+    return {NBA_PATH_TEMPLATE.format(year=year):
+            nba_draft_page(year, draft_df).encode("utf-8")
+            for year in years}
+
+
+def _number(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if math.isnan(number) else number
+
+
+def nfl_player_page(player):
+    """
+    Return a player page for one row of the NFL draft data: a season row
+    per year from the draft to their last season ('To') in each stats
+    table, with the career totals split evenly. Like the real pages, every
+    table after the first is inside an html comment.
+    """
+    first = int(_number(player["Draft_Yr"])) + 1
+    last = max(first, int(_number(player["To"])))
+    seasons = list(range(first, last + 1))
+    games = _number(player["G"])
+
+    tables = []
+    for table_id, stats in NFL_PLAYER_TABLES:
+        rows = []
+        for i, year in enumerate(seasons):
+            cells = ['<th data-stat="year_id">{}</th>'.format(year),
+                     '<td data-stat="team">{}</td>'.format(
+                         html.escape(str(player["Tm"]))),
+                     '<td data-stat="g">{:.0f}</td>'.format(
+                         games / len(seasons))]
+            for data_stat, column in stats:
+                cells.append('<td data-stat="{}">{:.0f}</td>'.format(
+                    data_stat, _number(player[column]) / len(seasons)))
+            rows.append("<tr>{}</tr>".format("".join(cells)))
+            # the real pages repeat the header every 20 seasons or so
+            if i == 19:
+                rows.append('<tr class="thead"><th>Year</th></tr>')
+        table = ('<table id="{}" class="stats_table"><thead><tr><th>Year'
+                 '</th></tr></thead><tbody>{}</tbody></table>').format(
+                     table_id, "".join(rows))
+        if tables:
+            table = "<div><!--{}--></div>".format(table)
+        tables.append(table)
+    return ("<!DOCTYPE html><html><head><title>{0}</title></head><body>"
+            "<div id=\"content\"><h1>{0}</h1>{1}</div></body></html>").format(
+                html.escape(str(player["Player"])), "".join(tables))
+
+
+def nfl_player_path(player_id):
+    return NFL_PLAYER_PATH_TEMPLATE.format(letter=player_id[0],
+                                           player_id=player_id)
+
+
+def nfl_player_pages(limit=None):
+    """
+    Return {path: page bytes} of the player pages of the first limit
+    drafted NFL players with a Player_ID (all of them by default).
+    """
+    draft_df, _ = _load_nfl()
+    draft_df = draft_df.dropna(subset=["Player_ID"])
+    draft_df = draft_df.drop_duplicates("Player_ID")
+    if limit is not None:
+        draft_df = draft_df.head(limit)
+    return {nfl_player_path(player["Player_ID"]):
+            nfl_player_page(player).encode("utf-8")
+            for player in draft_df.to_dict("records")}
+
+
+class _PageHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so clients can keep their connections alive
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        server.count_request(self.path)
+        try:
+            with server.in_flight_lock:
+                server.in_flight += 1
+                over_limit = (server.max_in_flight is not None and
+                              server.in_flight > server.max_in_flight)
+            self._respond(server, over_limit)
+        finally:
+            with server.in_flight_lock:
+                server.in_flight -= 1
+
+    def _throttle(self, status):
+        self.server.count_request(status)
+        self.send_response(status)
+        self.send_header("Retry-After", str(self.server.retry_after))
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _respond(self, server, over_limit):
+        # too many requests at once, or a random server error
+        if over_limit:
+            self._throttle(429)
+            return
+        if server.error_rate and server.random.random() < server.error_rate:
+            self._throttle(503)
+            return
+        if server.latency:
+            time.sleep(server.latency)
+        page = server.pages.get(self.path)
+        if page is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        # answer conditional requests like the real sites do
+        etag = '"{}"'.format(hashlib.sha1(page).hexdigest())
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(page)))
+        self.end_headers()
+        self.wfile.write(page)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PageServer(ThreadingHTTPServer):
+    """
+    A local HTTP server that serves a dict of {path: page bytes}, with an
+    optional fixed latency added to every response to mimic a remote site.
+
+    It can also throttle like the real sites: with more than max_in_flight
+    requests at once the extra ones get a 429, and error_rate of the
+    requests get a 503, both with a Retry-After of retry_after seconds.
+    requests counts the hits per path, and the 429/503 responses sent.
+    """
+
+    daemon_threads = True
+    # room for every concurrent client to connect without being dropped
+    request_queue_size = 128
+
+    def __init__(self, pages, latency=0.0, max_in_flight=None, error_rate=0.0,
+                 retry_after=1, seed=0, handler=_PageHandler):
+        super().__init__(("127.0.0.1", 0), handler)
+        self.pages = pages
+        self.latency = latency
+        self.max_in_flight = max_in_flight
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.in_flight = 0
+        self.in_flight_lock = threading.Lock()
+        self.requests = {}
+        self._count_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return "http://127.0.0.1:{}".format(self.server_address[1])
+
+    def count_request(self, path):
+        with self._count_lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
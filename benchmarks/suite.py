@@ -0,0 +1,375 @@
+"""
+Stage-level benchmarks of the scrape and analysis pipeline, on recorded
+draft pages.
+
+The pages in benchmarks/fixtures are stand-in NFL and NBA draft pages
+(see fixture_pages.py) recorded once and committed, so every run times
+exactly the same input no matter what the csv files or the page builder
+look like later. Each stage runs on the recorded data and on synthetic
+scale-ups of it (the pages or rows repeated 10x and 100x):
+
+    parse_nfl_soup     BeautifulSoup/html5lib + extract_player_data
+    parse_nfl_lxml     table_extract.extract_draft_table
+    parse_nfl_spec     extract_spec.extract_records with the NFL_DRAFT spec
+    parse_nba          draft.build_draft_df (the NBA_DRAFT spec extraction)
+    clean_nba          draft.clean_draft_df
+    clean_nfl          nfl_draft.clean_draft_df
+    survival_features  survival_data.build_survival_dataset
+    km_fit             GroupedKaplanMeier by position
+    aggregate          aggregates.build_aggregates and the chart rollups
+
+The results are written as a JSON report with the commit and the package
+versions, and two reports can be compared to catch regressions:
+
+    python -m benchmarks.suite --output before.json
+    (upgrade pandas, check out another commit ...)
+    python -m benchmarks.suite --compare before.json
+
+--compare exits with status 1 if any stage got slower than --threshold
+times the baseline. --record rewrites the fixture pages.
+"""
+import argparse
+import datetime
+import gzip
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections import namedtuple
+from importlib import metadata
+
+import pandas as pd
+from bs4 import BeautifulSoup
+
+import draft
+import nfl_draft
+from aggregates import build_aggregates, quantiles, rollup
+from benchmarks.fixture_pages import nba_pages, nfl_pages
+from extract_spec import NFL_DRAFT, extract_records
+from kaplan_meier import GroupedKaplanMeier
+from survival_data import build_survival_dataset
+from table_extract import extract_draft_table, extract_player_data
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "fixtures")
+
+NFL_YEARS = [1967, 1985, 1993, 1994, 2005, 2015]
+NBA_YEARS = [1966, 1990, 2014, 2017]
+
+SCALES = [1, 10, 100]
+DEFAULT_REPEAT = 3
+# a stage stops repeating once its runs took this long in total
+TIME_BUDGET = 10.0
+DEFAULT_THRESHOLD = 1.25
+# and by at least this many seconds, so the noise of the tiny stages doesn't
+# count
+DEFAULT_MIN_SLOWDOWN = 0.005
+
+# the packages whose upgrades we want to catch
+PACKAGES = ["pandas", "numpy", "beautifulsoup4", "html5lib", "lxml",
+            "pyarrow", "lifelines", "statsmodels"]
+
+# setup(fixtures, scale) builds a stage's input outside the timing and
+# run(input) is timed; rows are the rows of the input for the data stages
+# and the rows parsed for the parse stages
+Stage = namedtuple("Stage", ["name", "setup", "run", "max_scale"])
+
+
+def fixture_path(league, year):
+    return os.path.join(FIXTURE_DIR, "{}_{}.html.gz".format(league, year))
+
+
+def record_fixtures():
+    """
+    Rebuild the stand-in pages from the csv files and write them to
+    FIXTURE_DIR.
+    """
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    for league, years, build in [("nfl", NFL_YEARS, nfl_pages),
+                                 ("nba", NBA_YEARS, nba_pages)]:
+        for year, page in zip(years, build(years).values()):
+            # mtime=0 so recording the same page gives the same file
+            with gzip.GzipFile(fixture_path(league, year), "wb",
+                               mtime=0) as f:
+                f.write(page)
+
+
+def load_fixtures():
+    """
+    Return {"nfl": {year: page}, "nba": {year: page}} from FIXTURE_DIR.
+    """
+    fixtures = {}
+    for league, years in [("nfl", NFL_YEARS), ("nba", NBA_YEARS)]:
+        fixtures[league] = {}
+        for year in years:
+            with gzip.open(fixture_path(league, year), "rb") as f:
+                fixtures[league][year] = f.read()
+    return fixtures
+
+
+def scale_up(df, scale):
+    """
+    Return df repeated scale times, as a synthetic larger data set.
+    """
+    return pd.concat([df] * scale, ignore_index=True)
+
+
+def _scaled_pages(pages, scale):
+    return list(pages.items()) * scale
+
+
+# the parse stages
+
+def parse_nfl_soup(pages):
+    rows = []
+    for _, html in pages:
+        soup = BeautifulSoup(html, "html5lib")
+        rows.extend(extract_player_data(soup.select("#drafts tr")[2:]))
+    return rows
+
+
+def parse_nfl_lxml(pages):
+    rows = []
+    for _, html in pages:
+        rows.extend(extract_draft_table(html)[1])
+    return rows
+
+
+def parse_nfl_spec(pages):
+    rows = []
+    for _, html in pages:
+        rows.extend(extract_records(NFL_DRAFT, html))
+    return rows
+
+
+def parse_nba(pages):
+    years = [year for year, _ in pages]
+    return draft.build_draft_df(years, [html for _, html in pages])
+
+
+# the data stages all start from the parsed fixture pages
+
+def raw_nba_df(fixtures):
+    return parse_nba(_scaled_pages(fixtures["nba"], 1))
+
+
+def raw_nfl_df(fixtures):
+    draft_df, errors = nfl_draft.build_draft_df(
+        list(fixtures["nfl"]), list(fixtures["nfl"].values()))
+    assert not errors, errors
+    return draft_df
+
+
+def clean_nba(raw_df):
+    return draft.clean_draft_df(raw_df)
+
+
+def clean_nfl(raw_df):
+    return nfl_draft.clean_draft_df(raw_df)[0]
+
+
+def survival_df(fixtures):
+    return build_survival_dataset(clean_nfl(raw_nfl_df(fixtures)))
+
+
+def survival_features(draft_df):
+    return build_survival_dataset(draft_df)
+
+
+def km_fit(df):
+    return GroupedKaplanMeier().fit(df.Duration, df.Retired,
+                                    df.Pos).survival_function_
+
+
+def aggregate(draft_df):
+    cells = build_aggregates(draft_df)
+    top60 = cells.query("Pk < 61")
+    rollup(cells, "Draft_Yr")
+    rollup(top60, "Draft_Yr")
+    quantiles(top60, [0.05, 0.25, 0.5, 0.75, 0.95], "Pk")
+    return rollup(top60, "Pk")
+
+
+STAGES = [
+    # html5lib is slow enough that 100x would take minutes
+    Stage("parse_nfl_soup",
+          lambda fx, n: _scaled_pages(fx["nfl"], n), parse_nfl_soup, 10),
+    Stage("parse_nfl_lxml",
+          lambda fx, n: _scaled_pages(fx["nfl"], n), parse_nfl_lxml, None),
+    Stage("parse_nfl_spec",
+          lambda fx, n: _scaled_pages(fx["nfl"], n), parse_nfl_spec, None),
+    Stage("parse_nba",
+          lambda fx, n: _scaled_pages(fx["nba"], n), parse_nba, None),
+    Stage("clean_nba", lambda fx, n: scale_up(raw_nba_df(fx), n), clean_nba,
+          None),
+    Stage("clean_nfl", lambda fx, n: scale_up(raw_nfl_df(fx), n), clean_nfl,
+          None),
+    Stage("survival_features",
+          lambda fx, n: scale_up(clean_nfl(raw_nfl_df(fx)), n),
+          survival_features, None),
+    Stage("km_fit", lambda fx, n: scale_up(survival_df(fx), n), km_fit, None),
+    Stage("aggregate", lambda fx, n: scale_up(clean_nba(raw_nba_df(fx)), n),
+          aggregate, None),
+]
+
+
+def time_stage(stage, fixtures, scale, repeat):
+    """
+    Return the result of one stage at one scale for the report.
+    """
+    data = stage.setup(fixtures, scale)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = stage.run(data)
+        times.append(time.perf_counter() - start)
+        if sum(times) > TIME_BUDGET:
+            break
+    rows = len(data) if isinstance(data, pd.DataFrame) else len(output)
+    return {"stage": stage.name, "scale": scale, "rows": rows,
+            "runs": len(times), "best_s": min(times),
+            "median_s": statistics.median(times)}
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"],
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _versions():
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def run_suite(stages=STAGES, scales=SCALES, repeat=DEFAULT_REPEAT,
+              progress=print):
+    """
+    Run the stages at every scale (up to their max_scale) and return the
+    report.
+    """
+    fixtures = load_fixtures()
+    results = []
+    for stage in stages:
+        for scale in scales:
+            if stage.max_scale is not None and scale > stage.max_scale:
+                continue
+            result = time_stage(stage, fixtures, scale, repeat)
+            results.append(result)
+            if progress is not None:
+                progress("{:>18} {:>5}x {:>9} rows {:>10.4f} s".format(
+                    result["stage"], scale, result["rows"],
+                    result["best_s"]))
+    return {
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "packages": _versions(),
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare_reports(baseline, current, threshold=DEFAULT_THRESHOLD,
+                    min_slowdown=DEFAULT_MIN_SLOWDOWN):
+    """
+    Return [(stage, scale, baseline s, current s, ratio)] for every stage
+    and scale in both reports and the ones among them that got slower than
+    threshold times the baseline (and by more than min_slowdown seconds).
+    """
+    before = {(r["stage"], r["scale"]): r["best_s"]
+              for r in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        key = (result["stage"], result["scale"])
+        if key in before:
+            rows.append(key + (before[key], result["best_s"],
+                               result["best_s"] / before[key]))
+    regressions = [row for row in rows
+                   if row[-1] > threshold and row[3] - row[2] > min_slowdown]
+    return rows, regressions
+
+
+def print_comparison(baseline, current, rows, regressions):
+    print("baseline {} ({}), current {} ({})".format(
+        baseline.get("commit"), baseline.get("created"),
+        current.get("commit"), current.get("created")))
+    for package, version in current.get("packages", {}).items():
+        old_version = baseline.get("packages", {}).get(package)
+        if old_version != version:
+            print("  {} {} -> {}".format(package, old_version, version))
+    print("{:>18} {:>6} {:>10} {:>10} {:>7}".format(
+        "stage", "scale", "before s", "after s", "ratio"))
+    for stage, scale, before_s, after_s, ratio in rows:
+        flag = "  SLOWER" if (stage, scale, before_s, after_s,
+                              ratio) in regressions else ""
+        print("{:>18} {:>5}x {:>10.4f} {:>10.4f} {:>6.2f}x{}".format(
+            stage, scale, before_s, after_s, ratio, flag))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--output", help="write the report to this file")
+    parser.add_argument("--compare", nargs="+", metavar="REPORT",
+                        help="compare against a baseline report: either "
+                             "BASELINE (run the suite now) or BASELINE "
+                             "CURRENT")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="slowdown ratio that counts as a regression")
+    parser.add_argument("--min-slowdown", type=float,
+                        default=DEFAULT_MIN_SLOWDOWN,
+                        help="seconds a stage has to get slower by to count "
+                             "as a regression")
+    parser.add_argument("--stages", nargs="+",
+                        choices=[stage.name for stage in STAGES])
+    parser.add_argument("--scales", nargs="+", type=int, default=SCALES)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--record", action="store_true",
+                        help="rewrite the fixture pages and exit")
+    args = parser.parse_args()
+
+    if args.record:
+        record_fixtures()
+        return
+
+    if args.compare and len(args.compare) > 2:
+        parser.error("--compare takes a baseline and optionally a current "
+                     "report")
+
+    if args.compare and len(args.compare) == 2:
+        with open(args.compare[1]) as f:
+            current = json.load(f)
+    else:
+        stages = [stage for stage in STAGES
+                  if args.stages is None or stage.name in args.stages]
+        current = run_suite(stages, args.scales, args.repeat)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=1)
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            baseline = json.load(f)
+        rows, regressions = compare_reports(baseline, current,
+                                            args.threshold, args.min_slowdown)
+        print()
+        print_comparison(baseline, current, rows, regressions)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Persistent on-disk cache for the pages the scrapers download.
+
+Responses are stored zlib-compressed in a small SQLite file keyed by url,
+together with their ETag/Last-Modified validators. A cached page is served
+as-is while it is fresh, revalidated with a conditional request once it is
+stale, and the least recently used pages are evicted when the cache grows
+past its size limit. In offline mode fetch.py only replays from the cache.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import date
+from urllib.parse import urlsplit
+
+DEFAULT_CACHE_DIR = ".http_cache"
+
+# 512 MB is a few hundred times the size of every draft page we scrape
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+DAY = 24 * 60 * 60
+
+# drafts from the last few years still have active players whose career
+# stats move every season, so those pages are revalidated daily; older
+# drafts barely change and are only revalidated every few months
+RECENT_DRAFT_YEARS = 8
+RECENT_TTL = DAY
+OLD_TTL = 90 * DAY
+
+# the month from which this year's draft has been held (the NFL draft is at
+# the end of April, the NBA one at the end of June)
+NFL_DRAFT_MONTH = 5
+NBA_DRAFT_MONTH = 7
+
+# the draft month of the site a url is on, the later one for any other site
+DRAFT_MONTHS = {
+    "www.pro-football-reference.com": NFL_DRAFT_MONTH,
+    "www.basketball-reference.com": NBA_DRAFT_MONTH,
+}
+
+# the draft year in urls like /years/1999/draft.htm or /draft/NBA_1999.html
+YEAR_IN_URL = re.compile(r"(?<!\d)(19|20)(\d{2})(?!\d)")
+
+
+def latest_draft_year(draft_month, today=None):
+    """
+    Return the year of the latest draft held by today, for a draft held
+    before draft_month every year.
+    """
+    today = today or date.today()
+    return today.year if today.month >= draft_month else today.year - 1
+
+
+def is_recent_draft(year, latest_year):
+    """
+    Return whether the draft of year still has active players, counting
+    from the latest draft held.
+    """
+    return latest_year - year <= RECENT_DRAFT_YEARS
+
+
+def draft_year_ttl(url, today=None):
+    """
+    Return how many seconds a cached copy of url stays fresh, based on how
+    old the draft year in the url is.
+    """
+    parts = urlsplit(url)
+    match = YEAR_IN_URL.search(parts.path)
+    if match is None:
+        return RECENT_TTL
+    draft_month = DRAFT_MONTHS.get(parts.netloc, NBA_DRAFT_MONTH)
+    if not is_recent_draft(int(match.group(0)),
+                           latest_draft_year(draft_month, today)):
+        return OLD_TTL
+    return RECENT_TTL
+
+
+class CacheEntry:
+    """
+    A cached response: the page body and the validators the server sent.
+    """
+
+    def __init__(self, url, body, etag, last_modified, fetched_at):
+        self.url = url
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+
+    def validators(self):
+        """
+        Return the headers for a conditional request for this entry.
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """
+    A size-bounded, LRU-evicted cache of HTTP responses stored on disk.
+
+    ttl is a function of the url returning the number of seconds a response
+    stays fresh; by default old draft years are kept much longer than
+    recent ones.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES,
+                 ttl=draft_year_ttl):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # the fetch threads share one connection, guarded by the lock
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(path, "responses.sqlite"),
+                                   check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL
+            )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed "
+                         "ON responses (accessed_at)")
+        self._db.commit()
+
+    def get(self, url):
+        """
+        Return the CacheEntry for url, or None if it is not cached.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body, etag, last_modified, fetched_at FROM responses "
+                "WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE responses SET accessed_at = ? "
+                             "WHERE url = ?", (time.time(), url))
+            self._db.commit()
+        body, etag, last_modified, fetched_at = row
+        return CacheEntry(url, zlib.decompress(body), etag, last_modified,
+                          fetched_at)
+
+    def is_fresh(self, entry, now=None):
+        """
+        Return True if entry can be used without asking the server.
+        """
+        now = time.time() if now is None else now
+        return now - entry.fetched_at < self.ttl(entry.url)
+
+    def put(self, url, body, etag=None, last_modified=None):
+        """
+        Store a freshly downloaded response, then evict old entries if the
+        cache is over its size limit.
+        """
+        compressed = zlib.compress(body)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, compressed, etag, last_modified, now, now,
+                 len(compressed)))
+            self._evict()
+            self._db.commit()
+
+    def revalidated(self, url):
+        """
+        Mark a cached response as fresh again after a 304 Not Modified.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("UPDATE responses SET fetched_at = ?, "
+                             "accessed_at = ? WHERE url = ?", (now, now, url))
+            self._db.commit()
+
+    def size(self):
+        """
+        Return the total compressed size of the cached responses in bytes.
+        """
+        with self._lock:
+            return self._db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _evict(self):
+        # drop the least recently used responses until we fit again
+        total = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for url, size in self._db.execute(
+                "SELECT url, size FROM responses "
+                "ORDER BY accessed_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM responses WHERE url = ?", (url,))
+            total -= size
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,334 @@
+"""
+Row-level change detection between scrapes of the draft stores.
+
+Career columns (CarAV, DrAV, To, G, WS, VORP ...) move every season for the
+active players, so a refresh of a draft year mostly re-scrapes rows we
+already have. Every store keeps a fingerprint of each of its rows next to
+the data:
+
+    _fingerprints.parquet   Draft_Yr, pick and a 64-bit hash of every row
+
+and the fingerprint of a draft page is the hash of its year's keys and row
+fingerprints. upsert.upsert_table fingerprints the new rows and compares
+pages first: a draft year whose page fingerprint matches is done without
+reading anything from the store. In the other years only the rows whose
+fingerprint changed are compared column by column, and each changed value
+is appended to the store's changelog:
+
+    _changes.csv            run, Draft_Yr, pick, column, old, new
+
+An inserted row is a single entry with column "*". The files start with an
+underscore, so pyarrow never reads them as part of the table.
+
+Downstream stages follow the changelog with a ChangeFeed, which remembers
+the last run each consumer has seen in _consumers.json:
+
+    feed = ChangeFeed(NBA_DRAFT_STORE, "aggregates")
+    if feed.full:
+        ...  # never run, or the changelog was lost: rebuild everything
+    else:
+        keys = feed.keys(columns=["WS_per_48"])  # changed since last time
+    feed.commit()
+
+    python changes.py nfl          print the changes of the last scrape
+"""
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from storage import NBA_DRAFT_STORE, NFL_DRAFT_STORE, PARTITION_COL
+
+FINGERPRINT_FILE = "_fingerprints.parquet"
+CHANGELOG_FILE = "_changes.csv"
+CONSUMERS_FILE = "_consumers.json"
+
+# the column of the changelog entry of an inserted row
+INSERTED = "*"
+
+CHANGELOG_COLUMNS = ["run", PARTITION_COL, "pick", "column", "old", "new"]
+
+STORES = {"nfl": NFL_DRAFT_STORE, "nba": NBA_DRAFT_STORE}
+
+# picks per draft are far below this, so Draft_Yr * KEY_BASE + pick is a
+# unique integer key that sorts like (Draft_Yr, pick)
+KEY_BASE = 10000
+
+
+def row_keys(df, pick_col):
+    """
+    Return the integer key of every row of df.
+    """
+    return (df[PARTITION_COL].to_numpy(np.int64) * KEY_BASE +
+            df[pick_col].to_numpy(np.int64))
+
+
+def _canonical(df, schema):
+    """
+    Return the schema's columns of df with one dtype per schema type, so the
+    same values hash the same whether they were just scraped or read back
+    from the store: numbers and flags as float64, text as objects.
+    """
+    columns = {}
+    for field in schema:
+        values = df[field.name] if field.name in df else pd.Series(
+            None, index=df.index, dtype=object)
+        if pa.types.is_string(field.type):
+            columns[field.name] = values.astype(object).where(
+                values.notnull(), None)
+        elif (pd.api.types.is_numeric_dtype(values)
+              and not pd.api.types.is_extension_array_dtype(values)):
+            # plain numbers and flags, no missing values to fix up
+            columns[field.name] = values.to_numpy(np.float64)
+        else:
+            columns[field.name] = pd.to_numeric(
+                values.astype(object).where(values.notnull(), np.nan),
+                errors="coerce").astype("float64")
+    return pd.DataFrame(columns, index=df.index)
+
+
+def row_fingerprints(df, schema):
+    """
+    Return the 64-bit fingerprint of every row of df as a uint64 array.
+    """
+    return pd.util.hash_pandas_object(_canonical(df, schema),
+                                      index=False).to_numpy()
+
+
+def page_fingerprints(keys, fingerprints):
+    """
+    Return {Draft_Yr: fingerprint} for the (Draft_Yr, pick) keys (sorted,
+    see row_keys) and row fingerprints of one or more draft pages.
+    """
+    pages = {}
+    if not len(keys):
+        return pages
+    years = keys // KEY_BASE
+    bounds = np.flatnonzero(np.diff(years)) + 1
+    for start, end in zip(np.r_[0, bounds], np.r_[bounds, len(years)]):
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update(keys[start:end].tobytes())
+        digest.update(fingerprints[start:end].tobytes())
+        pages[int(years[start])] = digest.hexdigest()
+    return pages
+
+
+def read_fingerprints(path):
+    """
+    Return the stored (key, fingerprint) arrays of the store at path sorted
+    by key, or None if it has none.
+    """
+    fp_path = os.path.join(path, FINGERPRINT_FILE)
+    if not os.path.exists(fp_path):
+        return None
+    df = pd.read_parquet(fp_path)
+    return df.key.to_numpy(np.int64), df.fingerprint.to_numpy(np.uint64)
+
+
+def write_fingerprints(path, keys, fingerprints):
+    fp_path = os.path.join(path, FINGERPRINT_FILE)
+    tmp_path = fp_path + ".tmp"
+    pd.DataFrame({"key": keys, "fingerprint": fingerprints}).to_parquet(
+        tmp_path, index=False)
+    os.replace(tmp_path, fp_path)
+
+
+def merge_fingerprints(keys, fingerprints, new_keys, new_fingerprints):
+    """
+    Return the stored keys and fingerprints with the new ones added or
+    replaced, sorted by key.
+    """
+    keep = ~np.isin(keys, new_keys)
+    keys = np.concatenate([keys[keep], new_keys])
+    fingerprints = np.concatenate([fingerprints[keep], new_fingerprints])
+    order = np.argsort(keys, kind="stable")
+    return keys[order], fingerprints[order]
+
+
+def unchanged_rows(keys, fingerprints, new_keys, new_fingerprints):
+    """
+    Return a boolean array, True for the new rows that are stored with the
+    same fingerprint. Whole draft pages that match are settled by their
+    page fingerprint without looking at the rows.
+    """
+    same = np.zeros(len(new_keys), dtype=bool)
+    if not len(keys):
+        return same
+    new_years = new_keys // KEY_BASE
+    stored = np.isin(keys // KEY_BASE, new_years)
+    stored_pages = page_fingerprints(keys[stored], fingerprints[stored])
+    new_pages = page_fingerprints(new_keys, new_fingerprints)
+    same_pages = [year for year, page in new_pages.items()
+                  if stored_pages.get(year) == page]
+    same[np.isin(new_years, same_pages)] = True
+
+    # row by row for the pages that changed
+    rest = np.flatnonzero(~same)
+    positions = np.searchsorted(keys, new_keys[rest])
+    found = positions < len(keys)
+    found[found] = keys[positions[found]] == new_keys[rest[found]]
+    same[rest[found]] = (fingerprints[positions[found]] ==
+                         new_fingerprints[rest[found]])
+    return same
+
+
+def changelog_entries(existing, new, pick_col, run):
+    """
+    Return the changelog entries of the new rows (keyed_rows output) against
+    the stored rows with the same columns: one per changed value of an
+    updated row and one per inserted row.
+    """
+    existing_keys = row_keys(existing, pick_col)
+    new_keys = row_keys(new, pick_col)
+    positions = np.searchsorted(existing_keys, new_keys)
+    found = positions < len(existing_keys)
+    found[found] = existing_keys[positions[found]] == new_keys[found]
+
+    inserted = new[~found]
+    entries = [pd.DataFrame({
+        PARTITION_COL: inserted[PARTITION_COL].to_numpy(),
+        "pick": inserted[pick_col].to_numpy(), "column": INSERTED,
+        "old": "", "new": ""})]
+
+    old = existing.iloc[positions[found]].reset_index(drop=True)
+    updated = new[found].reset_index(drop=True)
+    for col in new.columns:
+        x = old[col].to_numpy()
+        y = updated[col].to_numpy()
+        with np.errstate(invalid="ignore"):
+            differ = ~((x == y) | (pd.isnull(x) & pd.isnull(y)))
+        if differ.any():
+            entries.append(pd.DataFrame({
+                PARTITION_COL: updated[PARTITION_COL].to_numpy()[differ],
+                "pick": updated[pick_col].to_numpy()[differ], "column": col,
+                "old": x[differ], "new": y[differ]}))
+
+    entries = pd.concat([part for part in entries if len(part)] or entries,
+                        ignore_index=True)
+    entries.insert(0, "run", run)
+    entries["pick"] = entries["pick"].astype(np.int64)
+    return entries.sort_values([PARTITION_COL, "pick"], kind="stable")
+
+
+def last_run(path):
+    """
+    Return the number of the last run in the changelog of the store at
+    path, 0 if nothing was logged yet.
+    """
+    state = _read_json(os.path.join(path, CONSUMERS_FILE))
+    return state.get("_last_run", 0)
+
+
+def append_changelog(path, entries):
+    """
+    Append the entries to the changelog of the store at path and record
+    their run as the last one.
+    """
+    log_path = os.path.join(path, CHANGELOG_FILE)
+    entries[CHANGELOG_COLUMNS].to_csv(
+        log_path, mode="a", index=False,
+        header=not os.path.exists(log_path))
+    state_path = os.path.join(path, CONSUMERS_FILE)
+    state = _read_json(state_path)
+    state["_last_run"] = int(entries["run"].max())
+    _write_json(state_path, state)
+
+
+def read_changelog(path, since=0):
+    """
+    Return the changelog entries of the store at path after run since.
+    """
+    log_path = os.path.join(path, CHANGELOG_FILE)
+    if not os.path.exists(log_path):
+        return pd.DataFrame(columns=CHANGELOG_COLUMNS)
+    log = pd.read_csv(log_path, dtype={"old": str, "new": str})
+    return log[log.run > since].reset_index(drop=True)
+
+
+def _read_json(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_json(path, state):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+class ChangeFeed:
+    """
+    The changes to a store since a downstream stage (the consumer) last
+    caught up with it.
+
+    full is True when the consumer has to rebuild everything: it has never
+    committed, it was run with different params (any JSON-able settings
+    that change its output) or the store was replaced since, which starts a
+    new changelog. Otherwise keys() returns the keys changed since.
+    """
+
+    def __init__(self, path, consumer, params=None):
+        self.path = path
+        self.consumer = consumer
+        self.params = params
+        state = _read_json(os.path.join(path, CONSUMERS_FILE))
+        # commit() catches up to the changes there were when we looked
+        self.run = state.get("_last_run", 0)
+        seen = state.get(consumer)
+        self.full = (seen is None or seen["params"] != params
+                     or seen["run"] > self.run)
+        self.changes = (read_changelog(path, since=seen["run"])
+                        if not self.full else None)
+
+    def keys(self, columns=None):
+        """
+        Return the (Draft_Yr, pick) keys changed since the last commit as a
+        DataFrame sorted by key: every inserted row, and the updated rows
+        with a change in one of columns (in any column by default).
+        """
+        changes = self.changes
+        if columns is not None:
+            changes = changes[changes.column.isin(list(columns) +
+                                                  [INSERTED])]
+        keys = changes[[PARTITION_COL, "pick"]].drop_duplicates()
+        return keys.sort_values([PARTITION_COL, "pick"]).reset_index(
+            drop=True)
+
+    def commit(self):
+        """
+        Record that the consumer is up to date with the store.
+        """
+        state_path = os.path.join(self.path, CONSUMERS_FILE)
+        state = _read_json(state_path)
+        state[self.consumer] = {"run": self.run, "params": self.params}
+        _write_json(state_path, state)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Print the changelog of a draft store.")
+    parser.add_argument("league", choices=sorted(STORES))
+    parser.add_argument("--since", type=int,
+                        help="print every run after this one instead of "
+                             "only the last")
+    args = parser.parse_args()
+
+    path = STORES[args.league]
+    since = last_run(path) - 1 if args.since is None else args.since
+    log = read_changelog(path, since=since)
+    if log.empty:
+        print("No changes logged after run {}".format(since))
+        return
+    with pd.option_context("display.max_rows", None):
+        print(log.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Cleaning helpers shared by the scrapers.
+"""
+import pandas as pd
+import pyarrow as pa
+
+
+def convert_numeric(df):
+    """
+    Convert every column that holds numbers to a numeric dtype, turning the
+    values that aren't numbers (empty cells, repeated headers) into NaN.
+
+    Columns where nothing converts are left alone, which is what the old
+    DataFrame.convert_objects(convert_numeric=True) used to do.
+    """
+    df = df.copy()
+    # go by position, the raw scraped headers have duplicate names
+    for i in range(df.shape[1]):
+        col = df.iloc[:, i]
+        if pd.api.types.is_numeric_dtype(col):
+            continue
+        values = pd.to_numeric(col, errors="coerce")
+        if values.notnull().any():
+            df.isetitem(i, values)
+    return df
+
+
+def coerce_to_schema(df, schema):
+    """
+    Convert the columns of df that are numbers in a pyarrow schema to
+    floats (or ints) with the values that aren't numbers as 0. Unlike
+    convert_numeric this doesn't depend on what is in the column, so every
+    chunk of a table comes out with the same types.
+    """
+    df = df.copy()
+    for field in schema:
+        if field.name not in df or not pa.types.is_floating(field.type) and \
+                not pa.types.is_integer(field.type):
+            continue
+        values = pd.to_numeric(df[field.name], errors="coerce").fillna(0)
+        df[field.name] = values.astype(
+            float if pa.types.is_floating(field.type) else int)
+    return df
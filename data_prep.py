@@ -1,97 +1,91 @@
-import pandas as pd
-from urllib.request import urlopen
-from bs4 import BeautifulSoup
-import re
-import html5lib
-
-all_active_players = []
-
-# according pfr the last player Sebstian Janikowski is the earlest
-# active player drafted (2000 draft)
-# NOTE undrafted players are not included in this, so guys like Adam Vinatieri
-# are not included
-for year in range(2000,2016):
-    # get the html and extract the data based off the proper CSS selector
-    url = "http://www.pro-football-reference.com/years/{}/draft.htm".format(year)
-    html = urlopen(url)
-    soup = BeautifulSoup(html, "html5lib")
-    # active drafted players are bolded in the draft table on pfr
-    player_html = soup.select("#drafts strong a")
-    # get the link for each
-    player_links = [player["href"] for player in player_html]
-    # add these links to the large list active player lists
-    all_active_players.extend(player_links)
-
-# Extract the player ids for each using regex
-active_player_ids = [re.search(r"/.*/.*/(.*)\.", player).group(1) for player
-                     in all_active_players]
-
-#print (active_player_ids[:5]) # just check things out, need to drop charles woodson as he's retired
-
-draft_df = pd.read_csv("pfr_nfl_draft_data_CLEAN.csv")
-
-# convert the data to proper numeric types
-draft_df = draft_df.convert_objects(convert_numeric=True)
-
-# Get the column names for the numeric columns
-num_cols = draft_df.columns[draft_df.dtypes != object]
-
-# Replace all NaNs with 0
-draft_df.loc[:, num_cols] = draft_df.loc[:, num_cols].fillna(0)
-
-#print (draft_df.head())
-
-# keep only players before the 2016 draft
-draft_df = draft_df.loc[draft_df.Draft_Yr < 2016]
-
-#print (draft_df.tail())
-
-# create a seriess indicating whether a player is active
-active = draft_df.Player_ID.isin(active_player_ids)
-
-# Now create a column indicating that a player's career is officially over
-# via ~ and convert it to 1s and 0s
-draft_df["Retired"] = (~active).astype(int)
-
-#print(draft_df.info())
-
-
-#print (draft_df.loc[draft_df.Retired == 0, "To"].value_counts())
-
-# Mike Kafka is retired according to wikipedia, but PFR still has him
-draft_df.loc[draft_df.Player == "Mike Kafka", "Retired"] = 1
-
-# function calculate the career duration for each player
-def calc_duration(player):
-    """
-    Calculte the years played for a player. If the 'To' value is 0 then return
-    the value 0.  Otherwise set that column value to equal
-    'To' - 'Draft_Yr' + 1.
-    """
-
-    # The player never played a season if their "To" value is 0, so return 0
-    if player["To"] == 0:
-        return 0
-
-    # Otherwise return the number of years they played.
-    duration = player["To"] - player["Draft_Yr"] + 1
-    return duration
-
-# Now create a Duration column, by applying the above function to each
-# row, which represents a player
-# to apply the function to each row, you must use axis=1
-draft_df["Duration"]  = draft_df.apply(lambda player: calc_duration(player),
-                                           axis=1)
-
-#print (draft_df.head())
-
-# convert some colums from float to int# conver
-cols_to_int = ['Age', 'To', 'G', 'Cmp', 'Att', 'Yds', 'TD', 'Int',
-               'Rush_Att', 'Rush_Yds', 'Rush_TD', 'Rec', 'Rec_Yds', 'Rec_TD',
-               'Def_Int', 'Duration']
-
-draft_df.loc[:, cols_to_int] = draft_df.loc[:, cols_to_int].astype(int)
-
-#print(draft_df.info())
-
-draft_df.to_csv("nfl_survival_analysis_data.csv", index=False)
+import argparse
+import sys
+
+import metrics
+from changes import ChangeFeed
+from storage import (NFL_DRAFT_STORE, NFL_SURVIVAL_SCHEMA, NFL_SURVIVAL_STORE,
+                     clear_table, read_table, table_exists, write_table)
+from survival_data import build_survival_dataset
+from upsert import upsert_table
+
+survival_csv = "nfl_survival_analysis_data.csv"
+
+parser = argparse.ArgumentParser(
+    description="Prep the NFL draft data for the survival analysis.")
+parser.add_argument("--as-of", type=int, default=2016,
+                    help="only keep players drafted before this year")
+parser.add_argument("--last-season", type=int,
+                    help="only observe careers up to this season")
+metrics.add_argument(parser)
+args = parser.parse_args()
+
+if args.metrics:
+    metrics.enable("data_prep")
+
+# the survival rows are derived row by row, so once they have been built
+# only the draft rows changed since (see changes.py) have to be redone
+feed = None
+keys = None
+if table_exists(NFL_DRAFT_STORE):
+    feed = ChangeFeed(NFL_DRAFT_STORE, "survival",
+                      params={"as_of": args.as_of,
+                              "last_season": args.last_season})
+    if not feed.full and table_exists(NFL_SURVIVAL_STORE):
+        keys = feed.keys()
+        keys = keys[keys.Draft_Yr < args.as_of]
+
+try:
+    # load the drafts before the cutoff from the NFL draft store (or the csv
+    # if the store hasn't been built), or just the changed rows
+    with metrics.stage("load"):
+        if keys is None:
+            draft_df = read_table(NFL_DRAFT_STORE,
+                                  years=range(1967, args.as_of),
+                                  csv_path="pfr_nfl_draft_data_CLEAN.csv")
+        else:
+            draft_df = read_table(NFL_DRAFT_STORE,
+                                  years=keys.Draft_Yr.unique().tolist())
+            draft_df = draft_df.merge(
+                keys.rename(columns={"pick": "Pick"}).astype(
+                    {"Pick": draft_df.Pick.dtype}),
+                on=["Draft_Yr", "Pick"])
+
+    if keys is not None and draft_df.empty:
+        print("{} is up to date".format(survival_csv))
+        feed.commit()
+        sys.exit()
+
+    # active drafted players are bolded in the draft table on pfr, and
+    # nfl_draft.py records that as the Is_Active column while it scrapes, so
+    # there is no need to download the draft pages again
+    # NOTE undrafted players are not included in this, so guys like Adam
+    # Vinatieri are not included
+    if "Is_Active" not in draft_df or draft_df.Is_Active.isnull().all():
+        sys.exit("The NFL draft data has no Is_Active column, "
+                 "rerun nfl_draft.py first")
+
+    # derive the Retired and Duration columns and the proper numeric types
+    with metrics.stage("analyze"):
+        draft_df = build_survival_dataset(draft_df, as_of=args.as_of,
+                                          last_season=args.last_season)
+    metrics.record_rows("analyze", len(draft_df))
+
+    #print(draft_df.info())
+
+    # write the typed, year-partitioned store and the csv next to it, or
+    # merge the changed rows into them
+    with metrics.stage("store"):
+        if keys is None:
+            # a full rebuild can drop years (a lower --as-of or
+            # --last-season), which write_table alone would leave behind
+            clear_table(NFL_SURVIVAL_STORE)
+            write_table(draft_df, NFL_SURVIVAL_STORE, NFL_SURVIVAL_SCHEMA,
+                        csv_path=survival_csv, index=False)
+        else:
+            upsert_table(draft_df, NFL_SURVIVAL_STORE, NFL_SURVIVAL_SCHEMA,
+                         "Pick", csv_path=survival_csv, changelog=False)
+            print("Updated {} rows of {}".format(len(draft_df), survival_csv))
+    if feed is not None:
+        feed.commit()
+finally:
+    metrics.finish(args.metrics)
@@ -0,0 +1,109 @@
+"""
+Density images for the scatter plots with too many points to draw one by
+one.
+
+A scatter plot costs matplotlib a marker per point, in draw time and in the
+size of an SVG, and the CarAV by Pick charts will get millions of points
+once the per-season player rows are in. Above DENSITY_THRESHOLD points,
+points() bins them into a fixed grid instead (integer bin indices and one
+np.bincount, no Python loop over the points) and draws the counts as a
+single image with a log color scale. The image is a raster of the grid's
+size however many points went in, so drawing and saving it takes the same
+time for ten thousand points as for ten million.
+
+points has the call signature FacetGrid.map hands to its plotting
+functions, like lowess.lowess_line, so the LOWESS curves go on top as
+before:
+
+    grid = sns.FacetGrid(df, col="Pos")
+    grid.map(points, "Pick", "CarAV", extent=(-5, 500, -1, 100))
+    grid.map(lowess_line, "Pick", "CarAV", color="black")
+"""
+import matplotlib.pyplot as plt
+import numpy as np
+import seaborn as sns
+from matplotlib.colors import LogNorm
+
+# charts with more points than this get a density image instead of a
+# scatter. It is well above the ~12k players drafted up to 2010, so the
+# charts stay the scatters they always were until the per-season rows come
+DENSITY_THRESHOLD = 100000
+
+# (x bins, y bins) of the density grid
+DEFAULT_BINS = (256, 128)
+
+
+def density_grid(x, y, extent, bins=DEFAULT_BINS):
+    """
+    Return the number of points in every cell of a bins[0] x bins[1] grid
+    over extent (xmin, xmax, ymin, ymax), indexed [x bin, y bin]. Points
+    outside the extent aren't counted.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    xmin, xmax, ymin, ymax = extent
+    nx, ny = bins
+    ix = np.floor((x - xmin) * (nx / (xmax - xmin)))
+    iy = np.floor((y - ymin) * (ny / (ymax - ymin)))
+    # NaNs fail both comparisons and are dropped with the points outside
+    inside = (ix >= 0) & (ix < nx) & (iy >= 0) & (iy < ny)
+    cells = ix[inside].astype(np.intp) * ny + iy[inside].astype(np.intp)
+    return np.bincount(cells, minlength=nx * ny).reshape(nx, ny)
+
+
+def _extent(x, y):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    xmin, xmax = np.nanmin(x), np.nanmax(x)
+    ymin, ymax = np.nanmin(y), np.nanmax(y)
+    # a single value still needs a cell of some width
+    return (xmin, xmax if xmax > xmin else xmin + 1,
+            ymin, ymax if ymax > ymin else ymin + 1)
+
+
+def density_plot(x, y, ax=None, extent=None, bins=DEFAULT_BINS, color=None,
+                 cmap=None, **kwargs):
+    """
+    Draw the density image of the points on ax (or the current axes) and
+    return it. extent defaults to the range of the points, cmap to color
+    (or the palette's first color) getting darker with the count. Empty
+    cells are left transparent. The other keyword arguments go to
+    ax.imshow.
+    """
+    if ax is None:
+        ax = plt.gca()
+    if extent is None:
+        extent = _extent(x, y)
+    if cmap is None:
+        if color is None:
+            color = sns.color_palette()[0]
+        # a single point looks like a scatter marker, dense cells darker
+        cmap = sns.blend_palette(
+            [color, sns.set_hls_values(color, l=0.3)], as_cmap=True)
+    counts = density_grid(x, y, extent, bins)
+    image = ax.imshow(np.ma.masked_equal(counts.T, 0), origin="lower",
+                      extent=extent, aspect="auto", interpolation="nearest",
+                      cmap=cmap,
+                      norm=LogNorm(vmin=1, vmax=max(counts.max(), 1)),
+                      **kwargs)
+    ax.set_xlim(extent[0], extent[1])
+    ax.set_ylim(extent[2], extent[3])
+    return image
+
+
+def points(x, y, ax=None, threshold=DENSITY_THRESHOLD, extent=None,
+           bins=DEFAULT_BINS, color=None, **kwargs):
+    """
+    Draw the points on ax (or the current axes): as a scatter when there
+    are at most threshold of them, otherwise as a density image over extent
+    (see density_plot). The other keyword arguments go to ax.scatter or
+    ax.imshow.
+    """
+    if ax is None:
+        ax = plt.gca()
+    if len(x) <= threshold:
+        return ax.scatter(x, y, color=color, **kwargs)
+    # a marker's transparency means nothing for the image
+    kwargs.pop("alpha", None)
+    return density_plot(x, y, ax=ax, extent=extent, bins=bins, color=color,
+                        **kwargs)
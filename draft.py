@@ -1,17 +1,26 @@
-import html5lib
-from urllib.request import urlopen
-from bs4 import BeautifulSoup
+import argparse
+import os
+import time
 import pandas as pd
 import sys
 
-# url that we are scraping
-url = "http://www.basketball-reference.com/draft/NBA_2014.html"
-# this is the html from the given url
-html = urlopen(url)
-#create BeautifulSoup obj
-soup = BeautifulSoup(html, "html5lib")
-column_headers = [th.getText() for th in
-                  soup.findAll('tr', limit=2)[1].findAll('th')]
+from aggregates import refresh_aggregates
+from cache import ResponseCache
+from cleaning import convert_numeric
+from extract_spec import NBA_DRAFT, extract_frame
+from fetch import fetch_pages
+from incremental import (DEFAULT_REFRESH_DAYS, NBA_DRAFT_MONTH,
+                         latest_draft_year, load_scrape_log,
+                         save_scrape_log, years_to_scrape)
+import metrics
+from storage import (NBA_DRAFT_SCHEMA, NBA_DRAFT_STORE, read_csv,
+                     table_exists)
+from upsert import upsert_table
+
+url_template = NBA_DRAFT.url_template
+
+output_csv = "draft_data_1966_to_2018.csv"
+
 #column_headers.remove(column_headers[0])
 #data_rows = soup.findAll('tr')[2:]  # skip the first 2 header rows
 #player_data = [[td.getText() for td in data_rows[i].findAll('td')]
@@ -31,51 +40,153 @@ column_headers = [th.getText() for th in
 #df.insert(0, 'Draft_Yr', 2014)
 #df.drop('Rk', axis='columns', inplace=True)
 
-url_template = "http://www.basketball-reference.com/draft/NBA_{year}.html"
-# create an empty DataFrame
-draft_df = pd.DataFrame()
-for year in range(1966, 2018):  # for each year
-    url = url_template.format(year=year)  # get the url
 
-    html = urlopen(url)  # get the html
-    soup = BeautifulSoup(html, 'html5lib') # create our BS object
+def build_draft_df(years, pages):
+    """
+    Turn the draft page of every year into one DataFrame of raw player rows,
+    with the draft year in front.
+
+    Every page is extracted with the NBA_DRAFT spec, which names the columns
+    from the page's own header row, and the DataFrame is built once at the
+    end, so the cost grows linearly with the number of years instead of
+    copying a growing DataFrame every year.
+    """
+    year_dfs = []
+    for year, html in zip(years, pages):  # for each year and its html
+        # get our player data from the rows after the 2 header rows of the
+        # #stats table
+        # (with the Is_Active flag for the bolded players on the end)
+        year_dfs.append(extract_frame(NBA_DRAFT, html, year))
+        metrics.record_rows("parse", len(year_dfs[-1]), year=year)
+
+    return pd.concat(year_dfs, ignore_index=True)
+
+
+def clean_draft_df(draft_df):
+    """
+    Convert the raw player rows to proper types and column names.
+    """
+    # Convert data to proper data types
+    draft_df = convert_numeric(draft_df)
+
+    # Get rid of the rows full of null values
+    draft_df = draft_df[draft_df.Player.notnull()]
+
+    # Replace NaNs with 0s
+    draft_df = draft_df.fillna(0)
+
+    # Changing the Data Types to int
+    int_cols = draft_df.loc[:, 'Yrs':'AST'].columns
+    draft_df[int_cols] = draft_df[int_cols].astype(int)
+
+    draft_df['Pk'] = draft_df['Pk'].astype(int) # change Pk to int
+    return draft_df
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Scrape every NBA draft from basketball-reference.")
+    parser.add_argument("--offline", action="store_true",
+                        help="only replay pages from the response cache")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only scrape the draft years missing from the "
+                             "output or past their refresh window")
+    parser.add_argument("--refresh-days", type=float,
+                        default=DEFAULT_REFRESH_DAYS,
+                        help="days before a recent draft year is scraped "
+                             "again in incremental mode")
+    parser.add_argument("--last-year", type=int,
+                        default=latest_draft_year(NBA_DRAFT_MONTH),
+                        help="the last draft year to scrape (by default the "
+                             "latest draft held)")
+    metrics.add_argument(parser)
+    args = parser.parse_args()
 
-    # get our player data
-    data_rows = soup.findAll('tr')[2:]
-    player_data = [[td.getText() for td in data_rows[i].findAll(['td','th'])]
-                for i in range(len(data_rows))]
+    if args.metrics:
+        metrics.enable("nba_draft")
+    try:
+        scrape(args)
+    finally:
+        metrics.finish(args.metrics)
 
-    # Turn yearly data into a DatFrame
-    year_df = pd.DataFrame(player_data, columns=column_headers)
-    # create and insert the Draft_Yr column
-    year_df.insert(0, 'Draft_Yr', year)
 
-    # Append to the big dataframe
-    draft_df = draft_df.append(year_df, ignore_index=True)
+def scrape(args):
+    """
+    Scrape the draft years (all of them, or in incremental mode the ones
+    that are missing or stale) and write the outputs.
+    """
+    last_year = getattr(args, "last_year", None) or latest_draft_year(
+        NBA_DRAFT_MONTH)
+    all_years = range(1966, last_year + 1)
 
-# Convert data to proper data types
-draft_df = draft_df.convert_objects(convert_numeric=True)
+    # in incremental mode start from the existing output and only scrape the
+    # years it is missing or has stale
+    existing_df = None
+    scrape_log = {}
+    years = list(all_years)
+    if args.incremental and os.path.exists(output_csv):
+        existing_df = read_csv(output_csv)
+        if "Is_Active" not in existing_df:
+            # written before the active flag was scraped, so start over
+            print("{} has no Is_Active column, scraping every year".format(
+                output_csv))
+            existing_df = None
+    if existing_df is not None:
+        scrape_log = load_scrape_log(output_csv)
+        years = years_to_scrape(existing_df.Draft_Yr.unique(), all_years,
+                                scrape_log, args.refresh_days)
+        if not years:
+            print("{} is up to date".format(output_csv))
+            return
 
-# Get rid of the rows full of null values
-draft_df = draft_df[draft_df.Player.notnull()]
+    # fetch all the draft pages at once, they come back in year order
+    # pages downloaded by earlier runs come out of the on-disk cache
+    # throttled pages are retried by the scheduler, a year that still fails
+    # is skipped and left out of the scrape log so the next run picks it up
+    with metrics.stage("fetch"):
+        pages = dict(zip(years, fetch_pages(
+            (url_template.format(year=year) for year in years),
+            cache=ResponseCache(), offline=args.offline,
+            return_exceptions=True)))
+    failed = [year for year in years if isinstance(pages[year], Exception)]
+    for year in failed:
+        print("Skipping {}: {}".format(year, pages[year]))
+        metrics.record_error("fetch", pages[year], year=year)
+    years = [year for year in years if year not in failed]
+    if not years:
+        # nothing to merge, leave the outputs and the scrape log alone
+        sys.exit("Could not download any of the draft pages, {} is left "
+                 "as it is".format(output_csv))
 
-# Replace NaNs with 0s
-draft_df = draft_df.fillna(0)
+    with metrics.stage("parse"):
+        draft_df = build_draft_df(years, [pages[year] for year in years])
+    with metrics.stage("clean"):
+        draft_df = clean_draft_df(draft_df)
 
-# Rename Columns
-draft_df.rename(columns={'WS/48':'WS_per_48'}, inplace=True)
-# Change % symbol
-draft_df.columns = draft_df.columns.str.replace('%', '_Perc')
-# Add per_G to per game stats
-draft_df.columns.values[15:19] = [draft_df.columns.values[15:19][col] +
-                                  "_per_G" for col in range(4)]
+    # merge the rows into the typed, year-partitioned store by (Draft_Yr, Pk)
+    # and write the csv next to it, only the years that changed are rewritten
+    with metrics.stage("store"):
+        if existing_df is not None and not table_exists(NBA_DRAFT_STORE):
+            # start the store from the output written before it existed
+            upsert_table(existing_df, NBA_DRAFT_STORE, NBA_DRAFT_SCHEMA,
+                         "Pk")
+        counts = upsert_table(draft_df, NBA_DRAFT_STORE, NBA_DRAFT_SCHEMA,
+                              "Pk", csv_path=output_csv)
+    print("{} rows inserted, {} updated, {} unchanged".format(
+        counts["inserted"], counts["updated"], counts["unchanged"]))
 
-# Changing the Data Types to int
-draft_df.loc[:,'Yrs':'AST'] = draft_df.loc[:,'Yrs':'AST'].astype(int)
+    # and rebuild the chart aggregates of the picks that changed (or of
+    # every pick if they haven't been built yet)
+    with metrics.stage("aggregate"):
+        rebuilt = refresh_aggregates()
+    if rebuilt is not None:
+        print("Rebuilt {} aggregate cells".format(rebuilt))
 
-# Delete the 'Rk' column
-draft_df.drop('Rk', axis='columns', inplace=True)
+    # remember when each year was scraped for the next incremental run
+    scraped_at = time.time()
+    scrape_log.update((year, scraped_at) for year in years)
+    save_scrape_log(output_csv, scrape_log)
 
-draft_df['Pk'] = draft_df['Pk'].astype(int) # change Pk to int
 
-draft_df.to_csv("draft_data_1966_to_2018.csv")
+if __name__ == "__main__":
+    main()
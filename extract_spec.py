@@ -0,0 +1,197 @@
+"""
+Declarative extraction specs for the sports-reference tables.
+
+A TableSpec says where a table lives (url template and table id), which of
+its header cells become which of our columns, and which links and flags to
+keep from every row. The scrapers used to patch the header list by position
+instead (column_headers[4] = "Player", [19:22] prefixed with Rush_, Tkl
+inserted at 24 before 1994, [15:19] suffixed with _per_G).
+
+Columns are matched by header text. A header that shows up more than once
+(Att, Yds and TD under Passing, Rushing and Receiving) is told apart by its
+occurrence, nth=1 for the second one. A column a page doesn't have, like Tkl
+before 1994, comes out as the spec's fill value, so one spec covers every
+era of a table. Adding another league or table means writing a spec:
+
+    MLB_DRAFT = TableSpec(
+        "mlb_draft", "https://www.baseball-reference.com/draft/...",
+        "draft_stats", columns=(Column("Rnd", "Rnd"), ...))
+
+compile_layout turns a spec and the header row of a page into a function
+from a row's cells to a record (a tuple in the spec's column order), built
+around one operator.itemgetter. It is cached per spec and distinct header
+layout, so a scrape of fifty drafts compiles it once or twice and the work
+per row is padding the cells and one itemgetter call.
+"""
+from collections import namedtuple
+from functools import lru_cache
+from operator import itemgetter
+
+import pandas as pd
+
+from table_extract import ACTIVE_COL, iter_table_rows
+
+# header is the text of the column's cell in the header row, nth picks the
+# occurrence of a header that appears more than once
+Column = namedtuple("Column", ["name", "header", "nth"], defaults=[0])
+
+# the href of the row's link whose text is text, or the value of the
+# record's column (the player link is the link on the player's name)
+Link = namedtuple("Link", ["name", "text", "column"],
+                  defaults=[None, None])
+
+# header_rows: the rows before the data, the last one holds the headers
+# year_col: column the draft year is put in, in front of the others
+# strip_suffix: cut off the end of every cell and link text (" HOF")
+# active_col: column for the bolded (still active) players, or None
+# fill: value of the columns a page doesn't have
+TableSpec = namedtuple(
+    "TableSpec", ["name", "url_template", "table_id", "columns", "links",
+                  "header_rows", "year_col", "strip_suffix", "active_col",
+                  "fill"],
+    defaults=[(), 2, "Draft_Yr", None, ACTIVE_COL, ""])
+
+
+NFL_DRAFT = TableSpec(
+    "nfl_draft", "http://www.pro-football-reference.com/years/{year}/draft.htm",
+    "drafts",
+    columns=(
+        Column("Rnd", "Rnd"), Column("Pick", "Pick"), Column("Tm", "Tm"),
+        Column("Player", ""), Column("Pos", "Pos"), Column("Age", "Age"),
+        Column("To", "To"), Column("AP1", "AP1"), Column("PB", "PB"),
+        Column("St", "St"), Column("CarAV", "CarAV"), Column("DrAV", "DrAV"),
+        Column("G", "G"),
+        # passing
+        Column("Cmp", "Cmp"), Column("Att", "Att"), Column("Yds", "Yds"),
+        Column("TD", "TD"), Column("Int", "Int"),
+        # rushing
+        Column("Rush_Att", "Att", 1), Column("Rush_Yds", "Yds", 1),
+        Column("Rush_TD", "TD", 1),
+        # receiving
+        Column("Rec", "Rec"), Column("Rec_Yds", "Yds", 2),
+        Column("Rec_TD", "TD", 2),
+        # defense, no Tkl column before 1994
+        Column("Tkl", "Tkl"), Column("Def_Int", "Int", 1), Column("Sk", "Sk"),
+        Column("College", "College/Univ")),
+    links=(Link("Player_NFL_Link", column="Player"),
+           Link("Player_NCAA_Link", text="College Stats")),
+    strip_suffix=" HOF")
+
+# the per game columns repeat the names of the totals
+NBA_DRAFT = TableSpec(
+    "nba_draft", "http://www.basketball-reference.com/draft/NBA_{year}.html",
+    "stats",
+    columns=(
+        Column("Pk", "Pk"), Column("Tm", "Tm"), Column("Player", "Player"),
+        Column("College", "College"), Column("Yrs", "Yrs"), Column("G", "G"),
+        Column("MP", "MP"), Column("PTS", "PTS"), Column("TRB", "TRB"),
+        Column("AST", "AST"), Column("FG_Perc", "FG%"),
+        Column("3P_Perc", "3P%"), Column("FT_Perc", "FT%"),
+        Column("MP_per_G", "MP", 1), Column("PTS_per_G", "PTS", 1),
+        Column("TRB_per_G", "TRB", 1), Column("AST_per_G", "AST", 1),
+        Column("WS", "WS"), Column("WS_per_48", "WS/48"), Column("BPM", "BPM"),
+        Column("VORP", "VORP")),
+    fill=None)
+
+SPECS = {spec.name: spec for spec in [NFL_DRAFT, NBA_DRAFT]}
+
+
+def output_columns(spec):
+    """
+    Return the names of the columns extract_frame returns for spec.
+    """
+    names = [spec.year_col] if spec.year_col else []
+    names += [column.name for column in spec.columns]
+    names += [link.name for link in spec.links]
+    if spec.active_col:
+        names.append(spec.active_col)
+    return names
+
+
+@lru_cache(maxsize=None)
+def compile_layout(spec, headers):
+    """
+    Return a function that turns the (cells, links, active) of a row of a
+    table with the given header cells (a tuple) into a record: a tuple with
+    the spec's columns, links and active flag, in that order.
+    """
+    positions = {}
+    seen = {}
+    for i, header in enumerate(headers):
+        nth = seen.get(header, 0)
+        seen[header] = nth + 1
+        positions[(header, nth)] = i
+
+    # the columns this layout doesn't have point past the last cell, at the
+    # padding
+    width = len(headers)
+    indexes = [positions.get((column.header, column.nth), width)
+               for column in spec.columns]
+    if len(indexes) == 1:
+        index = indexes[0]
+        get_columns = lambda cells: (cells[index],)  # noqa: E731
+    else:
+        get_columns = itemgetter(*indexes)
+    padding = [spec.fill] * (width + 1)
+
+    suffix = spec.strip_suffix
+    names = [column.name for column in spec.columns]
+    # (record index, text) of every link, one of them is None
+    link_sources = [(names.index(link.column) if link.column else None,
+                     link.text) for link in spec.links]
+    keep_active = bool(spec.active_col)
+
+    def to_record(cells, links, active):
+        if suffix:
+            cells = [text[:-len(suffix)] if text.endswith(suffix) else text
+                     for text in cells]
+        record = get_columns(cells[:width] +
+                             padding[min(len(cells), width):])
+        if link_sources:
+            # later links with the same text win
+            hrefs = {(text[:-len(suffix)] if suffix and text.endswith(suffix)
+                      else text): href for text, href in links}
+            record += tuple(hrefs.get(record[i] if i is not None else text,
+                                      "")
+                            for i, text in link_sources)
+        if keep_active:
+            record += (active,)
+        return record
+
+    return to_record
+
+
+def extract_records(spec, html):
+    """
+    Return the records (see compile_layout) of every non-empty data row of
+    the spec's table in a page.
+    """
+    rows = iter_table_rows(html, spec.table_id)
+    headers = ()
+    for _, (cells, _, _) in zip(range(spec.header_rows), rows):
+        headers = tuple(cells)
+    to_record = compile_layout(spec, headers)
+    return [to_record(cells, links, active)
+            for cells, links, active in rows if cells]
+
+
+def records_frame(spec, records, year=None):
+    """
+    Return records of the spec's table (from extract_records) as a DataFrame
+    of raw text cells, with the draft year in front if the spec has a year
+    column.
+    """
+    columns = output_columns(spec)
+    if spec.year_col:
+        columns = columns[1:]
+    df = pd.DataFrame(records, columns=columns)
+    if spec.year_col:
+        df.insert(0, spec.year_col, year)
+    return df
+
+
+def extract_frame(spec, html, year=None):
+    """
+    Return the spec's table in a page as a DataFrame (see records_frame).
+    """
+    return records_frame(spec, extract_records(spec, html), year)
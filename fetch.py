@@ -0,0 +1,258 @@
+"""
+Shared fetch layer for the draft scrapers.
+
+draft.py and nfl_draft.py both need one page per draft year. Instead of
+walking the years one blocking urlopen at a time, fetch_pages pulls a batch
+of urls concurrently over keep-alive connections and hands the pages back in
+the same order they were asked for, so the parse code can keep looping over
+the years as before.
+
+Pass a cache.ResponseCache to reuse pages downloaded by earlier runs, and
+offline=True to replay only from that cache without touching the network.
+
+Requests go through a throttle.Scheduler, which keeps to each site's rate
+limit, adapts the concurrency to how the host responds and retries the
+urls that were throttled or failed.
+"""
+import gzip
+import http.client
+import threading
+import time
+from urllib.parse import urljoin, urlsplit
+
+import metrics
+from throttle import Scheduler, retry_after_seconds
+
+# how many pages are in flight at once unless the caller says otherwise
+DEFAULT_CONCURRENCY = 8
+
+# seconds to wait on a single connect/read before giving up
+DEFAULT_TIMEOUT = 30
+
+# the sports-reference sites redirect http to https, so follow a few hops
+MAX_REDIRECTS = 5
+
+USER_AGENT = "Mozilla/5.0 (compatible; draft-scraper)"
+
+# errors that mean a kept-alive connection was closed by the server while it
+# sat idle in the pool; the request is safe to retry on a fresh connection
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected,
+                           http.client.BadStatusLine,
+                           BrokenPipeError, ConnectionResetError)
+
+
+class FetchError(Exception):
+    """
+    Raised when a url does not come back with a 200 response.
+    """
+
+    def __init__(self, url, status, reason="", retry_after=None):
+        super().__init__("{} returned HTTP {} {}".format(url, status, reason))
+        self.url = url
+        self.status = status
+        self.reason = reason
+        # seconds the server asked us to wait before trying again
+        self.retry_after = retry_after
+
+
+class OfflineCacheMiss(FetchError):
+    """
+    Raised in offline mode when a url is not in the response cache.
+    """
+
+    def __init__(self, url):
+        Exception.__init__(self, "{} is not cached (offline mode)".format(url))
+        self.url = url
+        self.status = None
+        self.reason = "not cached"
+        self.retry_after = None
+
+
+class ConnectionPool:
+    """
+    Keep-alive HTTP(S) connections, reused across requests to the same host.
+
+    Each request checks an idle connection out of the pool (or opens a new
+    one) and puts it back once the whole body has been read, so a batch of
+    pages from one site only pays for a handful of TCP/TLS handshakes.
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT):
+        self.timeout = timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _checkout(self, scheme, netloc):
+        with self._lock:
+            idle = self._idle.get((scheme, netloc))
+            if idle:
+                return idle.pop()
+        if scheme == "https":
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout)
+        return http.client.HTTPConnection(netloc, timeout=self.timeout)
+
+    def _checkin(self, scheme, netloc, conn):
+        with self._lock:
+            self._idle.setdefault((scheme, netloc), []).append(conn)
+
+    def _send(self, url, headers):
+        """
+        Send one GET and return (status, reason, headers, body) without
+        following redirects.
+        """
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        request_headers = {"User-Agent": USER_AGENT,
+                           "Accept-Encoding": "gzip"}
+        request_headers.update(headers or {})
+
+        # try a pooled connection first, and if the server already dropped it
+        # try once more on a brand new one
+        for attempt in range(2):
+            conn = self._checkout(parts.scheme, parts.netloc)
+            try:
+                conn.request("GET", path, headers=request_headers)
+                response = conn.getresponse()
+                body = response.read()
+            except STALE_CONNECTION_ERRORS:
+                conn.close()
+                if attempt:
+                    raise
+                continue
+            except Exception:
+                conn.close()
+                raise
+
+            if response.will_close:
+                conn.close()
+            else:
+                self._checkin(parts.scheme, parts.netloc, conn)
+
+            if response.getheader("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            return response.status, response.reason, response.headers, body
+
+    def request(self, url, headers=None):
+        """
+        GET a url, following redirects, and return
+        (final_url, status, reason, headers, body).
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            status, reason, response_headers, body = self._send(url, headers)
+            location = response_headers.get("Location")
+            if status in (301, 302, 303, 307, 308) and location:
+                url = urljoin(url, location)
+                continue
+            return url, status, reason, response_headers, body
+        raise FetchError(url, status, "too many redirects")
+
+    def close(self):
+        """
+        Close every idle connection.
+        """
+        with self._lock:
+            for conns in self._idle.values():
+                for conn in conns:
+                    conn.close()
+            self._idle.clear()
+
+
+def fetch_url(url, pool, cache=None, offline=False, scheduler=None):
+    """
+    Return the body of a url as bytes, raising FetchError unless it is a 200.
+
+    With a cache, a fresh cached copy is returned without a request and a
+    stale one is revalidated with If-None-Match/If-Modified-Since. With a
+    scheduler, the request waits for the host's rate and concurrency limits.
+
+    Every request (and every page served from the cache) is recorded in
+    the run's metrics, see metrics.py.
+    """
+    entry = cache.get(url) if cache is not None else None
+    if offline:
+        if entry is None:
+            metrics.record_request(url, "error", source="cache")
+            raise OfflineCacheMiss(url)
+        metrics.record_request(url, "cache", nbytes=len(entry.body),
+                               source="cache")
+        return entry.body
+    if entry is not None and cache.is_fresh(entry):
+        metrics.record_request(url, "cache", nbytes=len(entry.body),
+                               source="cache")
+        return entry.body
+
+    headers = entry.validators() if entry is not None else None
+
+    def request():
+        # every attempt is recorded, including the ones the scheduler retries
+        start = time.perf_counter()
+        try:
+            response = pool.request(url, headers)
+        except Exception:
+            metrics.record_request(url, "error", time.perf_counter() - start)
+            raise
+        _, status, reason, response_headers, body = response
+        metrics.record_request(url, status, time.perf_counter() - start,
+                               len(body))
+        if status not in (200, 304):
+            raise FetchError(url, status, reason, retry_after_seconds(
+                response_headers.get("Retry-After")))
+        return response
+
+    if scheduler is not None:
+        response = scheduler.send(url, request)
+    else:
+        response = request()
+    _, status, reason, response_headers, body = response
+
+    # the server says our copy is still good
+    if status == 304 and entry is not None:
+        cache.revalidated(url)
+        return entry.body
+    if status != 200:
+        raise FetchError(url, status, reason)
+
+    if cache is not None:
+        cache.put(url, body, response_headers.get("ETag"),
+                  response_headers.get("Last-Modified"))
+    return body
+
+
+def fetch_pages(urls, concurrency=DEFAULT_CONCURRENCY, pool=None,
+                return_exceptions=False, cache=None, offline=False,
+                scheduler=None):
+    """
+    Fetch every url in urls with at most concurrency requests in flight and
+    return the page bodies in the same order as urls.
+
+    cache and offline are passed through to fetch_url. By default the
+    requests go through a Scheduler starting at concurrency requests in
+    flight; pass your own to change its limits or retry policy.
+
+    Urls that are throttled or fail with a network error are put back on the
+    queue and retried. If return_exceptions is True a url that still fails
+    gets its exception in the returned list instead of aborting the whole
+    batch, so the caller can keep the years that did come back (like the
+    errors_list in nfl_draft.py).
+    """
+    own_pool = pool is None
+    if own_pool:
+        pool = ConnectionPool()
+    if scheduler is None:
+        scheduler = Scheduler(max_concurrency=concurrency,
+                              initial_concurrency=concurrency)
+
+    def fetch_one(url):
+        return fetch_url(url, pool, cache, offline, scheduler)
+
+    try:
+        # the results come back in the order of the urls, no matter which
+        # request finished first
+        return scheduler.map(fetch_one, urls,
+                             return_exceptions=return_exceptions)
+    finally:
+        if own_pool:
+            pool.close()
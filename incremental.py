@@ -0,0 +1,78 @@
+"""
+Incremental scraping: work out which draft years an existing output file is
+missing or has stale, so a scraper only fetches and parses those years and
+upserts them back in (see upsert.py).
+
+The scrapers run up to the latest draft held (latest_draft_year), so a new
+draft is picked up as soon as its page is out. Recent drafts, the last
+RECENT_DRAFT_YEARS before the latest one (cache.is_recent_draft, which
+the page cache goes by too), still have active players whose career stats
+(CarAV, To, WS, ...) move every season, so they are refreshed once they are
+older than the refresh window. Historical drafts are frozen and never
+fetched again once they are in the output. When each year was last scraped
+is kept in a small json file next to the output.
+"""
+import json
+import os
+import time
+
+from cache import (NBA_DRAFT_MONTH, NFL_DRAFT_MONTH, is_recent_draft,
+                   latest_draft_year)
+
+# how long a recent draft year stays fresh before it is scraped again
+DEFAULT_REFRESH_DAYS = 7
+
+DAY = 24 * 60 * 60
+
+
+def scrape_log_path(output_path):
+    """
+    Return the path of the json file recording when each year of
+    output_path was last scraped.
+    """
+    return output_path + ".years.json"
+
+
+def load_scrape_log(output_path):
+    """
+    Return {year: unix time it was last scraped} for output_path.
+    """
+    path = scrape_log_path(output_path)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return {int(year): scraped_at
+                for year, scraped_at in json.load(f).items()}
+
+
+def save_scrape_log(output_path, scrape_log):
+    with open(scrape_log_path(output_path), "w") as f:
+        json.dump({str(year): scraped_at
+                   for year, scraped_at in sorted(scrape_log.items())},
+                  f, indent=1)
+
+
+def years_to_scrape(existing_years, years, scrape_log, refresh_days=None,
+                    now=None, latest_year=None):
+    """
+    Return the years in years that need to be scraped: the ones missing from
+    existing_years, plus the recent ones (within RECENT_DRAFT_YEARS of
+    latest_year, the last of years by default) that were last scraped more
+    than refresh_days ago (or whose scrape time is unknown).
+    """
+    if refresh_days is None:
+        refresh_days = DEFAULT_REFRESH_DAYS
+    now = time.time() if now is None else now
+    years = list(years)
+    latest_year = max(years) if latest_year is None else latest_year
+    existing_years = set(existing_years)
+
+    stale = []
+    for year in years:
+        if year not in existing_years:
+            stale.append(year)
+        elif is_recent_draft(year, latest_year):
+            scraped_at = scrape_log.get(year)
+            if scraped_at is None or now - scraped_at > refresh_days * DAY:
+                stale.append(year)
+    return stale
@@ -0,0 +1,264 @@
+"""
+Kaplan-Meier survival curves for many groups of players at once.
+
+lifelines' KaplanMeierFitter fits one group at a time, so slicing the
+survival data by position x round x era means hundreds of separate fits.
+GroupedKaplanMeier sorts the players by (group, duration) once and gets
+every group's event table, survival curve, exponential Greenwood
+confidence interval and median out of grouped cumulative sums. The numbers
+are the same as lifelines gives for each group on its own (see
+benchmarks/bench_kaplan_meier.py).
+
+Bootstrap confidence intervals for the medians are batched the same way:
+every replicate of a group is a row of one matrix of resampled counts, and
+all their curves and medians come out of a few array operations.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+DEFAULT_REPLICATES = 10000
+
+# how many bootstrap replicates of a group are computed in one block
+DEFAULT_BATCH_SIZE = 2000
+
+
+def _group_codes(groups, n):
+    """
+    Return (code of every row, index of the group keys in code order) for
+    groups, which can be None (one group), a Series or array, a DataFrame or
+    a list of Series/arrays (one group per combination of values).
+    """
+    if groups is None:
+        return np.zeros(n, dtype=np.intp), pd.Index([None], name="group")
+    if isinstance(groups, pd.DataFrame):
+        key_df = groups.reset_index(drop=True)
+    elif isinstance(groups, (list, tuple)):
+        key_df = pd.concat(
+            [pd.Series(np.asarray(g), name=getattr(g, "name", None) or
+                       "group_{}".format(i)) for i, g in enumerate(groups)],
+            axis=1)
+    else:
+        key_df = pd.DataFrame(
+            {getattr(groups, "name", None) or "group": np.asarray(groups)})
+    grouped = key_df.groupby(list(key_df.columns), sort=True, dropna=False)
+    return grouped.ngroup().to_numpy(), grouped.size().index
+
+
+class GroupedKaplanMeier:
+    """
+    Kaplan-Meier estimates for every group in one pass.
+
+    After fit():
+
+    * event_table_ has the lifelines event table columns (removed,
+      observed, censored, entrance, at_risk) indexed by (group, timeline),
+    * survival_function_ has the KM estimate and its lower and upper
+      confidence bounds on the same index,
+    * median_ is every group's median survival time (inf if the curve never
+      drops to 0.5).
+    """
+
+    def __init__(self, alpha=0.05):
+        self.alpha = alpha
+
+    def fit(self, durations, event_observed, groups=None):
+        durations = np.asarray(durations, dtype=float)
+        events = np.asarray(event_observed, dtype=bool)
+        codes, self.groups_ = _group_codes(groups, len(durations))
+        n_groups = len(self.groups_)
+
+        # every group's timeline starts at 0, like lifelines' does
+        times, time_codes = np.unique(np.append(durations, 0.0),
+                                      return_inverse=True)
+        zero_code = time_codes[-1]
+        time_codes = time_codes[:-1]
+
+        # one row per (group, time): sort once on a combined key and count
+        keys = np.concatenate([codes * len(times) + time_codes,
+                               np.arange(n_groups) * len(times) + zero_code])
+        rows, row_codes = np.unique(keys, return_inverse=True)
+        row_codes = row_codes[:len(durations)]
+        removed = np.bincount(row_codes, minlength=len(rows))
+        observed = np.bincount(row_codes, weights=events,
+                               minlength=len(rows)).astype(np.int64)
+        row_group = rows // len(times)
+        timeline = times[rows % len(times)]
+
+        # everyone enters at the start of their group's timeline
+        group_size = np.bincount(codes, minlength=n_groups)
+        first = np.r_[True, row_group[1:] != row_group[:-1]]
+        entrance = np.where(first, group_size[row_group], 0)
+
+        by_group = pd.Series(removed).groupby(row_group)
+        at_risk = (group_size[row_group] -
+                   (by_group.cumsum() - removed).to_numpy())
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            log_terms = np.log(at_risk - observed) - np.log(at_risk)
+            greenwood = observed / (at_risk * (at_risk - observed))
+        greenwood[np.isinf(greenwood)] = 0
+        log_survival = pd.Series(log_terms).groupby(row_group).cumsum()
+        cumulative_sq = pd.Series(greenwood).groupby(row_group).cumsum()
+        survival = np.exp(log_survival.to_numpy())
+
+        # exponential Greenwood bounds, as in lifelines
+        z = norm.ppf(1 - self.alpha / 2)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            v = np.log(survival)
+            spread = z * np.sqrt(cumulative_sq.to_numpy()) / v
+            lower = np.exp(-np.exp(np.log(-v) - spread))
+            upper = np.exp(-np.exp(np.log(-v) + spread))
+        lower[np.isnan(lower)] = 1.0
+        upper[np.isnan(upper)] = 1.0
+
+        index = self._index(row_group, timeline)
+        self.event_table_ = pd.DataFrame(
+            {"removed": removed, "observed": observed,
+             "censored": removed - observed, "entrance": entrance,
+             "at_risk": at_risk}, index=index)
+        self.survival_function_ = pd.DataFrame(
+            {"KM_estimate": survival, "lower": lower, "upper": upper},
+            index=index)
+
+        # the median is the first time the curve is at or below 0.5
+        below = survival <= 0.5
+        first_below = pd.Series(np.where(below, timeline, np.inf)).groupby(
+            row_group).min()
+        self.median_ = pd.Series(first_below.to_numpy(), index=self.groups_,
+                                 name="median")
+
+        self._row_group = row_group
+        self._timeline = timeline
+        self._survival = survival
+        self._observed = observed
+        self._censored = removed - observed
+        return self
+
+    def _index(self, row_group, timeline):
+        keys = self.groups_[row_group]
+        if isinstance(keys, pd.MultiIndex):
+            arrays = [keys.get_level_values(i) for i in range(keys.nlevels)]
+        else:
+            arrays = [keys]
+        return pd.MultiIndex.from_arrays(
+            arrays + [timeline], names=list(self.groups_.names) + ["timeline"])
+
+    def _position(self, group):
+        return 0 if group is None else self.groups_.get_loc(group)
+
+    def survival_function(self, group=None):
+        """
+        Return the survival curve and confidence bounds of one group,
+        indexed by timeline (group can be left out when there is only one).
+        """
+        rows = self._row_group == self._position(group)
+        return self.survival_function_.iloc[rows].set_axis(
+            pd.Index(self._timeline[rows], name="timeline"))
+
+    def predict(self, times):
+        """
+        Return the survival probability of every group at each of times, a
+        DataFrame with one row per group and one column per time.
+        """
+        times = np.atleast_1d(np.asarray(times, dtype=float))
+        # the last row of each group at or before each time, found with one
+        # search on group + time scaled into [0, 1)
+        scale = self._timeline.max() + 1
+        keys = self._row_group + self._timeline / scale
+        groups = np.arange(len(self.groups_))
+        wanted = (groups[:, None] +
+                  np.minimum(times, self._timeline.max())[None, :] / scale)
+        rows = np.searchsorted(keys, wanted.ravel(), side="right") - 1
+        same_group = self._row_group[np.maximum(rows, 0)] == np.repeat(
+            groups, len(times))
+        values = np.where((rows >= 0) & same_group,
+                          self._survival[np.maximum(rows, 0)], 1.0)
+        return pd.DataFrame(values.reshape(len(groups), len(times)),
+                            index=self.groups_, columns=times)
+
+    def bootstrap_median_ci(self, n_replicates=DEFAULT_REPLICATES, alpha=None,
+                            seed=None, processes=None,
+                            batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Return a DataFrame with every group's median and the bounds of its
+        bootstrap percentile confidence interval (1 - alpha, the fitted alpha
+        by default) from n_replicates resamples of the group's players.
+
+        The replicates are computed in blocks of batch_size; with processes
+        the blocks are spread over a pool of that many worker processes.
+        The result only depends on seed, not on processes or batch_size.
+        """
+        alpha = self.alpha if alpha is None else alpha
+        jobs = []
+        for position in range(len(self.groups_)):
+            rows = self._row_group == position
+            counts = np.stack([self._censored[rows], self._observed[rows]])
+            for start in range(0, n_replicates, batch_size):
+                jobs.append((position, counts, self._timeline[rows],
+                             min(batch_size, n_replicates - start)))
+        # one independent random stream per block, so the draws are the
+        # same whichever process computes them
+        seeds = np.random.SeedSequence(seed).spawn(len(jobs))
+        args = [job[1:] + (block_seed,) for job, block_seed in zip(jobs, seeds)]
+
+        if processes:
+            with ProcessPoolExecutor(processes) as executor:
+                blocks = list(executor.map(_replicate_medians, *zip(*args)))
+        else:
+            blocks = [_replicate_medians(*arg) for arg in args]
+
+        medians = [[] for _ in range(len(self.groups_))]
+        for (position, *_), block in zip(jobs, blocks):
+            medians[position].append(block)
+        # the medians are step times (or inf), so take actual values
+        # rather than interpolating between them
+        bounds = np.array([
+            np.quantile(np.concatenate(group), [alpha / 2, 1 - alpha / 2],
+                        method="inverted_cdf") for group in medians])
+        return pd.DataFrame({"median": self.median_.to_numpy(),
+                             "lower": bounds[:, 0], "upper": bounds[:, 1]},
+                            index=self.groups_)
+
+    def plot(self, group=None, ax=None, ci=True, **kwargs):
+        """
+        Draw one group's survival curve as a step plot, with its confidence
+        band shaded, and return the axes.
+        """
+        import matplotlib.pyplot as plt
+
+        ax = ax or plt.gca()
+        sf = self.survival_function(group)
+        line, = ax.step(sf.index, sf.KM_estimate, where="post", **kwargs)
+        if ci:
+            ax.fill_between(sf.index, sf.lower, sf.upper, step="post",
+                            alpha=0.25, color=line.get_color(), linewidth=0)
+        ax.set_xlabel("timeline")
+        return ax
+
+
+def _replicate_medians(counts, timeline, n_replicates, seed):
+    """
+    Return the KM median of n_replicates bootstrap resamples of one group.
+
+    counts holds the number of censored (row 0) and retired (row 1) players
+    at each time of timeline. Resampling the players with replacement only
+    changes how many land in each of those cells, so each replicate is one
+    multinomial draw of the cell counts, and the KM curves of all of them
+    are cumulative sums along the rows of one matrix.
+    """
+    rng = np.random.default_rng(seed)
+    n = counts.sum()
+    draws = rng.multinomial(n, counts.ravel() / n, size=n_replicates)
+    draws = draws.reshape(n_replicates, 2, -1)
+    observed = draws[:, 1]
+    removed = draws.sum(axis=1)
+    at_risk = n - np.cumsum(removed, axis=1) + removed
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_terms = np.log(at_risk - observed) - np.log(at_risk)
+    # nobody left at risk, so the curve stays where it was
+    log_terms[at_risk == 0] = 0
+    below = np.exp(np.cumsum(log_terms, axis=1)) <= 0.5
+    return np.where(below.any(axis=1), timeline[below.argmax(axis=1)], np.inf)
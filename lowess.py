@@ -0,0 +1,181 @@
+"""
+LOWESS curves for the CarAV by Pick charts, fitted once and shared.
+
+sns.regplot/lmplot(lowess=True) run statsmodels' LOWESS over every point of
+a chart (or of every position in it) each time a chart is drawn, so the
+same curves get fitted again for each of the figures in nfl_draft.py. Here
+a curve is fitted once per data set, i.e. per position and version of the
+data, and kept in memory and in CACHE_DIR (one small .npy file per curve,
+so render.py's worker processes share them too).
+
+Small data sets get the exact statsmodels fit. Above BIN_THRESHOLD points
+the points are binned along x: every bin keeps its (robustness weighted)
+sums of x, y, x*x and x*y, the local regressions are solved at the bins from
+those sums in one vectorized pass and the curve is interpolated in between.
+Pick only takes a few hundred distinct values, so with DEFAULT_BINS the
+bins are mostly single picks and the binned curve stays within a fraction
+of a point of the exact one, see benchmarks/bench_lowess.py.
+
+lowess_line draws a cached curve, with the same call signature FacetGrid.map
+hands to its plotting functions:
+
+    grid = sns.FacetGrid(df, col="Pos")
+    grid.map(lowess_line, "Pick", "CarAV", color="black")
+"""
+import hashlib
+import os
+
+import matplotlib.pyplot as plt
+import numpy as np
+from statsmodels.nonparametric.smoothers_lowess import lowess
+
+# the statsmodels (and seaborn) defaults
+DEFAULT_FRAC = 2 / 3
+DEFAULT_IT = 3
+
+# data sets with more points than this get the binned fit
+BIN_THRESHOLD = 2000
+DEFAULT_BINS = 512
+
+CACHE_DIR = ".lowess_cache"
+
+# curves already fitted by this process, by cache key
+_curves = {}
+
+
+def _tricube(u):
+    return np.clip(1 - np.abs(u) ** 3, 0, None) ** 3
+
+
+def _bisquare(u):
+    return np.clip(1 - u ** 2, 0, None) ** 2
+
+
+def exact_lowess(x, y, frac=DEFAULT_FRAC, it=DEFAULT_IT):
+    """
+    Return the statsmodels LOWESS fit of y on x as (xs, fitted) at the
+    distinct values of x.
+    """
+    fit = lowess(y, x, frac=frac, it=it)
+    xs, first = np.unique(fit[:, 0], return_index=True)
+    return xs, fit[first, 1]
+
+
+def binned_lowess(x, y, frac=DEFAULT_FRAC, it=DEFAULT_IT, bins=DEFAULT_BINS):
+    """
+    Return an approximate LOWESS fit of y on x as (xs, fitted), solved at
+    the mean x of each of (at most) bins equal width bins.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    k = int(np.ceil(frac * n))
+
+    edges = np.linspace(x.min(), x.max(), bins + 1)
+    point_bin = np.clip(np.searchsorted(edges, x, side="right") - 1, 0,
+                        bins - 1)
+    counts = np.bincount(point_bin, minlength=bins)
+    used = counts > 0
+    point_bin = np.cumsum(used)[point_bin] - 1
+    counts = counts[used]
+    centers = np.bincount(point_bin, weights=x) / counts
+
+    # the neighbourhood of a bin reaches out to the bin where the k nearest
+    # points are covered
+    distances = np.abs(centers[:, None] - centers[None, :])
+    order = np.argsort(distances, axis=1, kind="stable")
+    covered = np.cumsum(counts[order], axis=1)
+    reach = np.argmax(covered >= k, axis=1)
+    radius = distances[np.arange(len(centers)), order[np.arange(len(centers)),
+                                                      reach]]
+    # a neighbourhood inside one bin still has to weigh something
+    radius = np.maximum(radius, np.finfo(float).eps)
+    kernel = _tricube(distances / radius[:, None])
+
+    robustness = np.ones(n)
+    for _ in range(it + 1):
+        sums = [np.bincount(point_bin, weights=robustness * term)
+                for term in (np.ones(n), x, x * x, y, x * y)]
+        s0, sx, sxx, sy, sxy = (kernel @ total for total in sums)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            denom = s0 * sxx - sx * sx
+            slope = np.where(np.abs(denom) > 1e-12 * s0 * s0,
+                             (s0 * sxy - sx * sy) / denom, 0)
+            fitted = (sy - slope * sx) / s0 + slope * centers
+
+        residuals = y - np.interp(x, centers, fitted)
+        scale = np.median(np.abs(residuals))
+        if scale == 0:
+            break
+        robustness = _bisquare(residuals / (6 * scale))
+    return centers, fitted
+
+
+def fit_lowess(x, y, frac=DEFAULT_FRAC, it=DEFAULT_IT, bins=DEFAULT_BINS):
+    """
+    Return the LOWESS fit of y on x as (xs, fitted), binned for large data.
+    """
+    if bins is None or len(x) <= BIN_THRESHOLD:
+        return exact_lowess(x, y, frac, it)
+    return binned_lowess(x, y, frac, it, bins)
+
+
+def data_version(x, y):
+    """
+    Return a hash of the points, which identifies the data set of a curve.
+    """
+    digest = hashlib.sha256()
+    for values in (x, y):
+        digest.update(np.ascontiguousarray(values, dtype=float).tobytes())
+    return digest.hexdigest()
+
+
+def cached_lowess(x, y, frac=DEFAULT_FRAC, it=DEFAULT_IT, bins=DEFAULT_BINS,
+                  cache_dir=CACHE_DIR):
+    """
+    Return fit_lowess(x, y, ...), fitting it only if this data and these
+    settings haven't been fitted before.
+    """
+    key = "{}-{}-{}-{}".format(data_version(x, y), frac, it, bins)
+    key = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+    if key in _curves:
+        return _curves[key]
+
+    path = None
+    if cache_dir is not None:
+        path = os.path.join(cache_dir, key + ".npy")
+        if os.path.exists(path):
+            xs, fitted = np.load(path)
+            _curves[key] = xs, fitted
+            return xs, fitted
+
+    xs, fitted = fit_lowess(np.asarray(x, dtype=float),
+                            np.asarray(y, dtype=float), frac, it, bins)
+    _curves[key] = xs, fitted
+    if path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        # write and rename, so another process never reads half a file
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.vstack([xs, fitted]))
+        os.replace(tmp_path, path)
+    return xs, fitted
+
+
+def group_curves(df, x, y, by, **kwargs):
+    """
+    Return {group: (xs, fitted)} with the cached LOWESS fit of every group.
+    """
+    return {name: cached_lowess(group[x], group[y], **kwargs)
+            for name, group in df.groupby(by)}
+
+
+def lowess_line(x, y, ax=None, **kwargs):
+    """
+    Draw the cached LOWESS fit of y on x as a line on ax (or the current
+    axes), passing the other keyword arguments on to ax.plot.
+    """
+    if ax is None:
+        ax = plt.gca()
+    xs, fitted = cached_lowess(x, y)
+    return ax.plot(xs, fitted, **kwargs)
@@ -0,0 +1,303 @@
+"""
+Structured metrics for the scrape and analysis scripts.
+
+Pass --metrics PATH to draft.py, nfl_draft.py, data_prep.py or render.py
+and the run records
+
+    stage    wall time and peak Python memory (tracemalloc) of every stage
+             (fetch, parse, clean, analyze, store, render ...)
+    request  url, host, HTTP status (or "cache"/"error"), latency and bytes
+             of every request fetch.py makes or serves from the cache
+    rows     the rows parsed for every draft year
+    error    the years or urls that failed
+    chart    the render time of every chart
+
+as JSON lines in PATH, and the same totals in Prometheus text format in
+PATH with a .prom extension (for node_exporter's textfile collector), so
+scrape health can be graphed and slow years or regressed stages spotted.
+
+Nothing is recorded unless a script calls enable(), the module-level
+functions are no-ops until then:
+
+    metrics.enable("nba_draft")
+    with metrics.stage("parse"):
+        ...
+        metrics.record_rows("parse", len(rows), year=year)
+    metrics.finish("metrics.jsonl")
+
+tracemalloc slows down allocation heavy code while it is tracing, so the
+stage times of an instrumented run are a bit higher than those of a plain
+one.
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from urllib.parse import urlsplit
+
+# prefix of every Prometheus metric name
+PROM_PREFIX = "draft"
+
+_recorder = None
+
+
+class MetricsRecorder:
+    """
+    Collect the metric events of one run of a script.
+    """
+
+    def __init__(self, job, trace_memory=True):
+        self.job = job
+        self.trace_memory = trace_memory
+        self.events = []
+        self.started = time.time()
+        self._lock = threading.Lock()
+        # the peak memory seen so far by each open stage, innermost last
+        self._stages = []
+        self._started_tracing = False
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def event(self, kind, **fields):
+        event = {"ts": round(time.time(), 6), "job": self.job, "kind": kind}
+        event.update(fields)
+        with self._lock:
+            self.events.append(event)
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Record the wall time and peak traced memory of the block.
+        """
+        if self.trace_memory:
+            if self._stages:
+                # keep the peak the enclosing stage reached before this one
+                self._stages[-1] = max(self._stages[-1],
+                                       tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        self._stages.append(0)
+        start = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            seconds = time.perf_counter() - start
+            peak = self._stages.pop()
+            if self.trace_memory:
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                if self._stages:
+                    self._stages[-1] = max(self._stages[-1], peak)
+            self.event("stage", stage=name, seconds=round(seconds, 6),
+                       peak_memory_bytes=peak if self.trace_memory else None,
+                       ok=ok)
+
+    def close(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def write_jsonl(self, path):
+        with open(path, "w") as f:
+            for event in self.events:
+                f.write(json.dumps(event) + "\n")
+
+    def prometheus_text(self):
+        """
+        Return the totals of the run in the Prometheus text exposition
+        format.
+        """
+        samples = defaultdict(list)
+        stage_seconds = defaultdict(float)
+        stage_memory = {}
+        requests = defaultdict(int)
+        downloaded = defaultdict(int)
+        latency = defaultdict(lambda: [0.0, 0])
+        errors = defaultdict(int)
+        for event in self.events:
+            kind = event["kind"]
+            if kind == "stage":
+                stage_seconds[event["stage"]] += event["seconds"]
+                if event["peak_memory_bytes"] is not None:
+                    stage_memory[event["stage"]] = max(
+                        stage_memory.get(event["stage"], 0),
+                        event["peak_memory_bytes"])
+            elif kind == "request":
+                key = (event["host"], str(event["status"]))
+                requests[key] += 1
+                if event["source"] == "network":
+                    downloaded[event["host"]] += event["bytes"]
+                    latency[event["host"]][0] += event["seconds"]
+                    latency[event["host"]][1] += 1
+            elif kind == "rows":
+                samples["rows_parsed"].append(
+                    ({"stage": event["stage"], "year": event.get("year")},
+                     event["count"]))
+            elif kind == "error":
+                errors[event["stage"]] += 1
+            elif kind == "chart" and event["status"] == "rendered":
+                samples["chart_seconds"].append(({"chart": event["chart"]},
+                                                 event["seconds"]))
+
+        for stage, seconds in stage_seconds.items():
+            samples["stage_seconds"].append(({"stage": stage}, seconds))
+        for stage, peak in stage_memory.items():
+            samples["stage_peak_memory_bytes"].append(({"stage": stage},
+                                                       peak))
+        for (host, status), count in requests.items():
+            samples["requests_total"].append(
+                ({"host": host, "status": status}, count))
+        for host, nbytes in downloaded.items():
+            samples["downloaded_bytes_total"].append(({"host": host},
+                                                      nbytes))
+        for host, (seconds, count) in latency.items():
+            samples["request_seconds_sum"].append(({"host": host}, seconds))
+            samples["request_seconds_count"].append(({"host": host}, count))
+        for stage, count in errors.items():
+            samples["errors_total"].append(({"stage": stage}, count))
+        samples["run_timestamp_seconds"].append(({}, self.started))
+
+        lines = []
+        for name, help_text, metric_type in PROM_METRICS:
+            # the _sum and _count series belong to the summary's header
+            series = [name] if metric_type != "summary" else [
+                name + "_sum", name + "_count"]
+            if not any(samples.get(s) for s in series):
+                continue
+            full_name = "{}_{}".format(PROM_PREFIX, name)
+            lines.append("# HELP {} {}".format(full_name, help_text))
+            lines.append("# TYPE {} {}".format(full_name, metric_type))
+            for s in series:
+                for labels, value in samples.get(s, []):
+                    lines.append("{}_{}{} {}".format(
+                        PROM_PREFIX, s, _labels(self.job, labels),
+                        _number(value)))
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        # write and rename so the textfile collector never reads half a file
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+
+# (name, help, type) of every Prometheus metric, in the order they're written
+PROM_METRICS = [
+    ("stage_seconds", "Wall time of each pipeline stage.", "gauge"),
+    ("stage_peak_memory_bytes",
+     "Peak Python memory traced during each pipeline stage.", "gauge"),
+    ("requests_total", "Requests by host and HTTP status (or cache/error).",
+     "counter"),
+    ("downloaded_bytes_total", "Bytes downloaded by host.", "counter"),
+    ("request_seconds", "Latency of the requests sent over the network.",
+     "summary"),
+    ("rows_parsed", "Rows parsed for each draft year.", "gauge"),
+    ("errors_total", "Years or urls that failed, by stage.", "counter"),
+    ("chart_seconds", "Render time of each chart.", "gauge"),
+    ("run_timestamp_seconds", "Unix time the run started.", "gauge"),
+]
+
+
+def _labels(job, labels):
+    pairs = [("job", job)] + [(key, value) for key, value in labels.items()
+                              if value is not None]
+    return "{" + ",".join('{}="{}"'.format(
+        key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for key, value in pairs) + "}"
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def prometheus_path(path):
+    """
+    Return the path the Prometheus text goes to for a JSON lines path.
+    """
+    return os.path.splitext(path)[0] + ".prom"
+
+
+def enable(job, trace_memory=True):
+    """
+    Start recording metrics for this process and return the recorder.
+    """
+    global _recorder
+    _recorder = MetricsRecorder(job, trace_memory)
+    return _recorder
+
+
+def active():
+    """
+    Return the recorder, or None if metrics aren't being recorded.
+    """
+    return _recorder
+
+
+def finish(path=None):
+    """
+    Stop recording and write the metrics to path (JSON lines) and
+    prometheus_path(path), if given.
+    """
+    global _recorder
+    recorder, _recorder = _recorder, None
+    if recorder is None:
+        return None
+    recorder.close()
+    if path is not None:
+        recorder.write_jsonl(path)
+        recorder.write_prometheus(prometheus_path(path))
+    return recorder
+
+
+def stage(name):
+    """
+    Context manager that records the wall time and peak memory of a stage.
+    """
+    if _recorder is None:
+        return nullcontext()
+    return _recorder.stage(name)
+
+
+def record_request(url, status, seconds=0.0, nbytes=0, source="network"):
+    """
+    Record one request: status is the HTTP status, or "cache" for pages
+    served from the response cache and "error" for network errors.
+    """
+    if _recorder is not None:
+        _recorder.event("request", url=url, host=urlsplit(url).netloc,
+                        status=status, seconds=round(seconds, 6),
+                        bytes=nbytes, source=source)
+
+
+def record_rows(stage_name, count, **labels):
+    if _recorder is not None:
+        _recorder.event("rows", stage=stage_name, count=count, **labels)
+
+
+def record_error(stage_name, error, **labels):
+    if _recorder is not None:
+        _recorder.event("error", stage=stage_name, error=str(error),
+                        error_type=type(error).__name__, **labels)
+
+
+def record_chart(name, seconds, status):
+    if _recorder is not None:
+        _recorder.event("chart", chart=name, seconds=round(seconds, 6),
+                        status=status)
+
+
+def add_argument(parser):
+    """
+    Add the --metrics option to a script's argument parser.
+    """
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="write metrics of the run as JSON lines to PATH "
+                             "and in Prometheus text format to PATH with a "
+                             ".prom extension")
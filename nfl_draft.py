@@ -1,240 +1,581 @@
+import argparse
+import os
+import sys
+import time
 import matplotlib.pyplot as plt
 import seaborn as sns
 import pandas as pd
-import html5lib
 # set some plotting styles
 from matplotlib import rcParams
 
-from urllib.request import urlopen
-from bs4 import BeautifulSoup
+from cache import ResponseCache
+from cleaning import coerce_to_schema, convert_numeric
+from density import points
+from extract_spec import NFL_DRAFT, extract_frame, records_frame
+from fetch import fetch_pages
+from incremental import (DEFAULT_REFRESH_DAYS, NFL_DRAFT_MONTH,
+                         latest_draft_year, load_scrape_log,
+                         save_scrape_log, years_to_scrape)
+from lowess import lowess_line
+import metrics
+from parse_pool import ParseError, fetch_and_parse
+from render import ChartJob
+from storage import (NFL_DRAFT_SCHEMA, NFL_DRAFT_STORE, ChunkWriter,
+                     read_table, table_exists)
+from upsert import keyed_rows, merge_sorted, upsert_table
 
-def extract_player_data(table_rows):
-    """
-    Extract and return the the desired information from the td elements within
-    the table rows.
-    """
-    # create the empty list to store the player data
-    player_data = []
+# The url template that we pass in the draft year inro
+url_template = NFL_DRAFT.url_template
 
-    for row in table_rows:  # for each row do the following
+# the beginning of the pfr url for the player links
+pfr_url = "http://www.pro-football-reference.com"
 
-        # Get the text for each table data (td) element in the row
-        # Some player names end with ' HOF', if they do, get the text excluding
-        # those last 4 characters,
-        # otherwise get all the text data from the table data
-        player_list = [td.get_text()[:-4] if td.get_text().endswith(" HOF")
-                       else td.get_text() for td in row.find_all(['th' , 'td'])]
+draft_csv = "pfr_nfl_draft_data_CLEAN.csv"
+player_ids_csv = "pfr_player_ids_and_links.csv"
 
-        # there are some empty table rows, which are the repeated
-        # column headers in the table
-        # we skip over those rows and and continue the for loop
-        if not player_list:
-            continue
+# the player IDs file, keyed on the draft row like the draft store
+PLAYER_ID_COLUMNS = ["Player", "Player_ID", "Player_NFL_Link",
+                     "Player_NCAA_Link", "Draft_Yr", "Pick"]
 
-        # Extracting the player links
-        # Instead of a list we create a dictionary, this way we can easily
-        # match the player name with their pfr url
-        # For all "a" elements in the row, get the text
-        # NOTE: Same " HOF" text issue as the player_list above
-        links_dict = {(link.get_text()[:-4]   # exclude the last 4 characters
-                       if link.get_text().endswith(" HOF")  # if they are " HOF"
-                       # else get all text, set thet as the dictionary key
-                       # and set the url as the value
-                       else link.get_text()) : link["href"]
-                       for link in row.find_all("a", href=True)}
-
-        # The data we want from the dictionary can be extracted using the
-        # player's name, which returns us their pfr url, and "College Stats"
-        # which returns us their college stats page
-
-        # add the link associated to the player's pro-football-reference page,
-        # or en empty string if there is no link
-        player_list.append(links_dict.get(player_list[3], ""))
-
-        # add the link for the player's college stats or an empty string
-        # if ther is no link
-        player_list.append(links_dict.get("College Stats", ""))
-
-        # Now append the data to list of data
-        player_data.append(player_list)
-
-    return player_data
-# Create an empty list that will contain all the dataframes
-# (one dataframe for each draft)
-draft_dfs_list = []
-
-# a list to store any errors that may come up while scraping
-errors_list = []
+# rows cleaned and written at a time in --stream mode
+DEFAULT_CHUNK_SIZE = 2000
 
-# The url template that we pass in the draft year inro
-url_template = "http://www.pro-football-reference.com/years/{year}/draft.htm"
+# draft pages fetched at a time in --stream mode
+STREAM_FETCH_BATCH = 8
 
-# for each year from 1967 to (and including) 2016
-for year in range(1967, 2018):
 
-    # Use try/except block to catch and inspect any urls that cause an error
-    try:
-        # get the draft url
-        url = url_template.format(year=year)
+def iter_year_dfs(years, pages, errors_list, parsed=False):
+    """
+    Yield a DataFrame of raw player rows, with the draft year in front, for
+    the draft page of every year. pages can be a lazy iterable, only one
+    page is looked at a time. With parsed=True pages holds the records of
+    every page instead, as parse_pool.fetch_and_parse returns them.
 
-        # get the html
-        html = urlopen(url)
+    The [url, error] of every year whose page could not be downloaded or
+    parsed is appended to errors_list.
+    """
+    for year, html in zip(years, pages):
+        url = url_template.format(year=year)
 
-        # create the BeautifulSoup object
-        soup = BeautifulSoup(html, "html5lib")
+        # Use try/except block to catch and inspect any urls that cause an error
+        try:
+            # re-raise the download error so it gets stored below
+            if isinstance(html, Exception):
+                raise html
+
+            # get the player data (with the player and college stats links)
+            # from the #drafts table, the spec names the columns and fills
+            # in the ones older drafts don't have (Tkl before 1994)
+            if parsed:
+                year_df = records_frame(NFL_DRAFT, html, year)
+            else:
+                year_df = extract_frame(NFL_DRAFT, html, year)
+            metrics.record_rows("parse", len(year_df), year=year)
+
+        except Exception as e:
+            # Store the url and the error it causes in a list
+            error =[url, e]
+            # then append it to the list of errors
+            errors_list.append(error)
+            failed_fetch = html is e and not isinstance(e, ParseError)
+            metrics.record_error("fetch" if failed_fetch else "parse", e,
+                                 year=year, url=url)
+            continue
 
-        # get the column headers
-        column_headers = [th.getText() for th in
-                          soup.findAll('tr', limit=2)[1].findAll('th')]
-        column_headers.extend(["Player_NFL_Link", "Player_NCAA_Link"])
+        yield year_df
 
-        # select the data from the table using the '#drafts tr' CSS selector
-        table_rows = soup.select("#drafts tr")[2:]
 
-        # extract the player data from the table rows
-        player_data = extract_player_data(table_rows)
+def build_draft_df(years, pages, parsed=False):
+    """
+    Turn the draft page (or with parsed=True, the records) of every year
+    into one DataFrame of raw player rows, with the draft year in front.
 
-        # create the dataframe for the current years draft
-        year_df = pd.DataFrame(player_data, columns=column_headers)
+    Returns the DataFrame and a list of [url, error] for the years whose page
+    could not be downloaded or parsed.
+    """
+    # a list to store any errors that may come up while scraping
+    errors_list = []
 
-        # if it is a draft from before 1994 then add a Tkl column at the
-        # 24th position
-        if year < 1994:
-            year_df.insert(24, "Tkl", "")
+    # store all drafts in one DataFrame
+    year_dfs = list(iter_year_dfs(years, pages, errors_list, parsed))
+    if not year_dfs:
+        raise NoDraftsScraped(errors_list)
+    draft_df = pd.concat(year_dfs, ignore_index=True)
+    return draft_df, errors_list
 
-        # add the year of the draft to the dataframe
-        year_df.insert(0, "Draft_Yr", year)
 
-        # append the current dataframe to the list of dataframes
-        draft_dfs_list.append(year_df)
+def clean_draft_df(draft_df):
+    """
+    Pull out the player IDs and links and convert the data to proper
+    numeric types.
 
-    except Exception as e:
-        # Store the url and the error it causes in a list
-        error =[url, e]
-        # then append it to the list of errors
-        errors_list.append(error)
-# store all drafts in one DataFrame
-draft_df = pd.concat(draft_dfs_list, ignore_index=True)
+    Returns the clean DataFrame and a DataFrame of the player names, IDs and
+    links.
+    """
+    # set the active player flag aside, it goes back at the end
+    draft_df = draft_df.copy()
+    is_active = draft_df.pop("Is_Active")
 
-# Take a look at the first few rows
-#print(draft_df.head())
+    # extract the player id from the player links
+    # expand=False returns the IDs as a pandas Series
+    player_ids = draft_df.Player_NFL_Link.str.extract(r"/.*/.*/(.*)\.",
+                                                      expand=False)
 
-# get the current column headers from the dataframe as a list
-column_headers = draft_df.columns.tolist()
+    # add a Player_ID column to our draft_df
+    draft_df["Player_ID"] = player_ids
 
-# The 5th column header is an empty string, but represesents player names
-column_headers[4] = "Player"
+    # add the beginning of the pfr url to the player link column
+    draft_df.Player_NFL_Link =  pfr_url + draft_df.Player_NFL_Link
 
-# Prepend "Rush_" for the columns that represent rushing stats
-column_headers[19:22] = ["Rush_" + col for col in column_headers[19:22]]
+    # Get the Player name, IDs, and links
+    player_id_df = draft_df.loc[:, ["Player", "Player_ID", "Player_NFL_Link",
+                                    "Player_NCAA_Link"]]
 
-# Prepend "Rec_" for the columns that reperesent receiving stats
-column_headers[23:25] = ["Rec_" + col for col in column_headers[23:25]]
+    # drop the the player links
+    draft_df = draft_df.drop(columns=["Player_NFL_Link", "Player_NCAA_Link"])
 
-# Properly label the defensive int column as "Def_Int"
-column_headers[-6] = "Def_Int"
+    # convert the data to the store's numeric types, with 0 for the cells
+    # that aren't numbers
+    draft_df = coerce_to_schema(draft_df, NFL_DRAFT_SCHEMA)
 
-# Just use "College" as the column header represent player's colleger or univ
-column_headers[-4] = "College"
+    # whether the player was bolded (still active) on the draft page
+    draft_df["Is_Active"] = is_active.astype(bool).values
 
-# Take a look at the updated column headers
-#print(column_headers)
+    return draft_df, player_id_df
 
-# Now assign edited columns to the DataFrame
-draft_df.columns = column_headers
 
-# Write out the raw draft data
-#draft_df.to_csv("pfr_nfl_draft_data_RAW.csv")
+def iter_pages(years, cache=None, offline=False,
+               batch_size=STREAM_FETCH_BATCH):
+    """
+    Yield the draft page of every year (or the exception it failed with),
+    fetching batch_size of them at a time instead of all at once.
+    """
+    for start in range(0, len(years), batch_size):
+        urls = [url_template.format(year=year)
+                for year in years[start:start + batch_size]]
+        yield from fetch_pages(urls, return_exceptions=True, cache=cache,
+                               offline=offline)
 
-# extract the player id from the player links
-# expand=False returns the IDs as a pandas Series
-player_ids = draft_df.Player_NFL_Link.str.extract("/.*/.*/(.*)\.",
-                                                  expand=False)
 
-# add a Player_ID column to our draft_df
-draft_df["Player_ID"] = player_ids
+def rechunk(dfs, chunk_size):
+    """
+    Yield the rows of the DataFrames in dfs as DataFrames of chunk_size rows
+    (the last one can be shorter).
+    """
+    buffered = []
+    buffered_rows = 0
+    for df in dfs:
+        while len(df):
+            part = df.iloc[:chunk_size - buffered_rows]
+            df = df.iloc[len(part):]
+            buffered.append(part)
+            buffered_rows += len(part)
+            if buffered_rows == chunk_size:
+                yield pd.concat(buffered, ignore_index=True)
+                buffered = []
+                buffered_rows = 0
+    if buffered:
+        yield pd.concat(buffered, ignore_index=True)
+
+
+def stream_drafts(years, pages, chunk_size=DEFAULT_CHUNK_SIZE,
+                  store_path=NFL_DRAFT_STORE, csv_path=draft_csv,
+                  ids_csv_path=player_ids_csv):
+    """
+    Parse, clean and write the draft pages chunk_size rows at a time, so
+    memory stays flat however many pages there are. pages is an iterable of
+    the page (or exception) of every year, like iter_pages returns.
 
-# add the beginning of the pfr url to the player link column
-pfr_url = "http://www.pro-football-reference.com"
-draft_df.Player_NFL_Link =  pfr_url + draft_df.Player_NFL_Link
+    Writes the same files as a regular scrape and returns the number of rows
+    written and the list of [url, error] of the years that failed.
+    """
+    errors_list = []
+    year_dfs = iter_year_dfs(years, pages, errors_list)
+    with ChunkWriter(csv_path, store_path, NFL_DRAFT_SCHEMA,
+                     index=False) as draft_writer, \
+            ChunkWriter(ids_csv_path) as ids_writer:
+        for chunk in rechunk(year_dfs, chunk_size):
+            draft_df, player_id_df = clean_draft_df(chunk)
+            # only the rows with a pick number, like upsert.keyed_rows
+            keyed = (draft_df.Pick > 0).to_numpy()
+            player_id_df = with_keys(player_id_df, draft_df)[keyed]
+            draft_df = draft_df[keyed]
+            # number the player IDs on from the previous chunk, like the
+            # index of the concatenated table
+            player_id_df.index = range(ids_writer.rows,
+                                       ids_writer.rows + len(player_id_df))
+            draft_writer.append(draft_df)
+            ids_writer.append(player_id_df[PLAYER_ID_COLUMNS])
+        if not draft_writer.rows:
+            # the writers throw their files away instead of replacing the
+            # outputs with empty ones
+            raise NoDraftsScraped(errors_list)
+    return draft_writer.rows, errors_list
+
+
+class NoDraftsScraped(Exception):
+    """
+    Not a single draft page could be downloaded and parsed.
+    """
 
-# Get the Player name, IDs, and links
-player_id_df = draft_df.loc[:, ["Player", "Player_ID", "Player_NFL_Link",
-                                "Player_NCAA_Link"]]
-# Save them to a CSV file
-#player_id_df.to_csv("pfr_player_ids_and_links.csv")
+    def __init__(self, errors_list):
+        super().__init__("no draft page could be scraped")
+        self.errors_list = errors_list
 
-# drop the the player links and the column labeled by an empty string
-draft_df.drop(draft_df.columns[-4:-1], axis=1, inplace=True)
 
-# convert the data to proper numeric types
-draft_df = draft_df.convert_objects(convert_numeric=True)
+def exit_without_drafts(errors_list):
+    """
+    Report the years that failed and exit, leaving the outputs and the
+    scrape log as they are.
+    """
+    for url, error in errors_list:
+        print("Could not scrape {}: {}".format(url, error))
+    sys.exit("Could not scrape any of the draft pages, {} is left as it "
+             "is".format(draft_csv))
 
-#print(draft_df.info())
 
-# Get the column names for the numeric columns
-num_cols = draft_df.columns[draft_df.dtypes != object]
+def with_keys(player_id_df, draft_df):
+    """
+    Return the player IDs with the Draft_Yr and Pick of their draft rows,
+    which they are row for row with.
+    """
+    return player_id_df.assign(Draft_Yr=draft_df.Draft_Yr.to_numpy(),
+                               Pick=draft_df.Pick.to_numpy())
 
-# Replace all NaNs with 0
-draft_df.loc[:, num_cols] = draft_df.loc[:, num_cols].fillna(0)
 
-#draft_df.to_csv("pfr_nfl_draft_data_CLEAN.csv", index=False)
+def write_player_ids(player_id_df):
+    """
+    Write the keyed player IDs and links to player_ids_csv, row for row with
+    the draft csv.
+    """
+    keys = pd.read_csv(draft_csv, usecols=["Draft_Yr", "Pick"])
+    player_id_df = keys.merge(player_id_df, on=["Draft_Yr", "Pick"],
+                              how="left")
+    player_id_df[PLAYER_ID_COLUMNS].to_csv(player_ids_csv)
 
-# get data for drafts from 1967 to 2010
-draft_df_2010 = draft_df.loc[draft_df.Draft_Yr <= 2010, :]
 
-#print(draft_df_2010.tail())
+def set_style():
+    # set the font scaling and the plot sizes
+    sns.set(font_scale=1.65)
+    rcParams["figure.figsize"] = 12,9
 
-# set the font scaling and the plot sizes
-sns.set(font_scale=1.65)
-rcParams["figure.figsize"] = 12,9
 
-# Use distplot to view the distribu
-sns.distplot(draft_df_2010.CarAV)
-plt.title("Distribution of Career Approximate Value")
-plt.xlim(-5,150)
-plt.show()
+def drafts_until_2010(draft_df):
+    """
+    Return the data for drafts from 1967 to 2010, the ones the charts use.
+    """
+    return draft_df.loc[draft_df.Draft_Yr <= 2010, :]
 
-# drop players from the following positions [FL, E, WB, KR]
-drop_idx = ~ draft_df_2010.Pos.isin(["FL", "E", "WB", "KR"])
 
-draft_df_2010 = draft_df_2010.loc[drop_idx, :]
+def main_positions(draft_df_2010):
+    """
+    Return the players of the positions we chart, with HBs counted as RBs.
+    """
+    # drop players from the following positions [FL, E, WB, KR]
+    drop_idx = ~ draft_df_2010.Pos.isin(["FL", "E", "WB", "KR"])
+
+    draft_df_2010 = draft_df_2010.loc[drop_idx, :].copy()
+
+    # Now replace HB label with RB label
+    draft_df_2010.loc[draft_df_2010.Pos == "HB", "Pos"] = "RB"
+    return draft_df_2010
+
+
+def plot_carav_distribution(draft_df_2010):
+    set_style()
+    plt.figure()
+
+    # Use distplot to view the distribu
+    sns.distplot(draft_df_2010.CarAV)
+    plt.title("Distribution of Career Approximate Value")
+    plt.xlim(-5,150)
+    return plt.gcf()
+
+
+def plot_carav_by_position(draft_df_2010):
+    set_style()
+    plt.figure()
+    draft_df_2010 = main_positions(draft_df_2010)
+
+    sns.boxplot(x="Pos", y="CarAV", data=draft_df_2010)
+    plt.title("Distribution of Career Approximate Value by Position (1967-2010)")
+    return plt.gcf()
+
+
+def plot_carav_by_pick(draft_df_2010):
+    set_style()
+    plt.figure()
+    draft_df_2010 = main_positions(draft_df_2010)
+
+    # plot LOWESS curve
+    # set line color to be black, and scatter color to cyan
+    # the curve comes from the LOWESS cache (lowess.py) instead of being
+    # fitted by regplot every time, and with more points than
+    # density.DENSITY_THRESHOLD they are drawn as a density image
+    ax = plt.gca()
+    # (cells of 5 picks by 5 CarAV, CarAV is a whole number)
+    points(draft_df_2010.Pick, draft_df_2010.CarAV, ax=ax,
+           extent=(-5, 500, -5, 200), bins=(101, 41),
+           color=sns.color_palette()[5], alpha=0.5)
+    ax.set_xlabel("Pick")
+    ax.set_ylabel("CarAV")
+    lowess_line(draft_df_2010.Pick, draft_df_2010.CarAV, ax=ax,
+                color="black")
+    plt.title("Career Approximate Value by Pick")
+    plt.xlim(-5, 500)
+    plt.ylim(-5, 200)
+    return plt.gcf()
+
+
+def plot_carav_by_pick_and_position(draft_df_2010):
+    set_style()
+    draft_df_2010 = main_positions(draft_df_2010)
+
+    # Fit a LOWESS curver for each position
+    # (this is what lmplot(lowess=True, hue="Pos", scatter=False) draws, with
+    # the cached curves)
+    grid = sns.FacetGrid(draft_df_2010, hue="Pos", height=10)
+    grid.map(lowess_line, "Pick", "CarAV")
+    grid.add_legend()
+    plt.title("Career Approximate Value by Pick and Position")
+    plt.xlim(-5, 500)
+    plt.ylim(-1, 60)
+    return plt.gcf()
+
+
+def plot_carav_by_pick_position_grid(draft_df_2010):
+    set_style()
+    draft_df_2010 = main_positions(draft_df_2010)
+
+    # lmplot(lowess=True, col="Pos") with the cached curves of the positions
+    lm = sns.FacetGrid(draft_df_2010, col="Pos", col_wrap=5, height=4)
+    lm.map(points, "Pick", "CarAV", color=sns.color_palette()[5], alpha=0.7,
+           extent=(-5, 500, -1, 100), bins=(101, 101))
+    lm.map(lowess_line, "Pick", "CarAV", color="black")
+
+    # add title to the plot (which is a FacetGrid)
+    # https://stackoverflow.com/questions/29813694/how-to-add-a-title-to-seaborn-facet-plot
+    plt.subplots_adjust(top=0.9)
+    lm.fig.suptitle("Career Approximate Value by Pick and Position",
+                    fontsize=30)
+
+    plt.xlim(-5, 500)
+    plt.ylim(-1, 100)
+    return lm.fig
+
+
+CHARTS = [plot_carav_distribution, plot_carav_by_position, plot_carav_by_pick,
+          plot_carav_by_pick_and_position, plot_carav_by_pick_position_grid]
+
+
+def plot_draft_charts(draft_df):
+    """
+    Show the career approximate value charts for the drafts up to 2010.
+    """
+    # get data for drafts from 1967 to 2010
+    draft_df_2010 = drafts_until_2010(draft_df)
 
-# Now replace HB label with RB label
-draft_df_2010.loc[draft_df_2010.Pos == "HB", "Pos"] = "RB"
+    #print(draft_df_2010.tail())
 
-sns.boxplot(x="Pos", y="CarAV", data=draft_df_2010)
-plt.title("Distribution of Career Approximate Value by Position (1967-2010)")
-plt.show()
+    for chart in CHARTS:
+        chart(draft_df_2010)
+        plt.show()
 
-# plot LOWESS curve
-# set line color to be black, and scatter color to cyan
-sns.regplot(x="Pick", y="CarAV", data=draft_df_2010, lowess=True,
-            line_kws={"color": "black"},
-            scatter_kws={"color": sns.color_palette()[5], "alpha": 0.5})
-plt.title("Career Approximate Value by Pick")
-plt.xlim(-5, 500)
-plt.ylim(-5, 200)
-plt.show()
 
-# Fit a LOWESS curver for each position
-sns.lmplot(x="Pick", y="CarAV", data=draft_df_2010, lowess=True, hue="Pos",
-           size=10, scatter=False)
-plt.title("Career Approximate Value by Pick and Position")
-plt.xlim(-5, 500)
-plt.ylim(-1, 60)
-plt.show()
+def chart_jobs(draft_df=None):
+    """
+    Return a ChartJob for every chart, for render.py. They only get the
+    drafts up to 2010, so refreshing a recent draft doesn't redraw them.
+    """
+    if draft_df is None:
+        draft_df = read_table(NFL_DRAFT_STORE,
+                              columns=["Draft_Yr", "Pick", "Pos", "CarAV"],
+                              years=range(1967, 2011), csv_path=draft_csv)
+        # the csv still has the repeated header rows as text
+        draft_df = convert_numeric(draft_df)
+        num_cols = draft_df.select_dtypes("number").columns
+        draft_df[num_cols] = draft_df[num_cols].fillna(0)
+    draft_df_2010 = drafts_until_2010(draft_df)[["Draft_Yr", "Pick", "Pos",
+                                                 "CarAV"]]
+    draft_df_2010 = draft_df_2010.reset_index(drop=True)
+    return [ChartJob("nfl_" + chart.__name__[len("plot_"):], chart,
+                     draft_df_2010) for chart in CHARTS]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Scrape every NFL draft from pro-football-reference.")
+    parser.add_argument("--offline", action="store_true",
+                        help="only replay pages from the response cache")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only scrape the draft years missing from the "
+                             "output or past their refresh window")
+    parser.add_argument("--refresh-days", type=float,
+                        default=DEFAULT_REFRESH_DAYS,
+                        help="days before a recent draft year is scraped "
+                             "again in incremental mode")
+    parser.add_argument("--last-year", type=int,
+                        default=latest_draft_year(NFL_DRAFT_MONTH),
+                        help="the last draft year to scrape (by default the "
+                             "latest draft held)")
+    parser.add_argument("--stream", action="store_true",
+                        help="fetch, clean and write the drafts a chunk of "
+                             "rows at a time to keep memory flat")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="rows per chunk in --stream mode")
+    parser.add_argument("--parse-processes", type=int, metavar="N",
+                        help="parse the pages in N worker processes while "
+                             "they are downloading")
+    parser.add_argument("--no-charts", action="store_true",
+                        help="don't show the charts after scraping")
+    metrics.add_argument(parser)
+    args = parser.parse_args()
+    if args.stream and args.incremental:
+        parser.error("--stream writes every draft year, it can't be "
+                     "combined with --incremental")
+
+    if args.metrics:
+        metrics.enable("nfl_draft")
+    try:
+        draft_df = scrape(args)
+    finally:
+        metrics.finish(args.metrics)
 
-lm = sns.lmplot(x="Pick", y="CarAV", data=draft_df_2010, lowess=True, col="Pos",
-                col_wrap=5, size=4, line_kws={"color": "black"},
-                scatter_kws={"color": sns.color_palette()[5], "alpha": 0.7})
+    if not args.no_charts:
+        plot_draft_charts(draft_df)
 
-# add title to the plot (which is a FacetGrid)
-# https://stackoverflow.com/questions/29813694/how-to-add-a-title-to-seaborn-facet-plot
-plt.subplots_adjust(top=0.9)
-lm.fig.suptitle("Career Approximate Value by Pick and Position",
-                fontsize=30)
 
-plt.xlim(-5, 500)
-plt.ylim(-1, 100)
-plt.show()
+def scrape(args):
+    """
+    Scrape the draft years (all of them, or in incremental mode the ones
+    that are missing or stale), write the outputs and return the draft data.
+    """
+    # for each year from 1967 to (and including) the latest draft
+    last_year = getattr(args, "last_year", None) or latest_draft_year(
+        NFL_DRAFT_MONTH)
+    all_years = range(1967, last_year + 1)
+
+    if getattr(args, "stream", False):
+        return stream_scrape(list(all_years), args)
+
+    # in incremental mode start from the existing output and only scrape the
+    # years it is missing or has stale
+    existing_df = None
+    existing_ids = None
+    scrape_log = {}
+    years = list(all_years)
+    if (args.incremental and os.path.exists(draft_csv)
+            and os.path.exists(player_ids_csv)):
+        # the older files still have the repeated header rows as text
+        existing_df = convert_numeric(pd.read_csv(draft_csv))
+        if "Is_Active" not in existing_df:
+            # written before the active flag was scraped, so start over
+            print("{} has no Is_Active column, scraping every year".format(
+                draft_csv))
+            existing_df = None
+    if existing_df is not None:
+        num_cols = existing_df.select_dtypes("number").columns
+        existing_df[num_cols] = existing_df[num_cols].fillna(0)
+        # the player IDs file is written row for row with the draft data,
+        # so the older ones without the key columns can borrow them
+        existing_ids = pd.read_csv(player_ids_csv, index_col=0)
+        if "Pick" not in existing_ids:
+            existing_ids = with_keys(existing_ids, existing_df)
+        scrape_log = load_scrape_log(draft_csv)
+        years = years_to_scrape(existing_df.Draft_Yr.unique(), all_years,
+                                scrape_log, args.refresh_days)
+
+    if years:
+        urls = [url_template.format(year=year) for year in years]
+
+        # fetch all the draft pages at once, they come back in year order
+        # a page that fails to download comes back as its exception
+        # pages downloaded by earlier runs come out of the on-disk cache
+        parse_processes = getattr(args, "parse_processes", None)
+        if parse_processes:
+            # parse in worker processes while the rest is still downloading
+            with metrics.stage("fetch_parse"):
+                pages = fetch_and_parse(urls, NFL_DRAFT, parse_processes,
+                                        cache=ResponseCache(),
+                                        offline=args.offline,
+                                        return_exceptions=True)
+        else:
+            with metrics.stage("fetch"):
+                pages = fetch_pages(urls, return_exceptions=True,
+                                    cache=ResponseCache(),
+                                    offline=args.offline)
+
+        try:
+            with metrics.stage("parse"):
+                draft_df, errors_list = build_draft_df(
+                    years, pages, parsed=bool(parse_processes))
+        except NoDraftsScraped as e:
+            exit_without_drafts(e.errors_list)
+        for url, error in errors_list:
+            print("Could not scrape {}: {}".format(url, error))
+        with metrics.stage("clean"):
+            draft_df, player_id_df = clean_draft_df(draft_df)
+
+        # Merge the clean draft data into the typed, year-partitioned store
+        # by (Draft_Yr, Pick), write the csv next to it, and the player IDs
+        # and links row for row with it
+        with metrics.stage("store"):
+            if existing_df is not None and not table_exists(NFL_DRAFT_STORE):
+                # start the store from the output written before it existed
+                upsert_table(existing_df, NFL_DRAFT_STORE, NFL_DRAFT_SCHEMA,
+                             "Pick")
+            counts = upsert_table(draft_df, NFL_DRAFT_STORE,
+                                  NFL_DRAFT_SCHEMA, "Pick",
+                                  csv_path=draft_csv)
+            player_id_df = keyed_rows(with_keys(player_id_df, draft_df),
+                                      "Pick")
+            if existing_ids is not None:
+                player_id_df, _, _ = merge_sorted(
+                    keyed_rows(existing_ids, "Pick"), player_id_df, "Pick")
+            write_player_ids(player_id_df)
+        print("{} rows inserted, {} updated, {} unchanged".format(
+            counts["inserted"], counts["updated"], counts["unchanged"]))
+        draft_df = read_table(NFL_DRAFT_STORE)
+
+        # remember when each year was scraped for the next incremental run,
+        # the years that failed will be tried again
+        failed = {url for url, _ in errors_list}
+        scraped_at = time.time()
+        scrape_log.update((year, scraped_at) for year, url in zip(years, urls)
+                          if url not in failed)
+        save_scrape_log(draft_csv, scrape_log)
+    else:
+        print("{} is up to date".format(draft_csv))
+        draft_df = existing_df
+
+    return draft_df
+
+
+def stream_scrape(years, args):
+    """
+    Scrape the years in streaming mode (see stream_drafts) and return just
+    the columns the charts need, read back from the store.
+    """
+    pages = iter_pages(years, cache=ResponseCache(), offline=args.offline)
+    try:
+        with metrics.stage("stream"):
+            rows, errors_list = stream_drafts(years, pages, args.chunk_size)
+    except NoDraftsScraped as e:
+        exit_without_drafts(e.errors_list)
+    for url, error in errors_list:
+        print("Could not scrape {}: {}".format(url, error))
+    print("Wrote {} rows to {}".format(rows, draft_csv))
+
+    failed = {url for url, _ in errors_list}
+    scraped_at = time.time()
+    save_scrape_log(draft_csv, {
+        year: scraped_at for year in years
+        if url_template.format(year=year) not in failed})
+
+    return read_table(NFL_DRAFT_STORE,
+                      columns=["Draft_Yr", "Pick", "Pos", "CarAV"],
+                      csv_path=draft_csv)
+
+
+if __name__ == "__main__":
+    main()
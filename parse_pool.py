@@ -0,0 +1,97 @@
+"""
+Fetch pages and parse them in a pool of worker processes at the same time.
+
+Parsing a draft page is pure Python and holds the GIL, so once the downloads
+are concurrent a single core parsing every page becomes the bottleneck.
+fetch_and_parse runs two stages side by side:
+
+    fetcher threads (fetch.py's scheduler)  ->  parser processes
+
+Every fetcher thread that gets a page hands its raw bytes to a
+ProcessPoolExecutor running extract_spec.extract_records, and the workers
+send back the compact list of record tuples instead of a parse tree. At most
+max_pending pages can be waiting in or for a worker: a fetcher that gets a
+page when the pool is that far behind waits before it takes the next url,
+so a fast site can't pile up pages in memory faster than they are parsed.
+
+    results = fetch_and_parse(urls, NFL_DRAFT, processes=4)
+    # [records, or the exception the url failed with, ...] in url order
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from extract_spec import extract_records
+from fetch import DEFAULT_CONCURRENCY, ConnectionPool, fetch_url
+from throttle import Scheduler
+
+
+class ParseError(Exception):
+    """
+    A page that was downloaded but couldn't be parsed.
+    """
+
+    def __init__(self, url, error):
+        super().__init__("{}: {}".format(url, error))
+        self.url = url
+        self.error = error
+
+
+def default_processes():
+    return os.cpu_count() or 1
+
+
+def fetch_and_parse(urls, spec, processes=None, max_pending=None,
+                    concurrency=DEFAULT_CONCURRENCY, cache=None,
+                    offline=False, scheduler=None, return_exceptions=False):
+    """
+    Fetch every url and extract the spec's table from it in a pool of
+    processes worker processes (one per core by default). Returns the
+    records of every page (see extract_spec.extract_records) in the order
+    of urls.
+
+    max_pending caps the pages downloaded but not parsed yet, twice the
+    number of processes by default. cache, offline and scheduler are used
+    like in fetch.fetch_pages. With return_exceptions a url that fails gets
+    its exception in the list (a ParseError if the page came back but
+    couldn't be parsed) instead of raising it.
+    """
+    urls = list(urls)
+    if processes is None:
+        processes = default_processes()
+    if max_pending is None:
+        max_pending = 2 * processes
+    if scheduler is None:
+        scheduler = Scheduler(max_concurrency=concurrency,
+                              initial_concurrency=concurrency)
+    pending = threading.BoundedSemaphore(max_pending)
+    pool = ConnectionPool()
+
+    with ProcessPoolExecutor(processes) as executor:
+        def fetch_one(url):
+            html = fetch_url(url, pool, cache, offline, scheduler)
+            # wait for a free slot, this is what slows the fetchers down
+            # when the parsers fall behind
+            pending.acquire()
+            future = executor.submit(extract_records, spec, html)
+            future.add_done_callback(lambda _: pending.release())
+            return future
+
+        try:
+            futures = scheduler.map(fetch_one, urls,
+                                    return_exceptions=return_exceptions)
+        finally:
+            pool.close()
+
+        results = []
+        for url, future in zip(urls, futures):
+            if isinstance(future, Exception):
+                results.append(future)
+                continue
+            try:
+                results.append(future.result())
+            except Exception as e:
+                if not return_exceptions:
+                    raise ParseError(url, e) from e
+                results.append(ParseError(url, e))
+    return results
@@ -0,0 +1,341 @@
+"""
+One entry point for the whole project, run as a DAG of stages.
+
+Every stage is one of the scripts with the files it reads and writes:
+
+    nba_scrape    draft.py                 -> draft_data_1966_to_2018.csv
+    nfl_scrape    nfl_draft.py             -> pfr_nfl_draft_data_CLEAN.csv,
+                                              pfr_player_ids_and_links.csv
+    nfl_survival  data_prep.py             -> nfl_survival_analysis_data.csv
+    nba_charts    render.py --only nba     -> charts/nba_*.png
+    nfl_charts    render.py --only nfl_draft survival -> charts/nfl_*.png
+    player_db     player_db.py             -> players.db
+
+A stage depends on the stages that write its inputs, so the NBA and NFL
+branches run side by side until player_db joins them. Before running a stage its
+inputs are hashed: the input files, its command and the source of the
+script and of every local module it imports. A stage is skipped when that
+hash matches the last successful run and its outputs are still the files
+that run wrote (their hashes are kept in .pipeline_state.json). A stage
+whose outputs come out byte for byte the same doesn't make the stages after
+it run either.
+
+The scrape stages have no input files, the sites are their input. They
+only run with --scrape (or --force), never on their own: then they run
+incrementally, so only new or stale draft years are downloaded. Without it
+the stages after them work from the files already scraped.
+
+    python pipeline.py                  run every stale stage
+    python pipeline.py --scrape         check the sites for new drafts too
+    python pipeline.py nfl_charts       only that stage and the ones it needs
+    python pipeline.py --dry-run        show what would run
+    python pipeline.py --force nfl_survival
+"""
+import argparse
+import ast
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+STATE_FILE = ".pipeline_state.json"
+
+# command is the script and its arguments, scrape marks the stages whose
+# real input is a website
+Stage = namedtuple("Stage", ["name", "command", "inputs", "outputs",
+                             "scrape"])
+
+NBA_DRAFT_CSV = "draft_data_1966_to_2018.csv"
+NFL_DRAFT_CSV = "pfr_nfl_draft_data_CLEAN.csv"
+NFL_IDS_CSV = "pfr_player_ids_and_links.csv"
+NFL_SURVIVAL_CSV = "nfl_survival_analysis_data.csv"
+PLAYER_DB = "players.db"
+
+STAGES = [
+    Stage("nba_scrape", ["draft.py", "--incremental"], [], [NBA_DRAFT_CSV],
+          True),
+    Stage("nfl_scrape", ["nfl_draft.py", "--incremental", "--no-charts"], [],
+          [NFL_DRAFT_CSV, NFL_IDS_CSV], True),
+    Stage("nfl_survival", ["data_prep.py"], [NFL_DRAFT_CSV],
+          [NFL_SURVIVAL_CSV], False),
+    Stage("nba_charts", ["render.py", "--only", "nba"], [NBA_DRAFT_CSV],
+          ["charts/nba_*.png"], False),
+    Stage("nfl_charts", ["render.py", "--only", "nfl_draft", "survival"],
+          [NFL_DRAFT_CSV, NFL_SURVIVAL_CSV], ["charts/nfl_*.png"], False),
+    Stage("player_db", ["player_db.py"],
+          [NFL_DRAFT_CSV, NFL_IDS_CSV, NBA_DRAFT_CSV], [PLAYER_DB], False),
+]
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def output_hashes(stage):
+    """
+    Return {path: hash} of the files the stage's outputs (file names or
+    glob patterns) match right now.
+    """
+    hashes = {}
+    for pattern in stage.outputs:
+        for path in sorted(glob.glob(pattern)):
+            hashes[path] = file_hash(path)
+    return hashes
+
+
+def outputs_exist(stage):
+    return all(glob.glob(pattern) for pattern in stage.outputs)
+
+
+def local_modules(script, found=None):
+    """
+    Return the set of .py files in script's directory that script imports,
+    directly or through each other, including script itself.
+    """
+    if found is None:
+        found = set()
+    if script in found or not os.path.exists(script):
+        return found
+    found.add(script)
+    with open(script) as f:
+        tree = ast.parse(f.read(), script)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            local_modules(os.path.join(os.path.dirname(script),
+                                       name.split(".")[0] + ".py"), found)
+    return found
+
+
+def input_hash(stage):
+    """
+    Return a hash of everything the stage's outputs depend on.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps(stage.command).encode("utf-8"))
+    for path in sorted(local_modules(stage.command[0])) + stage.inputs:
+        digest.update(path.encode("utf-8"))
+        digest.update(file_hash(path).encode("utf-8")
+                      if os.path.exists(path) else b"missing")
+    return digest.hexdigest()
+
+
+def load_state(path=STATE_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(state, path=STATE_FILE):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def dependencies(stages=STAGES):
+    """
+    Return {stage name: set of the stage names that write its inputs}.
+    """
+    writers = {}
+    for stage in stages:
+        for output in stage.outputs:
+            writers[output] = stage.name
+    return {stage.name: {writers[path] for path in stage.inputs
+                         if path in writers}
+            for stage in stages}
+
+
+def select(names, stages=STAGES):
+    """
+    Return the stages named and every stage they depend on, in STAGES order.
+    """
+    if not names:
+        return list(stages)
+    deps = dependencies(stages)
+    wanted = set()
+    todo = list(names)
+    while todo:
+        name = todo.pop()
+        if name not in wanted:
+            wanted.add(name)
+            todo.extend(deps[name])
+    return [stage for stage in stages if stage.name in wanted]
+
+
+def stale_reason(stage, state, scrape=False, force=()):
+    """
+    Return why the stage has to run, or None if it is up to date. Scrape
+    stages never run without scrape (or force).
+    """
+    if stage.name in force:
+        return "forced"
+    if stage.scrape and not scrape:
+        return None
+    recorded = state.get(stage.name)
+    if recorded is None:
+        return "never run"
+    if not outputs_exist(stage):
+        return "outputs missing"
+    if recorded["inputs"] != input_hash(stage):
+        return "inputs changed"
+    if recorded["outputs"] != output_hashes(stage):
+        return "outputs changed"
+    if stage.scrape:
+        return "scrape"
+    return None
+
+
+def command_line(stage, offline=False, metrics_dir=None):
+    command = [sys.executable] + stage.command
+    if offline and stage.scrape:
+        command.append("--offline")
+    if metrics_dir is not None:
+        command += ["--metrics",
+                    os.path.join(metrics_dir, stage.name + ".jsonl")]
+    return command
+
+
+def run_stage(stage, offline=False, metrics_dir=None):
+    """
+    Run a stage's script and return (returncode, output, seconds).
+    """
+    env = dict(os.environ, MPLBACKEND="Agg")
+    start = time.perf_counter()
+    result = subprocess.run(command_line(stage, offline, metrics_dir),
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            text=True, env=env)
+    return result.returncode, result.stdout, time.perf_counter() - start
+
+
+def run_pipeline(stages=STAGES, jobs=2, scrape=False, force=(), offline=False,
+                 metrics_dir=None, dry_run=False, state_path=STATE_FILE,
+                 log=print):
+    """
+    Run the stale stages, every stage as soon as the ones it depends on are
+    done and at most jobs at a time. Returns {stage name: status}, where
+    status is "skipped", "ran", "failed", "blocked" (a stage it depends on
+    failed) or, with dry_run, "stale" (also for the stages after a stale
+    one, which a real run would most likely rebuild too).
+    """
+    state = load_state(state_path)
+    deps = dependencies(stages)
+    by_name = {stage.name: stage for stage in stages}
+    status = {}
+    if metrics_dir is not None:
+        os.makedirs(metrics_dir, exist_ok=True)
+
+    def ready(name):
+        return (name not in status and
+                all(dep in status or dep not in by_name
+                    for dep in deps[name]))
+
+    def check(stage):
+        if any(status.get(dep) in ("failed", "blocked")
+               for dep in deps[stage.name]):
+            status[stage.name] = "blocked"
+            log("{:>14}  blocked".format(stage.name))
+            return False
+        reason = stale_reason(stage, state, scrape, force)
+        stale_deps = [dep for dep in deps[stage.name]
+                      if status.get(dep) == "stale"]
+        if reason is None and stale_deps:
+            reason = "after {}".format(", ".join(stale_deps))
+        if reason is None:
+            status[stage.name] = "skipped"
+            if stage.scrape and not scrape:
+                log("{:>14}  not scraping (see --scrape)".format(stage.name))
+            else:
+                log("{:>14}  up to date".format(stage.name))
+            return False
+        if dry_run:
+            status[stage.name] = "stale"
+            log("{:>14}  would run ({})".format(stage.name, reason))
+            return False
+        log("{:>14}  running ({})".format(stage.name, reason))
+        return True
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        running = {}
+        while len(status) < len(stages):
+            for stage in stages:
+                if ready(stage.name) and stage.name not in running.values():
+                    if check(stage):
+                        future = executor.submit(run_stage, stage, offline,
+                                                 metrics_dir)
+                        running[future] = stage.name
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                stage = by_name[name]
+                returncode, output, seconds = future.result()
+                for line in output.splitlines():
+                    log("{:>14}| {}".format(name, line))
+                if returncode != 0:
+                    status[name] = "failed"
+                    log("{:>14}  failed with exit code {} after {:.1f} s"
+                        .format(name, returncode, seconds))
+                    continue
+                state[name] = {"inputs": input_hash(stage),
+                               "outputs": output_hashes(stage),
+                               "finished": time.time(),
+                               "seconds": round(seconds, 3)}
+                save_state(state, state_path)
+                status[name] = "ran"
+                log("{:>14}  done in {:.1f} s".format(name, seconds))
+    return status
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the stale stages of the draft analysis.")
+    parser.add_argument("stages", nargs="*", metavar="STAGE",
+                        help="only run these stages and the ones they need "
+                             "(one of {})".format(", ".join(
+                                 stage.name for stage in STAGES)))
+    parser.add_argument("--scrape", action="store_true",
+                        help="check the sites for new or stale draft years")
+    parser.add_argument("--offline", action="store_true",
+                        help="scrape only from the response cache")
+    parser.add_argument("--force", nargs="+", default=[], metavar="STAGE",
+                        help="run these stages even if they are up to date")
+    parser.add_argument("--jobs", type=int, default=2,
+                        help="stages to run at the same time")
+    parser.add_argument("--metrics-dir",
+                        help="write every stage's metrics (see metrics.py) "
+                             "to this directory")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="only show which stages would run")
+    args = parser.parse_args()
+    names = {stage.name for stage in STAGES}
+    for name in args.stages + args.force:
+        if name not in names:
+            parser.error("unknown stage {!r}".format(name))
+
+    status = run_pipeline(select(args.stages), args.jobs, args.scrape,
+                          set(args.force), args.offline, args.metrics_dir,
+                          args.dry_run)
+    if any(state in ("failed", "blocked") for state in status.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
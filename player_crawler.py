@@ -0,0 +1,265 @@
+"""
+Crawl the pro-football-reference page of every drafted player listed in
+pfr_player_ids_and_links.csv and store their season-by-season stats.
+
+The crawl keeps a frontier in SQLite that records whether each Player_ID is
+pending, done or failed, and the parsed season rows are written to the same
+database in the transaction that marks the player done. The crawler can be
+killed at any point and picks up where it left off on the next run, without
+refetching the players it already has.
+
+Pages are fetched in batches through fetch.py (bounded concurrency, per-host
+rate limits and retries) and parsed on the fetching threads, so only one
+batch of pages is ever held in memory.
+
+    python player_crawler.py --limit 500
+"""
+import argparse
+import json
+import sqlite3
+import time
+
+import lxml.html
+import pandas as pd
+
+from fetch import ConnectionPool, fetch_url
+from throttle import Scheduler
+
+DEFAULT_LINKS_CSV = "pfr_player_ids_and_links.csv"
+DEFAULT_DB = "pfr_player_pages.db"
+
+DEFAULT_CONCURRENCY = 8
+
+# how many players are fetched before their rows are written out
+DEFAULT_BATCH_SIZE = 64
+
+PENDING, DONE, FAILED = "pending", "done", "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frontier (
+    player_id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS frontier_status ON frontier (status);
+CREATE TABLE IF NOT EXISTS seasons (
+    player_id TEXT NOT NULL,
+    table_id TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    year TEXT,
+    stats TEXT NOT NULL,
+    PRIMARY KEY (player_id, table_id, row)
+);
+"""
+
+
+def parse_player_page(html):
+    """
+    Return a list of (table id, row number, year, {data-stat: text}) for
+    every season row of every stats table on a player page.
+
+    sports-reference hides most tables after the first one inside html
+    comments, so those are uncommented before parsing.
+    """
+    if isinstance(html, bytes):
+        html = html.decode("utf-8", errors="replace")
+    html = html.replace("<!--", "").replace("-->", "")
+    root = lxml.html.fromstring(html)
+
+    rows = []
+    for table in root.iter("table"):
+        table_id = table.get("id")
+        if not table_id:
+            continue
+        row_number = 0
+        for tr in table.iterfind("tbody/tr"):
+            # skip the repeated header and spacer rows
+            if "thead" in (tr.get("class") or ""):
+                continue
+            stats = {cell.get("data-stat"): cell.text_content().strip()
+                     for cell in tr if cell.get("data-stat")}
+            if not stats:
+                continue
+            rows.append((table_id, row_number, stats.get("year_id"), stats))
+            row_number += 1
+    return rows
+
+
+class Frontier:
+    """
+    The crawl state and its results, in one SQLite database.
+    """
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(SCHEMA)
+
+    def add(self, player_ids, urls):
+        """
+        Add players to the frontier as pending. Players that are already in
+        it keep their status.
+        """
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO frontier (player_id, url, status) "
+                "VALUES (?, ?, ?)",
+                ((player_id, url, PENDING)
+                 for player_id, url in zip(player_ids, urls)))
+
+    def next_batch(self, size):
+        """
+        Return up to size (player_id, url) pairs that are still pending.
+        """
+        return self._conn.execute(
+            "SELECT player_id, url FROM frontier WHERE status = ? "
+            "ORDER BY rowid LIMIT ?", (PENDING, size)).fetchall()
+
+    def requeue_failed(self):
+        """
+        Put the players that failed back to pending.
+        """
+        with self._conn:
+            self._conn.execute("UPDATE frontier SET status = ? "
+                               "WHERE status = ?", (PENDING, FAILED))
+
+    def record(self, results):
+        """
+        Store the outcome of a batch of players in one transaction. results
+        is a list of (player_id, season rows or the exception it failed
+        with). A player's rows and their done status are written together,
+        so a killed crawl never leaves a player half stored.
+        """
+        with self._conn:
+            for player_id, result in results:
+                if isinstance(result, Exception):
+                    self._set_status(player_id, FAILED, str(result))
+                    continue
+                self._conn.execute("DELETE FROM seasons WHERE player_id = ?",
+                                   (player_id,))
+                self._conn.executemany(
+                    "INSERT INTO seasons (player_id, table_id, row, year, "
+                    "stats) VALUES (?, ?, ?, ?, ?)",
+                    ((player_id, table_id, row, year, json.dumps(stats))
+                     for table_id, row, year, stats in result))
+                self._set_status(player_id, DONE, None)
+
+    def _set_status(self, player_id, status, error):
+        self._conn.execute(
+            "UPDATE frontier SET status = ?, error = ?, updated_at = ?, "
+            "attempts = attempts + 1 WHERE player_id = ?",
+            (status, error, time.time(), player_id))
+
+    def counts(self):
+        """
+        Return {status: number of players}.
+        """
+        return dict(self._conn.execute(
+            "SELECT status, COUNT(*) FROM frontier GROUP BY status"))
+
+    def close(self):
+        self._conn.close()
+
+
+def load_seasons(path=DEFAULT_DB, table_id=None):
+    """
+    Return the crawled season rows as a DataFrame with a Player_ID and a
+    Table column plus one column per data-stat, optionally only the rows of
+    one table (e.g. "passing").
+    """
+    conn = sqlite3.connect(path)
+    try:
+        query = "SELECT player_id, table_id, stats FROM seasons"
+        params = ()
+        if table_id is not None:
+            query += " WHERE table_id = ?"
+            params = (table_id,)
+        query += " ORDER BY player_id, table_id, row"
+        rows = conn.execute(query, params).fetchall()
+    finally:
+        conn.close()
+    stats = pd.DataFrame([json.loads(row[2]) for row in rows])
+    stats.insert(0, "Table", [row[1] for row in rows])
+    stats.insert(0, "Player_ID", [row[0] for row in rows])
+    return stats
+
+
+def crawl(frontier, concurrency=DEFAULT_CONCURRENCY,
+          batch_size=DEFAULT_BATCH_SIZE, limit=None, retry_failed=False,
+          cache=None, offline=False, scheduler=None, progress=print):
+    """
+    Crawl the players left in the frontier, batch_size at a time, until
+    none are left (or limit players have been crawled). Returns the number
+    of players crawled.
+
+    With retry_failed the players that failed in earlier runs are tried
+    again, otherwise they are left alone.
+    """
+    pool = ConnectionPool()
+    if scheduler is None:
+        scheduler = Scheduler(max_concurrency=concurrency)
+
+    def fetch_and_parse(url):
+        return parse_player_page(fetch_url(url, pool, cache, offline,
+                                           scheduler))
+
+    if retry_failed:
+        frontier.requeue_failed()
+
+    crawled = 0
+    try:
+        while limit is None or crawled < limit:
+            size = batch_size if limit is None else min(batch_size,
+                                                        limit - crawled)
+            batch = frontier.next_batch(size)
+            if not batch:
+                break
+            results = scheduler.map(fetch_and_parse,
+                                    [url for _, url in batch],
+                                    return_exceptions=True)
+            frontier.record([(player_id, result) for (player_id, _), result
+                             in zip(batch, results)])
+            crawled += len(batch)
+            if progress is not None:
+                progress("crawled {} players, {}".format(
+                    crawled, frontier.counts()))
+    finally:
+        pool.close()
+    return crawled
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Crawl the pro-football-reference page of every drafted "
+                    "player.")
+    parser.add_argument("--links", default=DEFAULT_LINKS_CSV,
+                        help="csv with the Player_ID and Player_NFL_Link "
+                             "of every player")
+    parser.add_argument("--db", default=DEFAULT_DB,
+                        help="SQLite file for the frontier and the results")
+    parser.add_argument("--concurrency", type=int,
+                        default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--limit", type=int,
+                        help="stop after crawling this many players")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="try the players that failed before again")
+    args = parser.parse_args()
+
+    links = pd.read_csv(args.links, index_col=0)
+    links = links.dropna(subset=["Player_ID", "Player_NFL_Link"])
+
+    frontier = Frontier(args.db)
+    try:
+        frontier.add(links.Player_ID, links.Player_NFL_Link)
+        crawl(frontier, args.concurrency, args.batch_size, args.limit,
+              args.retry_failed)
+    finally:
+        frontier.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+An indexed SQLite database of the drafted players, for lookups that
+shouldn't have to load and filter the whole draft csv every time.
+
+    python player_db.py          (re)build players.db from the draft stores
+
+builds three tables from the draft stores (or the csv files next to them):
+
+    nfl_draft     every NFL draft row, indexed on Player_ID, (Draft_Yr,
+                  Pick), Tm, Pos, College and Player
+    nfl_players   Player_ID, Player and the pro-football-reference and
+                  college stats links of every NFL player
+    nba_draft     every NBA draft row, indexed on (Draft_Yr, Pk), Tm,
+                  College and Player
+
+The database is written to a temporary file and moved into place, so
+readers never see a half built one. PlayerDB answers the usual questions
+with indexed queries:
+
+    db = PlayerDB()
+    db.player("SmitBu00")                  # draft row joined with the links
+    db.players(college="Michigan St.", position="DE")
+    db.picks(1990, 1999, last_pick=10)     # range scan on (Draft_Yr, Pick)
+    db.frame("SELECT Tm, COUNT(*) AS n FROM nfl_draft GROUP BY Tm")
+"""
+import argparse
+import os
+import sqlite3
+
+import pandas as pd
+import pyarrow as pa
+
+import metrics
+from cleaning import coerce_to_schema
+from storage import (NBA_DRAFT_SCHEMA, NBA_DRAFT_STORE, NFL_DRAFT_SCHEMA,
+                     NFL_DRAFT_STORE, read_table)
+from upsert import PICK_COLUMNS
+
+DEFAULT_DB = "players.db"
+
+NFL_DRAFT_CSV = "pfr_nfl_draft_data_CLEAN.csv"
+NFL_LINKS_CSV = "pfr_player_ids_and_links.csv"
+NBA_DRAFT_CSV = "draft_data_1966_to_2018.csv"
+
+NFL_PLAYERS_COLUMNS = ["Player_ID", "Player", "Player_NFL_Link",
+                       "Player_NCAA_Link"]
+
+# (table, columns) of every index
+INDEXES = [
+    ("nfl_draft", ["Player_ID"]),
+    ("nfl_draft", ["Draft_Yr", "Pick"]),
+    ("nfl_draft", ["Tm"]),
+    ("nfl_draft", ["Pos"]),
+    ("nfl_draft", ["College"]),
+    ("nfl_draft", ["Player"]),
+    ("nba_draft", ["Draft_Yr", "Pk"]),
+    ("nba_draft", ["Tm"]),
+    ("nba_draft", ["College"]),
+    ("nba_draft", ["Player"]),
+]
+
+
+def _sql_type(arrow_type):
+    if pa.types.is_integer(arrow_type) or pa.types.is_boolean(arrow_type):
+        return "INTEGER"
+    if pa.types.is_floating(arrow_type):
+        return "REAL"
+    return "TEXT"
+
+
+def _quote(name):
+    # some columns start with a digit (3P_Perc)
+    return '"{}"'.format(name)
+
+
+def create_table(conn, table, schema, primary_key=None):
+    columns = ["{} {}".format(_quote(field.name), _sql_type(field.type))
+               for field in schema]
+    if primary_key is not None:
+        columns.append("PRIMARY KEY ({})".format(_quote(primary_key)))
+    conn.execute("CREATE TABLE {} ({})".format(table, ", ".join(columns)))
+
+
+def insert_rows(conn, table, df):
+    """
+    Insert the rows of df into table, with NaN stored as NULL.
+    """
+    df = df.astype(object).where(df.notnull(), None)
+    conn.executemany(
+        "INSERT INTO {} ({}) VALUES ({})".format(
+            table, ", ".join(_quote(col) for col in df.columns),
+            ", ".join("?" * len(df.columns))),
+        df.itertuples(index=False, name=None))
+
+
+def create_indexes(conn):
+    for table, columns in INDEXES:
+        conn.execute("CREATE INDEX {}_{} ON {} ({})".format(
+            table, "_".join(columns).lower(), table,
+            ", ".join(_quote(col) for col in columns)))
+
+
+def load_nfl_draft():
+    """
+    Return the NFL draft rows and the player links, without the repeated
+    header rows the older csv files still have.
+    """
+    draft_df = read_table(NFL_DRAFT_STORE, csv_path=NFL_DRAFT_CSV)
+    draft_df = coerce_to_schema(draft_df, NFL_DRAFT_SCHEMA)
+    links = pd.read_csv(NFL_LINKS_CSV, index_col=0)
+    header_rows = (draft_df.Pos == "Pos").to_numpy()
+    if len(links) == len(draft_df):
+        # the links file is written row for row with the draft data
+        links = links[~header_rows]
+    draft_df = draft_df[~header_rows]
+    links = links.dropna(subset=["Player_ID"]).drop_duplicates("Player_ID")
+    return draft_df, links[NFL_PLAYERS_COLUMNS]
+
+
+def load_nba_draft():
+    """
+    Return the NBA draft rows, without the round separators and repeated
+    header rows (no pick number) the older csv files still have.
+    """
+    draft_df = read_table(NBA_DRAFT_STORE, csv_path=NBA_DRAFT_CSV)
+    draft_df = coerce_to_schema(draft_df, NBA_DRAFT_SCHEMA)
+    return draft_df[(draft_df.Pk > 0).to_numpy()].reset_index(drop=True)
+
+
+def build_database(path, nfl_draft_df, nfl_players_df, nba_draft_df):
+    """
+    Write the three tables and their indexes to a new database at path.
+    """
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        with conn:
+            create_table(conn, "nfl_draft", NFL_DRAFT_SCHEMA)
+            insert_rows(conn, "nfl_draft", nfl_draft_df.reindex(
+                columns=NFL_DRAFT_SCHEMA.names))
+            create_table(conn, "nfl_players",
+                         pa.schema([(name, pa.string())
+                                    for name in NFL_PLAYERS_COLUMNS]),
+                         primary_key="Player_ID")
+            insert_rows(conn, "nfl_players", nfl_players_df)
+            create_table(conn, "nba_draft", NBA_DRAFT_SCHEMA)
+            insert_rows(conn, "nba_draft", nba_draft_df.reindex(
+                columns=NBA_DRAFT_SCHEMA.names))
+            create_indexes(conn)
+        # statistics for the query planner
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+
+
+class PlayerDB:
+    """
+    Read-only queries against the database build_database writes. Rows come
+    back as dicts.
+    """
+
+    def __init__(self, path=DEFAULT_DB):
+        if not os.path.exists(path):
+            raise FileNotFoundError(
+                "{} doesn't exist, run player_db.py first".format(path))
+        self._conn = sqlite3.connect("file:{}?mode=ro".format(path),
+                                     uri=True, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+
+    def rows(self, sql, params=()):
+        return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def frame(self, sql, params=()):
+        """
+        Return the result of any query as a DataFrame.
+        """
+        return pd.read_sql_query(sql, self._conn, params=params)
+
+    def player(self, player_id):
+        """
+        Return the NFL draft row of a player joined with their links, or
+        None.
+        """
+        rows = self.rows(
+            "SELECT d.*, p.Player_NFL_Link, p.Player_NCAA_Link "
+            "FROM nfl_draft d LEFT JOIN nfl_players p USING (Player_ID) "
+            "WHERE d.Player_ID = ?", (player_id,))
+        return rows[0] if rows else None
+
+    def players(self, name=None, team=None, position=None, college=None,
+                with_links=False):
+        """
+        Return the NFL draft rows that match every given field, in draft
+        order, optionally joined with the players' links.
+        """
+        filters = [("d.Player", name), ("d.Tm", team), ("d.Pos", position),
+                   ("d.College", college)]
+        where = [(column, value) for column, value in filters
+                 if value is not None]
+        sql = "SELECT d.*"
+        if with_links:
+            sql += ", p.Player_NFL_Link, p.Player_NCAA_Link"
+        sql += " FROM nfl_draft d"
+        if with_links:
+            sql += " LEFT JOIN nfl_players p USING (Player_ID)"
+        if where:
+            sql += " WHERE " + " AND ".join(
+                "{} = ?".format(column) for column, _ in where)
+        sql += " ORDER BY d.Draft_Yr, d.Pick"
+        return self.rows(sql, [value for _, value in where])
+
+    def picks(self, first_year, last_year, first_pick=None, last_pick=None,
+              league="nfl"):
+        """
+        Return the draft rows of the years first_year to last_year and the
+        picks first_pick to last_pick (all of them by default), both
+        inclusive.
+        """
+        pick = PICK_COLUMNS[league]
+        sql = ("SELECT * FROM {}_draft WHERE Draft_Yr BETWEEN ? AND ?"
+               .format(league))
+        params = [first_year, last_year]
+        if first_pick is not None:
+            sql += " AND {} >= ?".format(pick)
+            params.append(first_pick)
+        if last_pick is not None:
+            sql += " AND {} <= ?".format(pick)
+            params.append(last_pick)
+        sql += " ORDER BY Draft_Yr, {}".format(pick)
+        return self.rows(sql, params)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the SQLite player database from the draft data.")
+    parser.add_argument("--db", default=DEFAULT_DB)
+    metrics.add_argument(parser)
+    args = parser.parse_args()
+
+    if args.metrics:
+        metrics.enable("player_db")
+    try:
+        with metrics.stage("load"):
+            nfl_draft_df, nfl_players_df = load_nfl_draft()
+            nba_draft_df = load_nba_draft()
+        with metrics.stage("store"):
+            build_database(args.db, nfl_draft_df, nfl_players_df,
+                           nba_draft_df)
+    finally:
+        metrics.finish(args.metrics)
+    print("Wrote {} NFL and {} NBA draft rows to {}".format(
+        len(nfl_draft_df), len(nba_draft_df), args.db))
+
+
+if __name__ == "__main__":
+    main()
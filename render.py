@@ -0,0 +1,213 @@
+"""
+Render every chart of the analysis scripts to image files, without a display.
+
+Each chart is a ChartJob: the name of its output file, the function that
+draws it and the data it draws. The jobs are rendered on matplotlib's Agg
+backend across a pool of worker processes and saved as PNG and/or SVG files
+in an output directory.
+
+A manifest in the output directory remembers a hash of every chart's data
+and drawing code, so a chart whose inputs haven't changed since the last
+run is skipped. There is a manifest per chart script, so runs rendering
+different scripts (the pipeline's NBA and NFL stages) can run side by side. The scripts only hand each chart the rows it actually draws
+(e.g. the drafts up to 2010), so a refreshed draft year only re-renders the
+charts that include it.
+
+    python render.py --out charts --formats png svg --processes 4
+"""
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import metrics
+from pipeline import file_hash, local_modules
+
+DEFAULT_OUTPUT_DIR = "charts"
+DEFAULT_FORMATS = ("png",)
+# formatted with the module of the charts' draw functions
+MANIFEST_FILE = ".render_manifest.{}.json"
+
+# draw(data) draws one chart into a new figure and returns the figure (or
+# None for the current figure)
+ChartJob = namedtuple("ChartJob", ["name", "draw", "data"])
+
+
+def job_hash(job):
+    """
+    Return a hash of everything a chart depends on: its data, the source of
+    the function that draws it and of every local module that function's
+    module imports (the helpers it calls, like lowess.py and density.py).
+    """
+    digest = hashlib.sha256()
+    digest.update(inspect.getsource(job.draw).encode("utf-8"))
+    # this module imports every chart script to collect the jobs, so it
+    # counts itself but isn't followed
+    modules = local_modules(inspect.getsourcefile(job.draw),
+                            found={os.path.abspath(__file__)})
+    for path in sorted(modules):
+        digest.update(os.path.basename(path).encode("utf-8"))
+        digest.update(file_hash(path).encode("utf-8"))
+    data = job.data
+    if isinstance(data, pd.Series):
+        data = data.to_frame()
+    if isinstance(data, pd.DataFrame):
+        digest.update(repr(list(data.columns)).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy()
+                      .tobytes())
+    else:
+        digest.update(repr(data).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _use_agg():
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def _render(job, paths):
+    """
+    Draw a chart on the Agg backend, save it to every path and return the
+    seconds it took.
+    """
+    _use_agg()
+    import matplotlib.pyplot as plt
+
+    start = time.perf_counter()
+    plt.close("all")
+    fig = job.draw(job.data) or plt.gcf()
+    for path in paths:
+        fig.savefig(path, bbox_inches="tight")
+    plt.close("all")
+    return time.perf_counter() - start
+
+
+def _load_manifest(output_dir, module):
+    path = os.path.join(output_dir, MANIFEST_FILE.format(module))
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_manifest(output_dir, module, manifest):
+    # write it whole or not at all, a killed run mustn't leave half a file
+    path = os.path.join(output_dir, MANIFEST_FILE.format(module))
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def render_charts(jobs, output_dir=DEFAULT_OUTPUT_DIR,
+                  formats=DEFAULT_FORMATS, processes=None, force=False):
+    """
+    Render the jobs to output_dir/<name>.<format> for each format and return
+    {name: "rendered" or "skipped"}.
+
+    A job is skipped when all its files exist and its hash matches the last
+    run, unless force is True. With processes the jobs are rendered by a
+    pool of that many worker processes, otherwise in this one.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    # {module: manifest} of the jobs' draw functions
+    manifests = {}
+    for job in jobs:
+        module = job.draw.__module__
+        if module not in manifests:
+            manifests[module] = _load_manifest(output_dir, module)
+
+    status = {}
+    todo = []
+    for job in jobs:
+        paths = [os.path.join(output_dir, "{}.{}".format(job.name, fmt))
+                 for fmt in formats]
+        key = job_hash(job)
+        manifest = manifests[job.draw.__module__]
+        up_to_date = (manifest.get(job.name) == key and
+                      all(os.path.exists(path) for path in paths))
+        if up_to_date and not force:
+            status[job.name] = "skipped"
+            metrics.record_chart(job.name, 0.0, "skipped")
+        else:
+            todo.append((job, paths, key))
+
+    if processes and len(todo) > 1:
+        with ProcessPoolExecutor(processes, initializer=_use_agg) as executor:
+            seconds = list(executor.map(_render,
+                                        [job for job, _, _ in todo],
+                                        [paths for _, paths, _ in todo]))
+    else:
+        seconds = [_render(job, paths) for job, paths, _ in todo]
+
+    # only record the hashes once the files are written
+    for (job, _, key), job_seconds in zip(todo, seconds):
+        manifests[job.draw.__module__][job.name] = key
+        status[job.name] = "rendered"
+        metrics.record_chart(job.name, job_seconds, "rendered")
+    for module, manifest in manifests.items():
+        _save_manifest(output_dir, module, manifest)
+    return status
+
+
+def collect_jobs(names=None):
+    """
+    Return the chart jobs of the analysis scripts, optionally only those of
+    the given scripts ("nba", "nfl_draft", "survival").
+    """
+    import nfl_draft
+    import survival_function_nfl
+    import visualizing_draft_nba
+
+    sources = {
+        "nba": visualizing_draft_nba.chart_jobs,
+        "nfl_draft": nfl_draft.chart_jobs,
+        "survival": survival_function_nfl.chart_jobs,
+    }
+    jobs = []
+    for name, chart_jobs in sources.items():
+        if names is None or name in names:
+            jobs.extend(chart_jobs())
+    return jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Render the charts of the analysis scripts to files.")
+    parser.add_argument("--out", default=DEFAULT_OUTPUT_DIR,
+                        help="directory to write the charts to")
+    parser.add_argument("--formats", nargs="+", default=list(DEFAULT_FORMATS),
+                        choices=["png", "svg", "pdf"])
+    parser.add_argument("--processes", type=int, default=os.cpu_count(),
+                        help="worker processes to render with")
+    parser.add_argument("--only", nargs="+",
+                        choices=["nba", "nfl_draft", "survival"],
+                        help="only render the charts of these scripts")
+    parser.add_argument("--force", action="store_true",
+                        help="render every chart even if it is up to date")
+    metrics.add_argument(parser)
+    args = parser.parse_args()
+
+    if args.metrics:
+        metrics.enable("render")
+    _use_agg()
+    try:
+        with metrics.stage("collect"):
+            jobs = collect_jobs(args.only)
+        with metrics.stage("render"):
+            status = render_charts(jobs, args.out, args.formats,
+                                   args.processes, args.force)
+    finally:
+        metrics.finish(args.metrics)
+    for name, state in sorted(status.items()):
+        print("{:>10}  {}".format(state, name))
+
+
+if __name__ == "__main__":
+    main()
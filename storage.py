@@ -0,0 +1,221 @@
+"""
+Typed, columnar storage for the draft tables.
+
+Each table is a Parquet dataset partitioned by Draft_Yr (one directory per
+draft, Draft_Yr=1967/ ...) with a fixed schema, so readers get proper dtypes
+without re-inferring them from text and can load only the columns and draft
+years they need. The csv files are still written next to the stores as a
+side output, and read_table falls back to them when a store hasn't been
+built yet.
+"""
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+DATA_DIR = "data"
+
+NBA_DRAFT_STORE = os.path.join(DATA_DIR, "nba_draft")
+NFL_DRAFT_STORE = os.path.join(DATA_DIR, "nfl_draft")
+NFL_SURVIVAL_STORE = os.path.join(DATA_DIR, "nfl_survival")
+NBA_AGGREGATE_STORE = os.path.join(DATA_DIR, "nba_draft_aggregates")
+
+# the partition column every table is split on
+PARTITION_COL = "Draft_Yr"
+
+# holds the full schema (and so the column order) of a store
+SCHEMA_FILE = "_common_metadata"
+
+
+def _fields(names, type_):
+    return [(name, type_) for name in names]
+
+
+NBA_DRAFT_SCHEMA = pa.schema(
+    [("Draft_Yr", pa.int16()), ("Pk", pa.int16())] +
+    _fields(["Tm", "Player", "College"], pa.string()) +
+    _fields(["Yrs", "G", "MP", "PTS", "TRB", "AST"], pa.int32()) +
+    _fields(["FG_Perc", "3P_Perc", "FT_Perc", "MP_per_G", "PTS_per_G",
+             "TRB_per_G", "AST_per_G", "WS", "WS_per_48", "BPM", "VORP"],
+            pa.float64()) +
+    [("Is_Active", pa.bool_())])
+
+NFL_STAT_COLS = ["Age", "To", "AP1", "PB", "St", "CarAV", "DrAV", "G", "Cmp",
+                 "Att", "Yds", "TD", "Int", "Rush_Att", "Rush_Yds", "Rush_TD",
+                 "Rec", "Rec_Yds", "Rec_TD", "Tkl", "Def_Int", "Sk"]
+
+NFL_DRAFT_SCHEMA = pa.schema(
+    [("Draft_Yr", pa.int16())] +
+    _fields(["Rnd", "Pick"], pa.float64()) +
+    _fields(["Tm", "Player", "Pos"], pa.string()) +
+    _fields(NFL_STAT_COLS, pa.float64()) +
+    _fields(["College", "Player_ID"], pa.string()) +
+    [("Is_Active", pa.bool_())])
+
+# the survival data casts these columns to int, see data_prep.py
+NFL_SURVIVAL_INT_COLS = ["Age", "To", "G", "Cmp", "Att", "Yds", "TD", "Int",
+                         "Rush_Att", "Rush_Yds", "Rush_TD", "Rec", "Rec_Yds",
+                         "Rec_TD", "Def_Int", "Duration"]
+
+NFL_SURVIVAL_SCHEMA = pa.schema(
+    [(field.name, pa.int32() if field.name in NFL_SURVIVAL_INT_COLS
+      else field.type) for field in NFL_DRAFT_SCHEMA] +
+    [("Retired", pa.int8()), ("Duration", pa.int32())])
+
+
+def _partitioning(schema):
+    return ds.partitioning(
+        pa.schema([schema.field(PARTITION_COL)]), flavor="hive")
+
+
+def write_table(df, path, schema, csv_path=None, **csv_kwargs):
+    """
+    Write df to the store at path, replacing the partitions of every draft
+    year in df and leaving the other years alone. If csv_path is given the
+    frame is also written there with df.to_csv(csv_path, **csv_kwargs).
+
+    Columns of the schema that df doesn't have (like Is_Active in files
+    scraped before it existed) are stored as nulls.
+    """
+    table = pa.Table.from_pandas(df.reindex(columns=schema.names),
+                                 schema=schema, preserve_index=False)
+    pq.write_to_dataset(table, path, partitioning=_partitioning(schema),
+                        existing_data_behavior="delete_matching")
+    pq.write_metadata(schema, os.path.join(path, SCHEMA_FILE))
+    if csv_path is not None:
+        df.to_csv(csv_path, **csv_kwargs)
+
+
+def clear_table(path):
+    """
+    Delete the store at path, if there is one.
+    """
+    if os.path.exists(path):
+        shutil.rmtree(path)
+
+
+def table_exists(path):
+    """
+    Return whether a store has been written at path.
+    """
+    return os.path.exists(os.path.join(path, SCHEMA_FILE))
+
+
+def read_csv(csv_path, **csv_kwargs):
+    """
+    Read a csv side output with pd.read_csv, dropping the unnamed index
+    column the older files were written with.
+    """
+    df = pd.read_csv(csv_path, **csv_kwargs)
+    if len(df.columns) and str(df.columns[0]).startswith("Unnamed: "):
+        df = df.drop(columns=df.columns[0])
+    return df
+
+
+def read_table(path, columns=None, years=None, csv_path=None, **csv_kwargs):
+    """
+    Return the store at path as a DataFrame, with only the given columns
+    (all of them by default) and draft years (an iterable of years, or all
+    of them by default).
+
+    If the store doesn't exist and csv_path is given, the same columns and
+    years are read from the csv instead.
+    """
+    schema_path = os.path.join(path, SCHEMA_FILE)
+    if not table_exists(path):
+        if csv_path is None:
+            raise FileNotFoundError("no table stored at {}".format(path))
+        return _read_csv(csv_path, columns, years, **csv_kwargs)
+
+    schema = pq.read_schema(schema_path)
+    dataset = ds.dataset(path, schema=schema, format="parquet",
+                         partitioning=_partitioning(schema))
+    row_filter = None
+    if years is not None:
+        # only the matching Draft_Yr directories are opened
+        row_filter = ds.field(PARTITION_COL).isin(list(years))
+    table = dataset.to_table(columns=columns, filter=row_filter)
+    return table.to_pandas()
+
+
+def _read_csv(csv_path, columns, years, **csv_kwargs):
+    usecols = None
+    if columns is not None:
+        usecols = list(columns)
+        if years is not None and PARTITION_COL not in usecols:
+            usecols.append(PARTITION_COL)
+    df = read_csv(csv_path, usecols=usecols, **csv_kwargs)
+    if years is not None:
+        df = df.loc[df[PARTITION_COL].isin(list(years))]
+    if columns is not None:
+        df = df[list(columns)]
+    return df.reset_index(drop=True)
+
+
+class ChunkWriter:
+    """
+    Write a table one chunk of rows at a time, for the streaming scrapes.
+
+    Every chunk is appended to the csv and added to the store as new
+    Parquet files, so only one chunk has to be in memory. Everything goes to
+    temporary paths next to the real ones, and close() moves them into place
+    (replacing the whole store), so a failed run leaves the old outputs
+    alone. Use it as a context manager to close it, or clean up after an
+    error.
+    """
+
+    def __init__(self, csv_path, store_path=None, schema=None, **csv_kwargs):
+        self.csv_path = csv_path
+        self.store_path = store_path
+        self.schema = schema
+        self.csv_kwargs = csv_kwargs
+        self.chunks = 0
+        self.rows = 0
+        self._tmp_csv = csv_path + ".tmp"
+        self._tmp_store = store_path + ".tmp" if store_path else None
+        self._discard()
+        open(self._tmp_csv, "w").close()
+
+    def append(self, df):
+        df.to_csv(self._tmp_csv, mode="a", header=self.chunks == 0,
+                  **self.csv_kwargs)
+        if self.store_path is not None:
+            table = pa.Table.from_pandas(
+                df.reindex(columns=self.schema.names), schema=self.schema,
+                preserve_index=False)
+            # a new file name for every chunk, the chunks of one draft year
+            # end up side by side in its partition
+            pq.write_to_dataset(
+                table, self._tmp_store,
+                partitioning=_partitioning(self.schema),
+                basename_template="part-{}-{{i}}.parquet".format(self.chunks),
+                existing_data_behavior="overwrite_or_ignore")
+        self.chunks += 1
+        self.rows += len(df)
+
+    def close(self):
+        if self.store_path is not None:
+            os.makedirs(self._tmp_store, exist_ok=True)
+            pq.write_metadata(self.schema,
+                              os.path.join(self._tmp_store, SCHEMA_FILE))
+            clear_table(self.store_path)
+            os.replace(self._tmp_store, self.store_path)
+        os.replace(self._tmp_csv, self.csv_path)
+
+    def _discard(self):
+        if os.path.exists(self._tmp_csv):
+            os.remove(self._tmp_csv)
+        if self._tmp_store is not None:
+            clear_table(self._tmp_store)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._discard()
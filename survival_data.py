@@ -0,0 +1,94 @@
+"""
+Build the survival analysis data set from the clean NFL draft data.
+
+Every derived column (numeric types, Retired, Duration and the integer
+casts) is computed column by column with NumPy in a single pass, instead of
+calling a Python function for every player with DataFrame.apply and copying
+the whole frame for each cleaning step.
+"""
+import numpy as np
+import pandas as pd
+
+# the columns that are stored as ints in the survival data
+INT_COLS = ['Age', 'To', 'G', 'Cmp', 'Att', 'Yds', 'TD', 'Int',
+            'Rush_Att', 'Rush_Yds', 'Rush_TD', 'Rec', 'Rec_Yds', 'Rec_TD',
+            'Def_Int', 'Duration']
+
+# Mike Kafka is retired according to wikipedia, but PFR still has him
+RETIRED_PLAYERS = ("Mike Kafka",)
+
+
+def _numeric(values):
+    """
+    Return values as a NumPy array, converted to numbers with NaNs replaced
+    by 0 if the column holds any numbers, otherwise unchanged.
+    """
+    if not pd.api.types.is_numeric_dtype(values):
+        # only the distinct values are parsed, then spread back out by code
+        codes, uniques = pd.factorize(values)
+        converted = pd.to_numeric(pd.Series(uniques), errors="coerce")
+        if converted.isnull().all():
+            return values.to_numpy()
+        converted = np.append(converted.to_numpy(dtype=float), np.nan)
+        # missing values have code -1, which picks the NaN on the end
+        values = pd.Series(converted[codes])
+    values = values.to_numpy()
+    if values.dtype.kind == "f":
+        values = np.where(np.isnan(values), 0, values)
+    return values
+
+
+def build_survival_dataset(draft_df, active_ids=None, as_of=2016,
+                           last_season=None, retired_players=RETIRED_PLAYERS):
+    """
+    Return the survival data set for the players drafted before as_of.
+
+    Retired is 0 for the players flagged Is_Active by the draft scrape (or,
+    if active_ids is given, whose Player_ID is in it) and 1 for everyone
+    else, and Duration is the number of seasons from the draft to
+    their last season ('To'), or 0 if they never played.
+
+    If last_season is given the careers are only observed up to that
+    season: players who played after it count as active and their Duration
+    stops at last_season. Players drafted after last_season weren't
+    observed at all and are left out.
+    """
+    draft_yr = draft_df.Draft_Yr.to_numpy()
+    # keep only players drafted before the cutoff
+    keep = draft_yr < as_of
+    if last_season is not None:
+        keep &= draft_yr <= last_season
+
+    columns = {}
+    for name in draft_df.columns:
+        if name == "Is_Active":
+            # rows stored before the flag existed have it missing
+            columns[name] = draft_df[name][keep].fillna(False).to_numpy(
+                dtype=bool)
+        else:
+            columns[name] = _numeric(draft_df[name][keep])
+
+    draft_yr = columns["Draft_Yr"]
+    to = columns["To"]
+
+    # a player's career is officially over unless they are still active
+    # (pandas' isin hashes the IDs, and copes with the missing ones)
+    if active_ids is None:
+        active = columns["Is_Active"].copy()
+    else:
+        active = pd.Series(columns["Player_ID"]).isin(active_ids).to_numpy()
+    if last_season is not None:
+        active |= to > last_season
+        to = np.minimum(to, last_season)
+    retired = ~active
+    retired |= pd.Series(columns["Player"]).isin(retired_players).to_numpy()
+    columns["Retired"] = retired.astype(int)
+
+    # The player never played a season if their "To" value is 0, otherwise
+    # it's the number of seasons from the draft to their last one
+    columns["Duration"] = np.where(to == 0, 0, to - draft_yr + 1)
+
+    for name in INT_COLS:
+        columns[name] = columns[name].astype(int)
+
+    return pd.DataFrame(columns)
@@ -2,137 +2,183 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from lifelines import KaplanMeierFitter
 
-draft_df = pd.read_csv("nfl_survival_analysis_data.csv")
+from kaplan_meier import GroupedKaplanMeier
+from render import ChartJob
+from storage import NFL_SURVIVAL_STORE, read_table
 
-# set some plotting aesthetics, similar to ggplot
-sns.set(palette = "colorblind", font_scale = 1.35,
-        rc = {"figure.figsize": (12,9), "axes.facecolor": ".92"})
 
-#print(draft_df.head())
+def load_survival_df():
+    """
+    Read the survival data. We only need the career length, whether the
+    player retired and the position.
+    """
+    return read_table(NFL_SURVIVAL_STORE, columns=["Duration", "Retired", "Pos"],
+                      csv_path="nfl_survival_analysis_data.csv")
 
-kmf = KaplanMeierFitter()
-
-# The 1st arg accepts an array or pd.Series of individual survival times
-# The 2nd arg accepts an array or pd.Series that indicates if the event
-# interest (or death) occured.
-kmf.fit(durations = draft_df.Duration,
-        event_observed = draft_df.Retired)
-
-#print(kmf.event_table())
-
-# get the values for time = 0 from the survival table
-event_at_0 = kmf.event_table.iloc[0, :]
-# now calculate the survival probability for t = 0
-surv_for_0 =  (event_at_0.at_risk - event_at_0.observed) / event_at_0.at_risk
-
-# Calculate the survival probability for t = 1
-event_at_1 = kmf.event_table.iloc[1, :]
-surv_for_1 =  (event_at_1.at_risk - event_at_1.observed) / event_at_1.at_risk
-
-# Calculate the survival probability for t = 2
-event_at_2 = kmf.event_table.iloc[2, :]
-surv_for_2 =  (event_at_2.at_risk - event_at_2.observed) / event_at_2.at_risk
-
-# The probability that an NFL player has a career longer than 2 years
-surv_after_2 = surv_for_0 * surv_for_1 * surv_for_2
-
-kmf.predict(2)
-
-# The survival probabilities of NFL players after 1, 3, 5, and 10 yrs played
-kmf.predict([1,3,5,10])
-
-kmf.survival_function_
-
-kmf.median_
-
-# plot the KM estimate
-kmf.plot()
-# Add title and y-axis label
-plt.title("The Kaplan-Meier Estimate for Drafted NFL Players\n(1967-2015)")
-plt.ylabel("Probability a Player is Still Active")
-
-plt.show()
-
-#print (draft_df.Pos.unique()) # check out all the different positions
-
-# Relabel/Merge some of the positions
-# Set all HBs to RB
-draft_df.loc[draft_df.Pos == "HB", "Pos"] = "RB"
-
-# Set all Safeties and Cornernbacks to DBs
-draft_df.loc[draft_df.Pos.isin(["SS", "FS", "S", "CB"]), "Pos"] = "DB"
-
-# Set all types of Linebackers to LB
-draft_df.loc[draft_df.Pos.isin(["OLB", "ILB"]), "Pos"] = "LB"
-
-# drop players from the following positions [FL, E, WB, KR, LS, OL]
-# get the row indices for players with undesired postions
-idx = draft_df.Pos.isin(["FL", "E", "WB", "KR", "LS", "DL", "OL", "Pos"])
-# keep the players that don't have the above positions
-draft_df_2 = draft_df.loc[~idx, :]
-
-# check the number of positions in order to decide
-# on the plotting grid dimiensions
-#print (draft_df_2.Pos.unique())
-
-# create a new KMF object
-kmf_by_pos = KaplanMeierFitter()
-
-duration = draft_df_2.Duration
-observed = draft_df_2.Retired
-
-# Set the order that the positions will be plotted
-positions = ["QB", "RB", "WR",
-             "TE", "T", "G",
-             "C", "DE", "DT",
-             "NT", "LB", "DB",
-             "FB", "K", "P"]
-
-# Set up the the 5x3 plotting grid by creating figure and axes objects
-# Set sharey to True so that each row of plots share the left most y-axis labels
-fig, axes = plt.subplots(nrows = 5, ncols = 3, sharey = True,
-                         figsize=(12,15))
-
-# flatten() creates a 1-D array of the individual axes (or subplots)
-# that we will plot on in our grid
-# We zip together the two 1-D arrays containing the positions and axes
-# so we can iterate over each postion and plot its KM estimate onto
-# its respective axes
-for pos, ax in zip(positions, axes.flatten()):
-    # get indices for players with the matching position label
-    idx = draft_df_2.Pos == pos
-    # fit the kmf for the those players
-    kmf_by_pos.fit(duration[idx], observed[idx])
-    # plot the KM estimate for that position on its respective axes
-    kmf_by_pos.plot(ax=ax, legend=False)
-    # place text indicating the median for the position
-    # the xy-coord passed in represents the fractional value for each axis
-    # for example (.5, .5) places text at the center of the plot
-    ax.annotate("Median = {:.0f} yrs".format(kmf_by_pos.median_), xy = (.47, .85),
-                xycoords = "axes fraction")
-    # get rid the default "timeline" x-axis label set by kmf.plot()
-    ax.set_xlabel("")
-    # label each plot by its position
-    ax.set_title(pos)
-    # set a common x and y axis across all plots
-    ax.set_xlim(0,25)
-    ax.set_ylim(0,1)
-
-# tighten up the padding for the subplots
-fig.tight_layout()
-
-# https://stackoverflow.com/questions/16150819/common-xlabel-ylabel-for-matplotlib-subplots
-# set a common x-axis label
-fig.text(0.5, -0.01, "Timeline (Years)", ha="center")
-# set a common y-axis label
-fig.text(-0.01, 0.5, "Probability That a Player is Still Active",
-         va="center", rotation="vertical")
-# add the title for the whole plot
-fig.suptitle("Survival Curve for each NFL Position\n(Players Drafted from 1967-2015)",
-             fontsize=15)
-# add some padding between the title and the rest of the plot to avoid overlap
-fig.subplots_adjust(top=0.92)
-
-plt.show()
+
+def set_style():
+    # set some plotting aesthetics, similar to ggplot
+    sns.set(palette = "colorblind", font_scale = 1.35,
+            rc = {"figure.figsize": (12,9), "axes.facecolor": ".92"})
+
+
+def plot_survival_curve(draft_df):
+    """
+    Plot the Kaplan-Meier estimate for all drafted players.
+    """
+    set_style()
+
+    kmf = GroupedKaplanMeier()
+
+    # The 1st arg accepts an array or pd.Series of individual survival times
+    # The 2nd arg accepts an array or pd.Series that indicates if the event
+    # interest (or death) occured.
+    kmf.fit(durations = draft_df.Duration,
+            event_observed = draft_df.Retired)
+
+    #print(kmf.event_table_)
+
+    # The probability that an NFL player has a career longer than 2 years,
+    # the product of the survival probabilities for t = 0, 1 and 2
+    surv_after_2 = kmf.predict(2).iloc[0, 0]
+
+    # The survival probabilities of NFL players after 1, 3, 5, and 10 yrs played
+    kmf.predict([1,3,5,10])
+
+    kmf.survival_function()
+
+    kmf.median_.iloc[0]
+
+    # plot the KM estimate
+    kmf.plot(label="KM_estimate")
+    plt.legend()
+    # Add title and y-axis label
+    plt.title("The Kaplan-Meier Estimate for Drafted NFL Players\n(1967-2015)")
+    plt.ylabel("Probability a Player is Still Active")
+
+    return plt.gcf()
+
+
+def merge_positions(draft_df):
+    """
+    Return the players of the positions we plot, with the similar positions
+    merged.
+    """
+    draft_df = draft_df.copy()
+
+    # Relabel/Merge some of the positions
+    # Set all HBs to RB
+    draft_df.loc[draft_df.Pos == "HB", "Pos"] = "RB"
+
+    # Set all Safeties and Cornernbacks to DBs
+    draft_df.loc[draft_df.Pos.isin(["SS", "FS", "S", "CB"]), "Pos"] = "DB"
+
+    # Set all types of Linebackers to LB
+    draft_df.loc[draft_df.Pos.isin(["OLB", "ILB"]), "Pos"] = "LB"
+
+    # drop players from the following positions [FL, E, WB, KR, LS, OL]
+    # get the row indices for players with undesired postions
+    idx = draft_df.Pos.isin(["FL", "E", "WB", "KR", "LS", "DL", "OL", "Pos"])
+    # keep the players that don't have the above positions
+    return draft_df.loc[~idx, :]
+
+
+def plot_survival_by_position(draft_df):
+    """
+    Plot a grid with the Kaplan-Meier estimate of every position.
+    """
+    set_style()
+    draft_df_2 = merge_positions(draft_df)
+
+    # check the number of positions in order to decide
+    # on the plotting grid dimiensions
+    #print (draft_df_2.Pos.unique())
+
+    # fit the KM estimate for every position at once
+    kmf_by_pos = GroupedKaplanMeier()
+    kmf_by_pos.fit(draft_df_2.Duration, draft_df_2.Retired, draft_df_2.Pos)
+
+    # 95% bootstrap confidence intervals for each position's median, from 10k
+    # resamples of its players
+    median_ci = kmf_by_pos.bootstrap_median_ci(n_replicates=10000, seed=0)
+
+    # Set the order that the positions will be plotted
+    positions = ["QB", "RB", "WR",
+                 "TE", "T", "G",
+                 "C", "DE", "DT",
+                 "NT", "LB", "DB",
+                 "FB", "K", "P"]
+
+    # Set up the the 5x3 plotting grid by creating figure and axes objects
+    # Set sharey to True so that each row of plots share the left most y-axis labels
+    fig, axes = plt.subplots(nrows = 5, ncols = 3, sharey = True,
+                             figsize=(12,15))
+
+    # flatten() creates a 1-D array of the individual axes (or subplots)
+    # that we will plot on in our grid
+    # We zip together the two 1-D arrays containing the positions and axes
+    # so we can iterate over each postion and plot its KM estimate onto
+    # its respective axes
+    for pos, ax in zip(positions, axes.flatten()):
+        # plot the KM estimate for that position on its respective axes
+        kmf_by_pos.plot(pos, ax=ax)
+        # place text indicating the median for the position
+        # the xy-coord passed in represents the fractional value for each axis
+        # for example (.5, .5) places text at the center of the plot
+        ax.annotate("Median = {:.0f} yrs\n95% CI {:.0f}-{:.0f}".format(
+                        *median_ci.loc[pos, ["median", "lower", "upper"]]),
+                    xy = (.47, .75), xycoords = "axes fraction")
+        # get rid the default "timeline" x-axis label set by kmf.plot()
+        ax.set_xlabel("")
+        # label each plot by its position
+        ax.set_title(pos)
+        # set a common x and y axis across all plots
+        ax.set_xlim(0,25)
+        ax.set_ylim(0,1)
+
+    # tighten up the padding for the subplots
+    fig.tight_layout()
+
+    # https://stackoverflow.com/questions/16150819/common-xlabel-ylabel-for-matplotlib-subplots
+    # set a common x-axis label
+    fig.text(0.5, -0.01, "Timeline (Years)", ha="center")
+    # set a common y-axis label
+    fig.text(-0.01, 0.5, "Probability That a Player is Still Active",
+             va="center", rotation="vertical")
+    # add the title for the whole plot
+    fig.suptitle("Survival Curve for each NFL Position\n(Players Drafted from 1967-2015)",
+                 fontsize=15)
+    # add some padding between the title and the rest of the plot to avoid overlap
+    fig.subplots_adjust(top=0.92)
+
+    return fig
+
+
+def chart_jobs(draft_df=None):
+    """
+    Return a ChartJob for every chart, for render.py.
+    """
+    if draft_df is None:
+        draft_df = load_survival_df()
+    return [ChartJob("nfl_survival_curve", plot_survival_curve, draft_df),
+            ChartJob("nfl_survival_by_position", plot_survival_by_position,
+                     draft_df)]
+
+
+def main():
+    draft_df = load_survival_df()
+
+    #print(draft_df.head())
+
+    plot_survival_curve(draft_df)
+    plt.show()
+
+    #print (draft_df.Pos.unique()) # check out all the different positions
+
+    plot_survival_by_position(draft_df)
+    plt.show()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Fast extraction of the draft tables from the sports-reference pages.
+
+Building an html5lib BeautifulSoup tree for a whole draft page and then
+scanning every tr in it is by far the slowest part of a scrape. The
+functions here cut the page down to the one table we want (#drafts on
+pro-football-reference, #stats on basketball-reference), parse just that
+with lxml and collect the cell texts and links of every row in one pass.
+
+extract_draft_table returns exactly what the old BeautifulSoup code in
+nfl_draft.py did (column headers from the second header row, " HOF" suffixes
+stripped, Player_NFL_Link and Player_NCAA_Link appended to every row), plus
+an Is_Active flag for the players the page shows in bold. That is the same
+flag data_prep.py used to get by downloading the pages again and selecting
+"#drafts strong a". extract_player_data is that old code, kept here as the
+reference and for the parse benchmark.
+"""
+import re
+
+import lxml.html
+
+# matches the opening tag of the table with the given id
+TABLE_START = r'<table[^>]*\bid=["\']{}["\']'
+
+HOF_SUFFIX = " HOF"
+
+# the column added for the players shown in bold (still active)
+ACTIVE_COL = "Is_Active"
+
+
+def _strip_hof(text):
+    # Some player names end with ' HOF', if they do, drop those 4 characters
+    return text[:-4] if text.endswith(HOF_SUFFIX) else text
+
+
+def _find_table(html, table_id):
+    """
+    Return the lxml element for the table with the given id.
+
+    Only the table's own markup is handed to lxml, so the rest of the page
+    (navigation, scripts, other tables) is never parsed. If the table can't
+    be cut out cleanly the whole page is parsed instead.
+    """
+    if isinstance(html, bytes):
+        html = html.decode("utf-8", errors="replace")
+
+    match = re.search(TABLE_START.format(re.escape(table_id)), html)
+    if match is not None:
+        end = html.find("</table>", match.start())
+        if end != -1:
+            fragment = html[match.start():end + len("</table>")]
+            return lxml.html.fragment_fromstring(fragment)
+
+    table = lxml.html.document_fromstring(html).get_element_by_id(table_id,
+                                                                  None)
+    if table is None:
+        raise ValueError("no table with id {!r} in page".format(table_id))
+    return table
+
+
+def iter_table_rows(html, table_id):
+    """
+    Yield (cell_texts, links, active) for every tr in the table, where
+    cell_texts is the text of each th/td, links is a list of (link text,
+    href) pairs and active is True if anything in the row is bold (the
+    sports-reference sites bold the players that are still active).
+    """
+    for row in _find_table(html, table_id).iter("tr"):
+        cells = [cell.text_content() for cell in row.iter("th", "td")]
+        links = [(link.text_content(), link.get("href"))
+                 for link in row.iter("a") if link.get("href") is not None]
+        active = next(row.iter("strong"), None) is not None
+        yield cells, links, active
+
+
+def extract_table(html, table_id, skip=2, active=False):
+    """
+    Return (column_headers, rows) for a table: the headers are the th texts
+    of the last of the first skip rows and every row after that is a list
+    of cell texts, like the soup.findAll('tr')[2:] loop in draft.py.
+
+    With active=True an Is_Active column is added at the end of the headers
+    and every row.
+    """
+    column_headers = []
+    rows = []
+    for i, (cells, _, row_active) in enumerate(iter_table_rows(html,
+                                                               table_id)):
+        if i < skip:
+            column_headers = cells
+            continue
+        if active:
+            # short rows are padded so the flag always lands in its column
+            cells = cells + [None] * (len(column_headers) - len(cells))
+            cells.append(row_active)
+        rows.append(cells)
+    if active:
+        column_headers = column_headers + [ACTIVE_COL]
+    return column_headers, rows
+
+
+def extract_draft_table(html, table_id="drafts"):
+    """
+    Return (column_headers, player_data) for a pro-football-reference draft
+    page, matching the BeautifulSoup path in nfl_draft.py row for row with
+    an Is_Active column after the links.
+    """
+    column_headers = []
+    player_data = []
+    for i, (cells, links, active) in enumerate(iter_table_rows(html,
+                                                               table_id)):
+        # the first two rows are the over header and the column headers
+        if i < 2:
+            column_headers = cells
+            continue
+
+        # skip the empty rows
+        if not cells:
+            continue
+        player_list = [_strip_hof(text) for text in cells]
+
+        # later links with the same text win, like in the dict comprehension
+        links_dict = {_strip_hof(text): href for text, href in links}
+        player_list.append(links_dict.get(player_list[3], ""))
+        player_list.append(links_dict.get("College Stats", ""))
+        player_list.append(active)
+        player_data.append(player_list)
+
+    column_headers = column_headers + ["Player_NFL_Link", "Player_NCAA_Link",
+                                       ACTIVE_COL]
+    return column_headers, player_data
+
+
+def extract_player_data(table_rows):
+    """
+    Extract and return the the desired information from the td elements within
+    the table rows.
+    """
+    # create the empty list to store the player data
+    player_data = []
+
+    for row in table_rows:  # for each row do the following
+
+        # Get the text for each table data (td) element in the row
+        # Some player names end with ' HOF', if they do, get the text excluding
+        # those last 4 characters,
+        # otherwise get all the text data from the table data
+        player_list = [td.get_text()[:-4] if td.get_text().endswith(" HOF")
+                       else td.get_text() for td in row.find_all(['th' , 'td'])]
+
+        # there are some empty table rows, which are the repeated
+        # column headers in the table
+        # we skip over those rows and and continue the for loop
+        if not player_list:
+            continue
+
+        # Extracting the player links
+        # Instead of a list we create a dictionary, this way we can easily
+        # match the player name with their pfr url
+        # For all "a" elements in the row, get the text
+        # NOTE: Same " HOF" text issue as the player_list above
+        links_dict = {(link.get_text()[:-4]   # exclude the last 4 characters
+                       if link.get_text().endswith(" HOF")  # if they are " HOF"
+                       # else get all text, set thet as the dictionary key
+                       # and set the url as the value
+                       else link.get_text()) : link["href"]
+                       for link in row.find_all("a", href=True)}
+
+        # The data we want from the dictionary can be extracted using the
+        # player's name, which returns us their pfr url, and "College Stats"
+        # which returns us their college stats page
+
+        # add the link associated to the player's pro-football-reference page,
+        # or en empty string if there is no link
+        player_list.append(links_dict.get(player_list[3], ""))
+
+        # add the link for the player's college stats or an empty string
+        # if ther is no link
+        player_list.append(links_dict.get("College Stats", ""))
+
+        # Now append the data to list of data
+        player_data.append(player_list)
+
+    return player_data
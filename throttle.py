@@ -0,0 +1,296 @@
+"""
+Polite, adaptive scheduling of the requests fetch.py sends.
+
+The sports-reference sites throttle aggressively, so every request goes
+through a Scheduler that
+
+* spaces requests to each host with a token bucket,
+* pauses the whole host when a response carries Retry-After,
+* adjusts how many requests are in flight with AIMD: the limit creeps up
+  while responses come back quickly and is halved on a 429 or 5xx,
+* puts a url that failed with a retryable error back on the queue with a
+  jittered exponential backoff instead of dropping it, and only gives up
+  after max_attempts tries.
+"""
+import heapq
+import http.client
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+# the sports-reference sites ask for no more than 20 requests a minute
+SITE_RATES = {
+    "www.pro-football-reference.com": 20 / 60,
+    "www.basketball-reference.com": 20 / 60,
+    "www.sports-reference.com": 20 / 60,
+}
+
+DEFAULT_MAX_ATTEMPTS = 5
+
+# backoff before the n-th retry is uniform in [0, min(MAX_DELAY, BASE * 2**n)]
+BASE_DELAY = 1.0
+MAX_DELAY = 60.0
+
+# a response is healthy if it is no slower than this many times the fastest
+# one seen from the host
+HEALTHY_LATENCY_FACTOR = 2.0
+
+
+def retry_after_seconds(value, now=None):
+    """
+    Parse a Retry-After header (seconds or an HTTP date) into seconds from
+    now, or None if it is missing or malformed.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+    now = time.time() if now is None else now
+    return max(0.0, when - now)
+
+
+def is_throttled(status):
+    """
+    Return True for the statuses that mean the host wants us to slow down.
+    """
+    return status == 429 or (status is not None and status >= 500)
+
+
+def is_retryable(error):
+    """
+    Return True if a request that failed with error is worth trying again:
+    throttling, server errors and network errors, but not a 404.
+    """
+    status = getattr(error, "status", None)
+    if status is not None:
+        return is_throttled(status)
+    return isinstance(error, (OSError, http.client.HTTPException))
+
+
+class TokenBucket:
+    """
+    Hands out at most rate tokens a second, with bursts of up to capacity.
+    A rate of None never blocks.
+    """
+
+    def __init__(self, rate=None, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def pause(self, seconds):
+        """
+        Don't hand out any tokens for the next seconds (for Retry-After).
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until,
+                                     time.monotonic() + seconds)
+
+    def acquire(self):
+        """
+        Block until a token is available and take it.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = self._paused_until - now
+                if wait <= 0 and self.rate is None:
+                    return
+                if wait <= 0:
+                    self._tokens = min(self.capacity, self._tokens +
+                                       (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class AIMDLimiter:
+    """
+    A concurrency limit that grows by about one request per round of
+    healthy responses and halves when the host throttles us.
+    """
+
+    def __init__(self, initial=2, minimum=1, maximum=8):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.in_flight = 0
+        self.fastest = None
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """
+        Block until one more request may be in flight; return its start time.
+        """
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+            return time.monotonic()
+
+    def release(self, started, throttled=False):
+        """
+        Record how the request that started at started went.
+        """
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            latency = now - started
+            if throttled:
+                # only back off once per round: requests that were already in
+                # flight when we last decreased don't count again
+                if started >= self._last_decrease:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self._last_decrease = now
+            else:
+                if self.fastest is None or latency < self.fastest:
+                    self.fastest = latency
+                if latency <= self.fastest * HEALTHY_LATENCY_FACTOR:
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+class Scheduler:
+    """
+    Runs a function over a list of urls on a pool of worker threads, with a
+    token bucket and an AIMD concurrency limit per host, and requeues the
+    urls that fail with a retryable error.
+    """
+
+    def __init__(self, max_concurrency=8, initial_concurrency=2,
+                 min_concurrency=1, rates=None, default_rate=None,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, base_delay=BASE_DELAY,
+                 max_delay=MAX_DELAY, seed=None):
+        self.max_concurrency = max_concurrency
+        self.initial_concurrency = initial_concurrency
+        self.min_concurrency = min_concurrency
+        self.rates = SITE_RATES if rates is None else rates
+        self.default_rate = default_rate
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.attempts = 0
+        self.retries = 0
+        self._random = random.Random(seed)
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = (
+                    TokenBucket(self.rates.get(host, self.default_rate)),
+                    AIMDLimiter(self.initial_concurrency, self.min_concurrency,
+                                self.max_concurrency))
+            return self._hosts[host]
+
+    def limit(self, url):
+        """
+        Return the current concurrency limit for the host of url.
+        """
+        return self._host(url)[1].limit
+
+    def send(self, url, request):
+        """
+        Call request() (which does the actual network round trip for url)
+        once the host's token bucket and concurrency limit allow it, and
+        feed the outcome back into them.
+        """
+        bucket, limiter = self._host(url)
+        bucket.acquire()
+        started = limiter.acquire()
+        throttled = False
+        with self._lock:
+            self.attempts += 1
+        try:
+            return request()
+        except Exception as e:
+            throttled = is_throttled(getattr(e, "status", None))
+            retry_after = getattr(e, "retry_after", None)
+            if retry_after:
+                bucket.pause(retry_after)
+            raise
+        finally:
+            limiter.release(started, throttled)
+
+    def backoff(self, attempt, error=None):
+        """
+        Return how long to wait before retry number attempt (1 for the
+        first retry): full jitter, but at least the server's Retry-After.
+        """
+        delay = self._random.uniform(
+            0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(delay, getattr(error, "retry_after", None) or 0)
+
+    def map(self, func, urls, return_exceptions=False):
+        """
+        Return [func(url) for url in urls], run concurrently, in the same
+        order as urls. A url whose call raises a retryable error goes back on
+        the queue until it has been tried max_attempts times.
+        """
+        urls = list(urls)
+        results = [None] * len(urls)
+        # (ready time, attempt, index) of every url still to be tried
+        queue = [(0.0, 0, i) for i in range(len(urls))]
+        cond = threading.Condition()
+        state = {"pending": len(urls), "error": None}
+
+        def worker():
+            while True:
+                with cond:
+                    while True:
+                        if state["pending"] == 0 or state["error"] is not None:
+                            return
+                        now = time.monotonic()
+                        if queue and queue[0][0] <= now:
+                            _, attempt, i = heapq.heappop(queue)
+                            break
+                        cond.wait(queue[0][0] - now if queue else None)
+                try:
+                    result = func(urls[i])
+                except Exception as e:
+                    attempt += 1
+                    with cond:
+                        if is_retryable(e) and attempt < self.max_attempts:
+                            # requeue the url instead of losing it
+                            self.retries += 1
+                            heapq.heappush(queue, (
+                                time.monotonic() + self.backoff(attempt, e),
+                                attempt, i))
+                        else:
+                            if return_exceptions:
+                                results[i] = e
+                            else:
+                                state["error"] = e
+                            state["pending"] -= 1
+                        cond.notify_all()
+                    continue
+                with cond:
+                    results[i] = result
+                    state["pending"] -= 1
+                    cond.notify_all()
+
+        threads = [threading.Thread(target=worker, daemon=True)
+                   for _ in range(max(1, min(self.max_concurrency, len(urls))))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if state["error"] is not None:
+            raise state["error"]
+        return results
@@ -0,0 +1,172 @@
+"""
+Keyed upserts into the draft stores.
+
+Every draft table is keyed on (league, Draft_Yr, pick number). The league is
+fixed per store, so the key columns are Draft_Yr and Pick in the NFL store
+and Draft_Yr and Pk in the NBA one. Rows without a pick number (the round
+separators and repeated header rows of the draft pages) can't be keyed and
+aren't stored.
+
+upsert_table merges re-scraped rows into a store instead of overwriting it:
+
+    counts = upsert_table(new_df, NFL_DRAFT_STORE, NFL_DRAFT_SCHEMA, "Pick",
+                          csv_path="pfr_nfl_draft_data_CLEAN.csv")
+    # {"inserted": 3, "updated": 250, "unchanged": 1400}
+
+The new rows are deduplicated (exact duplicates dropped, the last row wins
+for a repeated key) and sorted by key, then merged with the stored rows of
+the same draft years with a binary search of the sorted keys. A changed row
+replaces the stored one, a new key is inserted and a row identical to the
+stored one changes nothing. Only the Draft_Yr partitions that actually
+changed are rewritten, the others are never read, so partial refreshes and
+overlapping runs of different years write into the same store cheaply.
+Rows are never deleted by an upsert, clear the store for a clean rebuild.
+
+The rows are fingerprinted before any of that (see changes.py), so draft
+years and rows that come back unchanged are recognised without reading the
+store, and every inserted row and changed value goes to the store's
+changelog for the stages downstream.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+import changes
+from changes import row_keys
+from storage import PARTITION_COL, read_table, table_exists, write_table
+
+# the pick column of each league's draft table
+PICK_COLUMNS = {"nfl": "Pick", "nba": "Pk"}
+
+
+def keyed_rows(df, pick_col):
+    """
+    Return the rows of df that have a key, without exact duplicates and with
+    only the last row of a repeated key, sorted by key.
+    """
+    picks = pd.to_numeric(df[pick_col], errors="coerce")
+    df = df[(picks > 0).to_numpy()].drop_duplicates()
+    df = df[~df.duplicated([PARTITION_COL, pick_col], keep="last")]
+    order = np.argsort(row_keys(df, pick_col), kind="stable")
+    return df.iloc[order].reset_index(drop=True)
+
+
+def _same_rows(a, b):
+    """
+    Return a boolean array, True where the rows of a and b (same columns,
+    same length) hold the same values, NaN and None counting as equal.
+    """
+    same = np.ones(len(a), dtype=bool)
+    for col in a.columns:
+        x = a[col].to_numpy()
+        y = b[col].to_numpy()
+        both_null = pd.isnull(x) & pd.isnull(y)
+        with np.errstate(invalid="ignore"):
+            same &= (x == y) | both_null
+    return same
+
+
+def merge_sorted(existing, new, pick_col):
+    """
+    Merge new into existing, both keyed_rows output with the same columns.
+
+    Returns the merged rows sorted by key and a dict with the number of
+    rows inserted, updated and unchanged, plus a boolean array telling which
+    rows of new changed the table.
+    """
+    existing_keys = row_keys(existing, pick_col)
+    new_keys = row_keys(new, pick_col)
+    # where every new key is (or would go) in the stored keys
+    positions = np.searchsorted(existing_keys, new_keys)
+    found = positions < len(existing_keys)
+    found[found] = existing_keys[positions[found]] == new_keys[found]
+
+    changed = ~found
+    unchanged = np.zeros(len(new), dtype=bool)
+    if found.any():
+        unchanged[found] = _same_rows(
+            existing.iloc[positions[found]].reset_index(drop=True),
+            new[found].reset_index(drop=True))
+        changed |= found & ~unchanged
+
+    keep = np.ones(len(existing), dtype=bool)
+    keep[positions[found]] = False
+    merged = pd.concat([existing[keep], new], ignore_index=True)
+    # two sorted runs, which a stable sort merges in linear time
+    order = np.argsort(np.concatenate([existing_keys[keep], new_keys]),
+                       kind="stable")
+    merged = merged.iloc[order].reset_index(drop=True)
+
+    counts = {"inserted": int((~found).sum()),
+              "updated": int((found & ~unchanged).sum()),
+              "unchanged": int(unchanged.sum())}
+    return merged, counts, changed
+
+
+def upsert_table(df, path, schema, pick_col, csv_path=None, changelog=True):
+    """
+    Upsert the rows of df into the store at path (see the module docstring)
+    and return the counts of merge_sorted.
+
+    The rows are fingerprinted first (see changes.py), and only the ones
+    whose fingerprint differs from the stored one are merged. With changelog
+    every inserted row and changed value is logged for the downstream
+    stages.
+
+    If csv_path is given and anything changed (or it doesn't exist yet),
+    the whole store is written there as the side output, sorted by key and
+    without an index column.
+    """
+    new = keyed_rows(df.reindex(columns=schema.names), pick_col)
+    new_keys = row_keys(new, pick_col)
+    new_fingerprints = changes.row_fingerprints(new, schema)
+    stored = changes.read_fingerprints(path) if table_exists(path) else None
+    fingerprinted = stored is None and table_exists(path)
+    if fingerprinted:
+        # written before the fingerprints were kept, fingerprint it once
+        existing = keyed_rows(read_table(path), pick_col)
+        stored = (row_keys(existing, pick_col),
+                  changes.row_fingerprints(existing, schema))
+    elif stored is None:
+        stored = (np.empty(0, np.int64), np.empty(0, np.uint64))
+
+    # rows with the same fingerprint as the stored ones cost nothing more
+    same = changes.unchanged_rows(*stored, new_keys, new_fingerprints)
+    new = new[~same].reset_index(drop=True)
+    years = new[PARTITION_COL].unique().tolist()
+    if table_exists(path) and years:
+        # only the partitions of the years with changed rows
+        existing = keyed_rows(read_table(path, years=years), pick_col)
+    else:
+        existing = new.iloc[:0]
+
+    merged, counts, changed = merge_sorted(existing, new, pick_col)
+    counts["unchanged"] += int(same.sum())
+    changed_years = new.loc[changed, PARTITION_COL].unique()
+    if len(changed_years):
+        if changelog:
+            entries = changes.changelog_entries(
+                existing, new[changed], pick_col, changes.last_run(path) + 1)
+        write_table(merged[merged[PARTITION_COL].isin(changed_years)], path,
+                    schema)
+        if changelog:
+            changes.append_changelog(path, entries)
+    if len(changed_years) or fingerprinted:
+        changes.write_fingerprints(path, *changes.merge_fingerprints(
+            *stored, new_keys[~same], new_fingerprints[~same]))
+    if csv_path is not None and (len(changed_years)
+                                 or not os.path.exists(csv_path)):
+        export_csv(path, csv_path, pick_col)
+    return counts
+
+
+def export_csv(path, csv_path, pick_col):
+    """
+    Write the whole store at path to csv_path, sorted by key.
+    """
+    df = read_table(path)
+    df = df.iloc[np.argsort(row_keys(df, pick_col), kind="stable")]
+    tmp_path = csv_path + ".tmp"
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, csv_path)